@@ -0,0 +1,172 @@
+"""
+`configs-cli bench-setup`: run setup end to end against fake system tools.
+
+Each scenario gets a throwaway sandbox (HOME, pacman database, artifact cache,
+a copy of the repository and the shims from shims.py on PATH) and reports wall
+time, subprocesses, shim calls, sudo calls and filesystem writes. This module
+is loaded from the repository by the bench-setup command and is not part of
+the installed package.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import configs_cli
+import shims
+
+# Scenarios for bench_setup: (name, description, run in the sandbox of the previous scenario?)
+SETUP_SCENARIOS = [
+    ("fresh", "empty home, no packages, no yay", False),
+    ("rerun", "setup again on the machine it just provisioned", True),
+    ("partial", "official packages and yay installed, nothing else", False),
+]
+
+
+def snapshot(roots):
+    """Map every path under roots to (mtime, size) without following links"""
+    state = {}
+    for root in roots:
+        for dirpath, dirnames, filenames in os.walk(root):
+            for name in dirnames + filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.lstat(path)
+                except OSError:
+                    continue
+                state[path] = (st.st_mtime_ns, st.st_size)
+    return state
+
+
+def count_writes(before, after):
+    """Number of paths created, changed or removed between two snapshots"""
+    changed = sum(1 for path, meta in after.items() if before.get(path) != meta)
+    return changed + sum(1 for path in before if path not in after)
+
+
+def make_sandbox(repo, latency_ms, latencies):
+    """Create a temporary HOME, package database, cache, repository copy and shims"""
+    root = tempfile.mkdtemp(prefix="configs-cli-bench-")
+    sandbox = {name: os.path.join(root, name)
+               for name in ("home", "cache", "db", "shims", "repo", "profiles", "sysroot")}
+    sandbox["root"] = root
+    sandbox["log"] = os.path.join(root, "invocations.log")
+    for name in ("home", "cache", "profiles", "sysroot"):
+        os.makedirs(sandbox[name])
+    # setup edits the repository's zshrc, so it works on a copy
+    for part in ("dotfiles", "config"):
+        shutil.copytree(os.path.join(repo, part), os.path.join(sandbox["repo"], part), symlinks=True)
+    shims.write_shims(sandbox["shims"], sandbox["log"], sandbox["db"], latency_ms, latencies)
+    sandbox["server"] = shims.serve_downloads(sandbox["shims"], (latencies or {}).get("download", latency_ms))
+    return sandbox
+
+
+def run_setup_in(sandbox, label):
+    """Run `configs-cli setup` inside the sandbox and return its measurements"""
+    env = {key: value for key, value in os.environ.items() if not key.startswith(("XDG_", "CONFIGS_"))}
+    env.update({
+        "HOME": sandbox["home"],
+        "PATH": sandbox["shims"],
+        "CONFIGS_CLI_PACMAN_DB": sandbox["db"],
+        # The privileged helper runs in test mode and writes system files under sysroot
+        "CONFIGS_CLI_PRIVILEGED_ROOT": sandbox["sysroot"],
+        "PYTHONPATH": os.path.dirname(os.path.dirname(os.path.abspath(configs_cli.__file__))),
+        # A dead mirror first, so every run also exercises the fetcher's fallback
+        "CONFIGS_CLI_OH_MY_ZSH_URLS": "http://127.0.0.1:9/install.sh http://127.0.0.1:%d/install.sh"
+                                      % sandbox["server"].server_address[1],
+    })
+    profile = os.path.join(sandbox["profiles"], label)
+    cmd = [sys.executable, "-m", "configs_cli.main", "setup", "--system", "arch", "--de", "i3",
+           "--repo", sandbox["repo"], "--cache-dir", sandbox["cache"], "--profile", profile]
+    roots = [sandbox[name] for name in ("home", "cache", "db", "repo", "sysroot")]
+    logged = len(shims.read_log(sandbox["log"]))
+    before = snapshot(roots)
+    output_path = os.path.join(sandbox["root"], f"{label}.out")
+    start = time.perf_counter()
+    with open(output_path, "w") as output:
+        result = subprocess.run(cmd, env=env, stdout=output, stderr=subprocess.STDOUT)
+    wall = time.perf_counter() - start
+    writes = count_writes(before, snapshot(roots))
+
+    calls = shims.read_log(sandbox["log"])[logged:]
+    with open(os.path.join(profile, "trace.ndjson")) as f:
+        commands = [record for record in map(json.loads, f) if record["kind"] == "command"]
+    return {
+        "exit_code": result.returncode,
+        "wall_s": round(wall, 3),
+        "subprocesses": len(commands),
+        "shim_calls": len(calls),
+        # Each helper start is one sudo; in test mode it is started without one
+        "sudo": sum(1 for record in commands if record.get("helper") or record["cmd"][0] == "sudo"),
+        "fs_writes": writes,
+        "output": output_path,
+    }
+
+
+def bench_setup(repo, latency_ms=20, latencies=None, baseline=None, update_baseline=False, keep=False):
+    """
+    Run setup end to end against shims in a throwaway sandbox for each scenario
+    and print wall time, subprocess count, sudo count and filesystem writes.
+    With a baseline file, returns False if the no-op re-run spawns more
+    subprocesses than the baseline records.
+    """
+    from configs_cli.provision import arch_packages
+
+    print(f"Setup benchmark (shim latency {latency_ms} ms)\n")
+    print(f"{'scenario':<10}{'wall s':>9}{'subprocs':>10}{'shim calls':>12}{'sudo':>6}{'fs writes':>11}  description")
+    results = {}
+    sandboxes = []
+    sandbox = None
+    ok = True
+    try:
+        for name, description, reuse in SETUP_SCENARIOS:
+            if not reuse:
+                sandbox = make_sandbox(repo, latency_ms, latencies)
+                sandboxes.append(sandbox)
+            if name == "partial":
+                core_packages, _ = arch_packages("i3")
+                shims.add_packages(sandbox["db"], core_packages)
+                shims.install_shim(sandbox["shims"], "yay")
+                shims.add_packages(sandbox["db"], ["yay"])
+            result = run_setup_in(sandbox, name)
+            results[name] = result
+            print(f"{name:<10}{result['wall_s']:>9.2f}{result['subprocesses']:>10}{result['shim_calls']:>12}"
+                  f"{result['sudo']:>6}{result['fs_writes']:>11}  {description}")
+            if result["exit_code"] != 0:
+                ok = False
+                print(f"  setup exited with {result['exit_code']}, see {result['output']}")
+                keep = True
+    finally:
+        for sandbox in sandboxes:
+            sandbox["server"].shutdown()
+        if not keep:
+            for sandbox in sandboxes:
+                shutil.rmtree(sandbox["root"], ignore_errors=True)
+        else:
+            print("\nSandboxes kept in " + ", ".join(s["root"] for s in sandboxes))
+    print()
+
+    counts = {name: {key: value for key, value in result.items() if key not in ("wall_s", "output", "exit_code")}
+              for name, result in results.items()}
+    if baseline and os.path.exists(baseline) and not update_baseline:
+        with open(baseline) as f:
+            expected = json.load(f)["rerun"]["subprocesses"]
+        actual = counts["rerun"]["subprocesses"]
+        if actual > expected:
+            ok = False
+            print(f"No-op re-run spawned {actual} subprocesses, baseline allows {expected}")
+        elif actual < expected:
+            print(f"No-op re-run spawned {actual} subprocesses, down from {expected}; "
+                  f"run with --update-baseline to lock that in")
+        else:
+            print(f"No-op re-run subprocess count matches the baseline ({actual})")
+    if baseline and update_baseline and ok:
+        os.makedirs(os.path.dirname(os.path.abspath(baseline)), exist_ok=True)
+        with open(baseline, "w") as f:
+            json.dump(counts, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Baseline written to {baseline}")
+    return ok
@@ -0,0 +1,196 @@
+"""
+Fake system tools for running `configs-cli setup` hermetically.
+
+Every shim appends one tab-separated line (tool name and arguments) to an
+invocation log, sleeps for a configurable latency and then imitates just
+enough of the real tool for setup to carry on: pacman and yay record what they
+"install" in a fake pacman database, systemctl keeps unit states in files,
+git clone creates an empty checkout and git checkout moves its HEAD, sudo
+runs the fake tool it is given or does nothing (file operations under sudo
+target system paths), and so on. Downloads are answered by a local HTTP
+server. Nothing outside the sandbox is touched.
+"""
+import os
+import shutil
+
+# Tools setup calls, shimmed by default
+SHIM_NAMES = ["pacman", "yay", "makepkg", "git", "systemctl", "sudo", "gem", "ruby",
+              "chsh", "i3", "i3-msg", "tmux", "zsh", "cp"]
+
+# Tools setup has to install itself; their shims start out in the templates directory
+INSTALLED_BY_SETUP = ["yay"]
+
+HEADER = """#!/bin/sh
+{{ printf '%s' '{name}'; for arg in "$@"; do printf '\\t%s' "$arg"; done; printf '\\n'; }} >> '{log}'
+{sleep}
+"""
+
+INSTALL_PACKAGES = """case "$1" in
+  -Sg*) exit 1 ;;
+  -S*)
+    for pkg in "$@"; do
+      case "$pkg" in -*) continue ;; esac
+      '{mkdir}' -p '{db}'/"$pkg"-1.0-1
+      printf '%%NAME%%\\n%s\\n\\n%%VERSION%%\\n1.0-1\\n\\n' "$pkg" > '{db}'/"$pkg"-1.0-1/desc
+    done ;;
+esac
+"""
+
+INSTALLER = """#!/bin/sh
+printf 'install.sh\\n' >> '{log}'
+'{mkdir}' -p "$HOME/.oh-my-zsh"
+: > "$HOME/.oh-my-zsh/oh-my-zsh.sh"
+"""
+
+BODIES = {
+    "pacman": INSTALL_PACKAGES,
+    "yay": INSTALL_PACKAGES,
+    "makepkg": """'{cp}' '{templates}/yay' '{shims}/yay'
+'{mkdir}' -p '{db}/yay-1.0-1'
+printf '%%NAME%%\\nyay\\n\\n%%VERSION%%\\n1.0-1\\n\\n' > '{db}/yay-1.0-1/desc'
+""",
+    "git": """case "$1" in
+  clone) for dest in "$@"; do :; done; '{mkdir}' -p "$dest/.git" ;;
+  -C) dir=$2; shift 2
+      if [ "$1" = checkout ]; then
+        branch=; prev=
+        for commit in "$@"; do [ "$prev" = -B ] && branch=$commit; prev=$commit; done
+        '{mkdir}' -p "$dir/.git/refs/heads"
+        if [ -n "$branch" ]; then
+          printf 'ref: refs/heads/%s\n' "$branch" > "$dir/.git/HEAD"
+          printf '%s\n' "$commit" > "$dir/.git/refs/heads/$branch"
+        else
+          printf '%s\n' "$commit" > "$dir/.git/HEAD"
+        fi
+      fi ;;
+esac
+""",
+    "systemctl": """scope=system
+[ "$1" = --user ] && {{ scope=user; shift; }}
+dir='{systemd}'/$scope
+'{mkdir}' -p "$dir"
+verb=$1; shift
+now=
+for arg in "$@"; do [ "$arg" = --now ] && now=1; done
+first=1; skip=
+for unit in "$@"; do
+  [ -n "$skip" ] && {{ skip=; continue; }}
+  case "$unit" in -p) skip=1; continue ;; -*) continue ;; esac
+  case "$verb" in
+    show)
+      [ -z "$first" ] && printf '\n'; first=
+      enabled=disabled; [ -e "$dir/$unit.enabled" ] && enabled=enabled
+      active=inactive; [ -e "$dir/$unit.active" ] && active=active
+      printf 'Id=%s.service\nLoadState=loaded\nUnitFileState=%s\nActiveState=%s\n' "$unit" "$enabled" "$active" ;;
+    enable) : > "$dir/$unit.enabled"; [ -n "$now" ] && : > "$dir/$unit.active" ;;
+    disable) '{rm}' -f "$dir/$unit.enabled" ;;
+    start|restart) : > "$dir/$unit.active" ;;
+    stop) '{rm}' -f "$dir/$unit.active" ;;
+  esac
+done
+exit 0
+""",
+    "sudo": """cmd=$1; shift
+case "$cmd" in cp) exit 0 ;; esac
+[ -x '{shims}'/"$cmd" ] && exec '{shims}'/"$cmd" "$@"
+exit 0
+""",
+    "gem": """case "$1" in
+  install) user="$HOME/.local/share/gem/ruby/{ruby}"
+    '{mkdir}' -p "$user/bin" "$user/specifications"
+    : > "$user/bin/$2"; : > "$user/specifications/$2-1.0.0.gemspec" ;;
+esac
+""",
+    # Answers the toolchain probe: RUBY_VERSION, Gem.dir, Gem.user_dir
+    "ruby": "printf '%s\\n' '{ruby}' '/usr/lib/ruby/gems/{ruby}' \"$HOME/.local/share/gem/ruby/{ruby}\"\n",
+    "i3": "exit 1\n",
+    "zsh": "printf 'zsh 5.9 (x86_64-pc-linux-gnu)\\n'\n",
+    "cp": "exec '{cp}' \"$@\"\n",
+}
+
+
+def write_shims(shims_dir, log_path, db_dir, latency_ms=0, latencies=None, ruby="3.2.0"):
+    """
+    Write the shims into shims_dir and return it.
+    latencies maps tool names to a latency overriding latency_ms for that tool.
+    Shims for tools setup installs itself are kept in shims_dir/.templates
+    until the matching build step copies them into place.
+    """
+    templates = os.path.join(shims_dir, ".templates")
+    os.makedirs(templates, exist_ok=True)
+    os.makedirs(db_dir, exist_ok=True)
+    values = {
+        "log": log_path,
+        "db": db_dir,
+        "shims": shims_dir,
+        "templates": templates,
+        "ruby": ruby,
+        "systemd": os.path.join(shims_dir, ".systemd"),
+        "mkdir": shutil.which("mkdir"),
+        "rm": shutil.which("rm"),
+        "cp": shutil.which("cp"),
+    }
+    # What serve_downloads() hands out: an Oh My Zsh installer that only creates the marker file
+    installer = os.path.join(templates, "install.sh")
+    with open(installer, "w") as f:
+        f.write(INSTALLER.format(**values))
+    os.chmod(installer, 0o755)
+    sleep_bin = shutil.which("sleep")
+    for name in SHIM_NAMES:
+        latency = (latencies or {}).get(name, latency_ms)
+        sleep = f"'{sleep_bin}' {latency / 1000:.3f}" if latency else ""
+        script = HEADER.format(name=name, log=log_path, sleep=sleep) + BODIES.get(name, "").format(**values)
+        directory = templates if name in INSTALLED_BY_SETUP else shims_dir
+        path = os.path.join(directory, name)
+        with open(path, "w") as f:
+            f.write(script)
+        os.chmod(path, 0o755)
+    return shims_dir
+
+
+def serve_downloads(shims_dir, latency_ms=0):
+    """
+    Serve the templates directory (the fake Oh My Zsh installer) over HTTP on
+    localhost from a background thread, answering after latency_ms.
+    Returns the server; call shutdown() on it when done.
+    """
+    import functools
+    import http.server
+    import threading
+    import time
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency_ms / 1000)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    handler = functools.partial(Handler, directory=os.path.join(shims_dir, ".templates"))
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def install_shim(shims_dir, name):
+    """Put a shim that normally only appears once setup installs the tool into place"""
+    shutil.copy2(os.path.join(shims_dir, ".templates", name), os.path.join(shims_dir, name))
+
+
+def add_packages(db_dir, names):
+    """Mark packages as installed in a fake pacman database"""
+    for name in names:
+        entry = os.path.join(db_dir, f"{name}-1.0-1")
+        os.makedirs(entry, exist_ok=True)
+        with open(os.path.join(entry, "desc"), "w") as f:
+            f.write(f"%NAME%\n{name}\n\n%VERSION%\n1.0-1\n\n")
+
+
+def read_log(log_path):
+    """Return the logged invocations as lists of [tool, arg, ...]"""
+    try:
+        with open(log_path) as f:
+            return [line.rstrip("\n").split("\t") for line in f if line.strip()]
+    except OSError:
+        return []
@@ -0,0 +1,334 @@
+"""Benchmarks for configs-cli itself and for the shell and editor configs it links."""
+import importlib
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples (nearest rank)"""
+    ordered = sorted(samples)
+    index = max(0, math.ceil(pct / 100.0 * len(ordered)) - 1)
+    return ordered[index]
+
+
+def time_command(cmd, env=None):
+    """Run cmd once with its output discarded and return the wall time in milliseconds"""
+    start = time.perf_counter()
+    subprocess.run(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def startup_samples(command, runs, cold):
+    """
+    Time `configs-cli <command>` runs times.
+    Cold runs get a fresh, empty bytecode cache each time, so every module is
+    compiled again; warm runs reuse the normal __pycache__ directories.
+    """
+    cmd = [sys.executable, "-m", "configs_cli.main"] + list(command)
+    samples = []
+    for _ in range(runs):
+        env = dict(os.environ)
+        pycache = None
+        if cold:
+            pycache = tempfile.mkdtemp(prefix="configs-cli-pycache-")
+            env["PYTHONPYCACHEPREFIX"] = pycache
+        try:
+            samples.append(time_command(cmd, env))
+        finally:
+            if pycache:
+                shutil.rmtree(pycache, ignore_errors=True)
+    return samples
+
+
+def bench_startup(runs=20, budget_ms=100.0, commands=(("source",), ("check-links",))):
+    """
+    Measure cold and warm startup of the read-only commands against the bare
+    interpreter, and return False if any warm median is over budget_ms.
+    """
+    print(f"Startup benchmark ({runs} runs each, budget {budget_ms:.0f} ms warm median)\n")
+    baseline = [time_command([sys.executable, "-c", "pass"]) for _ in range(runs)]
+    print(f"{'command':<24}{'mode':<8}{'min':>9}{'p50':>9}{'p95':>9}")
+    print(f"{'python -c pass':<24}{'warm':<8}{min(baseline):>9.1f}{percentile(baseline, 50):>9.1f}"
+          f"{percentile(baseline, 95):>9.1f}")
+
+    ok = True
+    for command in commands:
+        name = "configs-cli " + " ".join(command)
+        for mode in ("cold", "warm"):
+            samples = startup_samples(command, runs, cold=(mode == "cold"))
+            p50 = percentile(samples, 50)
+            flag = ""
+            if mode == "warm" and p50 > budget_ms:
+                ok = False
+                flag = "  OVER BUDGET"
+            print(f"{name:<24}{mode:<8}{min(samples):>9.1f}{p50:>9.1f}{percentile(samples, 95):>9.1f}{flag}")
+    print()
+    print("Startup is within budget" if ok else "Startup regressed past the budget")
+    return ok
+
+
+def load_benchmark(repo, name):
+    """
+    Import a benchmark module from the repository's benchmarks/ directory.
+    The setup benchmark and its fake system tools live there rather than in
+    the installed package; returns None if the repository has no such module.
+    """
+    directory = os.path.join(os.path.abspath(repo), "benchmarks")
+    if not os.path.isfile(os.path.join(directory, f"{name}.py")):
+        return None
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    return importlib.import_module(name)
+
+
+# -- bench-shell --------------------------------------------------------------
+
+# Stands in for ~/.zshrc (through ZDOTDIR): times every `source` the real zshrc
+# makes, including Oh My Zsh plugins, and dumps zprof's function profile.
+ZSH_PROFILE_RC = """zmodload zsh/zprof
+zmodload zsh/datetime
+typeset -g __bench_log={log}
+source() {{
+    local __bench_start=$EPOCHREALTIME
+    builtin source "$@"
+    local __bench_status=$?
+    print -r -- "$1"$'\\t'"$(( (EPOCHREALTIME - __bench_start) * 1000 ))" >> $__bench_log
+    return $__bench_status
+}}
+unset ZDOTDIR
+builtin source "$HOME/.zshrc"
+unfunction source
+zprof > {zprof}
+"""
+
+# `clock  self+sourced  self: what` lines of nvim --startuptime
+STARTUPTIME_LINE = re.compile(r"^\s*([\d.]+)\s+([\d.]+)\s+([\d.]+):\s+(.*)$")
+# First table of zprof: num) calls total total/call total% self self/call self% name
+ZPROF_LINE = re.compile(r"^\s*\d+\)\s+\d+\s+([\d.]+)\s+[\d.]+\s+[\d.]+%\s+([\d.]+)\s+[\d.]+\s+[\d.]+%\s+(\S+)")
+
+
+def home_relative(path):
+    home = os.path.expanduser("~")
+    return "~" + path[len(home):] if path.startswith(home + os.sep) else path
+
+
+def median_components(runs):
+    """Merge per-run {component: ms} dicts into {component: median ms}"""
+    merged = {}
+    for run in runs:
+        for name, ms in run.items():
+            merged.setdefault(name, []).append(ms)
+    return {name: percentile(samples, 50) for name, samples in merged.items()}
+
+
+def parse_zprof(text):
+    """Self time per function from zprof's summary table"""
+    functions = {}
+    for line in text.splitlines():
+        if not line.strip() and functions:
+            break
+        match = ZPROF_LINE.match(line)
+        if match:
+            functions["fn " + match.group(3)] = float(match.group(2))
+    return functions
+
+
+def zsh_components(zsh, runs):
+    """Time each sourced file and profiled function over profiled `zsh -i -c exit` runs"""
+    work = tempfile.mkdtemp(prefix="configs-cli-zprof-")
+    log = os.path.join(work, "sources.tsv")
+    zprof = os.path.join(work, "zprof.txt")
+    with open(os.path.join(work, ".zshrc"), "w") as f:
+        f.write(ZSH_PROFILE_RC.format(log=log, zprof=zprof))
+    env = dict(os.environ, ZDOTDIR=work)
+    profiles = []
+    try:
+        for _ in range(runs):
+            for path in (log, zprof):
+                if os.path.exists(path):
+                    os.remove(path)
+            subprocess.run([zsh, "-i", "-c", "exit"], env=env, stdin=subprocess.DEVNULL,
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=False)
+            components = {}
+            try:
+                with open(log) as f:
+                    for line in f:
+                        path, _, ms = line.rstrip("\n").rpartition("\t")
+                        name = "source " + home_relative(path)
+                        components[name] = components.get(name, 0.0) + float(ms)
+            except (OSError, ValueError):
+                pass
+            try:
+                with open(zprof) as f:
+                    components.update(parse_zprof(f.read()))
+            except OSError:
+                pass
+            profiles.append(components)
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return median_components(profiles)
+
+
+def lazy_plugin_modules(lazy_root):
+    """Map each Lua module a lazy.nvim plugin provides to the plugin's name"""
+    modules = {}
+    try:
+        plugins = os.listdir(lazy_root)
+    except OSError:
+        return modules
+    for plugin in plugins:
+        try:
+            entries = os.listdir(os.path.join(lazy_root, plugin, "lua"))
+        except OSError:
+            continue
+        for entry in entries:
+            modules.setdefault(entry[:-4] if entry.endswith(".lua") else entry, plugin)
+    return modules
+
+
+def parse_startuptime(text, lazy_root, modules):
+    """Self time per lazy.nvim plugin (plus "config" and "runtime") from a --startuptime log"""
+    config_dir = os.path.join(os.path.expanduser("~"), ".config", "nvim")
+    components = {}
+    for line in text.splitlines():
+        match = STARTUPTIME_LINE.match(line)
+        if not match:
+            continue
+        what = match.group(4).strip()
+        if what.startswith("sourcing "):
+            path = os.path.realpath(what[len("sourcing "):])
+            if path.startswith(lazy_root + os.sep):
+                name = "plugin " + path[len(lazy_root) + 1:].split(os.sep)[0]
+            elif path.startswith(os.path.realpath(config_dir) + os.sep):
+                name = "config"
+            else:
+                name = "runtime"
+        elif what.startswith("require("):
+            module = what[len("require("):].strip("')\"").split(".")[0]
+            name = "plugin " + modules[module] if module in modules else "config"
+        else:
+            continue
+        components[name] = components.get(name, 0.0) + float(match.group(3))
+    return components
+
+
+def nvim_samples(nvim, runs):
+    """Wall times of headless nvim starts and the median self time per plugin"""
+    lazy_root = os.path.join(os.path.expanduser("~"), ".local", "share", "nvim", "lazy")
+    modules = lazy_plugin_modules(lazy_root)
+    work = tempfile.mkdtemp(prefix="configs-cli-startuptime-")
+    samples, profiles = [], []
+    try:
+        for index in range(runs):
+            log = os.path.join(work, f"{index}.log")
+            samples.append(time_command([nvim, "--headless", "--startuptime", log, "-c", "qa!"]))
+            try:
+                with open(log) as f:
+                    profiles.append(parse_startuptime(f.read(), lazy_root, modules))
+            except OSError:
+                pass
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+    return samples, median_components(profiles)
+
+
+def tmux_samples(tmux, runs):
+    """Wall times of `tmux new -d` on a private server, which is killed after each run"""
+    socket = f"configs-cli-bench-{os.getpid()}"
+    conf = os.path.expanduser("~/.tmux.conf")
+    cmd = [tmux, "-L", socket] + (["-f", conf] if os.path.exists(conf) else []) + ["new-session", "-d"]
+    samples = []
+    for _ in range(runs):
+        try:
+            samples.append(time_command(cmd))
+        finally:
+            subprocess.run([tmux, "-L", socket, "kill-server"], stdout=subprocess.DEVNULL,
+                           stderr=subprocess.DEVNULL, check=False)
+    return samples
+
+
+def print_components(components, top):
+    for name, ms in sorted(components.items(), key=lambda item: -item[1])[:top]:
+        print(f"    {ms:>8.1f} ms  {name}")
+
+
+def print_shell_diff(previous, current, top):
+    """Print how p50s and components moved since the previous recorded run"""
+    when = time.strftime("%Y-%m-%d %H:%M", time.localtime(previous["time"]))
+    print(f"Compared with the run of {when}:")
+    for tool, result in current["results"].items():
+        before = previous["results"].get(tool)
+        if before is None:
+            continue
+        delta = result["p50"] - before["p50"]
+        pct = 100.0 * delta / before["p50"] if before["p50"] else 0.0
+        print(f"  {tool:<6} p50 {before['p50']:.1f} -> {result['p50']:.1f} ms ({delta:+.1f} ms, {pct:+.0f}%)")
+        old, new = before.get("components", {}), result.get("components", {})
+        moves = [(name, new.get(name, 0.0) - old.get(name, 0.0)) for name in set(old) | set(new)]
+        moves = [(name, d) for name, d in moves if abs(d) >= 0.5]
+        for name, d in sorted(moves, key=lambda item: -abs(item[1]))[:top]:
+            note = " (new)" if name not in old else " (gone)" if name not in new else ""
+            print(f"           {d:+8.1f} ms  {name}{note}")
+
+
+def bench_shell(runs=10, zsh="zsh", nvim="nvim", tmux="tmux", only=None, history=None, top=10):
+    """
+    Time interactive zsh, headless nvim and `tmux new -d` startups, attribute
+    the time to sourced files and plugins, append the result to the history
+    file and print the differences from the previous run.
+    """
+    from configs_cli.executables import which
+    from configs_cli.state import DEFAULT_STATE_DIR
+
+    history = history or os.path.join(DEFAULT_STATE_DIR, "bench-shell.json")
+    tools = {"zsh": zsh, "nvim": nvim, "tmux": tmux}
+    print(f"Shell startup benchmark ({runs} runs each)\n")
+    current = {"time": time.time(), "runs": runs, "results": {}}
+    for tool, binary in tools.items():
+        if only and tool not in only:
+            continue
+        path = which(binary)
+        if path is None:
+            print(f"{tool}: {binary} not found, skipped\n")
+            continue
+        try:
+            if tool == "zsh":
+                samples = [time_command([path, "-i", "-c", "exit"]) for _ in range(runs)]
+                components = zsh_components(path, max(1, min(runs, 5)))
+                label = "zsh -i -c exit"
+            elif tool == "nvim":
+                samples, components = nvim_samples(path, runs)
+                label = "nvim --headless"
+            else:
+                samples, components = tmux_samples(path, runs), {}
+                label = "tmux new -d"
+        except subprocess.CalledProcessError as e:
+            print(f"{tool}: {' '.join(e.cmd)} failed with exit code {e.returncode}, skipped\n")
+            continue
+        result = {"p50": percentile(samples, 50), "p95": percentile(samples, 95), "components": components}
+        current["results"][tool] = result
+        print(f"{label:<18} p50 {result['p50']:>8.1f} ms   p95 {result['p95']:>8.1f} ms")
+        print_components(components, top)
+        print()
+
+    try:
+        with open(history) as f:
+            runs_so_far = json.load(f)
+    except (OSError, ValueError):
+        runs_so_far = []
+    if runs_so_far:
+        print_shell_diff(runs_so_far[-1], current, top)
+    if current["results"]:
+        os.makedirs(os.path.dirname(os.path.abspath(history)), exist_ok=True)
+        with open(history, "w") as f:
+            json.dump(runs_so_far + [current], f, indent=2)
+            f.write("\n")
+        print(f"\nResults appended to {history}")
+    return True
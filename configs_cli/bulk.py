@@ -0,0 +1,137 @@
+"""
+`configs-cli provision-many`: stamp the per-user part of setup onto many homes.
+
+Everything the targets have in common is resolved once in this process: the
+repository mirrors, the checkouts, the Neovim plugins and Oh My Zsh (built in a
+staging home) and the zshrc managed block. Each target then only needs a cheap apply (directories,
+copies of the staged trees, links, .xinitrc and ownership), and those applies
+run on a process pool. System packages, services, the keyboard layout and the
+login shell are machine-wide and are left to `configs-cli setup`.
+"""
+import io
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+from configs_cli.cache import ArtifactCache
+from configs_cli.clone import clone_all
+from configs_cli.nvimplugins import LAZY_DIR, provision_nvim_plugins
+from configs_cli.provision import (adopt_home, install_oh_my_zsh, install_oh_my_zsh_theme, link_home,
+                                   setup_filesystem, update_zshrc, user_repositories)
+from configs_cli.snapshots import clone_tree
+from configs_cli.target import Target
+from configs_cli.ui import print_step
+
+# Set in each worker process by _init_worker
+_shared = None
+
+
+class SharedPlan:
+    """What every target gets, resolved once before the applies start"""
+
+    def __init__(self, repo, de, staging, trees):
+        self.repo = repo
+        self.de = de
+        self.staging = staging
+        self.trees = trees  # home-relative paths copied from the staging home
+
+
+def prepare(args, cache, staging):
+    """Clone, install and edit everything the targets share into a staging home"""
+    stage = Target(home=staging)
+    repos = user_repositories(stage)
+    print_step(f"Preparing the shared plan in {staging}")
+    results = clone_all(repos, jobs=args.clone_jobs, cache=cache)
+    cache.evict()
+    failed = [name for name, error in results.items() if error is not None]
+    if failed:
+        print(f"Error: could not fetch {', '.join(failed)}")
+        sys.exit(1)
+    install_oh_my_zsh(cache, stage)
+    provision_nvim_plugins(args.repo, stage, cache, args.clone_jobs)
+    update_zshrc(os.path.abspath(os.path.join(args.repo, "dotfiles", "zshrc")), cache)
+    trees = [os.path.relpath(repo.dest, staging) for repo in repos]
+    trees += [".oh-my-zsh", os.path.join(".zsh", "catppuccin_mocha-zsh-syntax-highlighting.zsh"), LAZY_DIR]
+    return SharedPlan(os.path.abspath(args.repo), args.de, staging, trees)
+
+
+def copy_staged(plan, target):
+    """
+    Copy the staged trees the target does not have yet, as reflinks where the
+    filesystem supports them. Hard links are not used: each target is chowned
+    to its own user, and shared inodes would be handed from one to the next.
+    """
+    for tree in plan.trees:
+        src = os.path.join(plan.staging, tree)
+        dest = target.path(tree)
+        if not os.path.lexists(src) or os.path.lexists(dest):
+            continue
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        clone_tree(src, dest, hardlink=False)
+
+
+def _init_worker(plan):
+    global _shared
+    _shared = plan
+
+
+def apply_target(target):
+    """
+    Provision one target from the shared plan.
+    Returns (target, error or None, seconds, captured output).
+    """
+    start = time.monotonic()
+    output = io.StringIO()
+    error = None
+    try:
+        with redirect_stdout(output):
+            setup_filesystem(target)
+            copy_staged(_shared, target)
+            install_oh_my_zsh_theme(target)
+            link_home(_shared.repo, _shared.de, target)
+            adopt_home(target, _shared.de)
+    except (Exception, SystemExit) as e:
+        error = f"{type(e).__name__}: {e}"
+    return target, error, time.monotonic() - start, output.getvalue()
+
+
+def print_report(results):
+    """Print one line per target and return True if all of them succeeded"""
+    width = max([len(str(target)) for target, _, _, _ in results] + [6])
+    print(f"\n{'target':<{width}}  {'status':<6}  {'seconds':>7}")
+    for target, error, seconds, output in results:
+        status = "ok" if error is None else "FAILED"
+        print(f"{str(target):<{width}}  {status:<6}  {seconds:>7.2f}")
+        if error is not None:
+            print(f"    {error}")
+            for line in output.splitlines()[-5:]:
+                print(f"    | {line}")
+    failed = sum(1 for _, error, _, _ in results if error is not None)
+    print(f"\n{len(results) - failed} of {len(results)} targets provisioned")
+    return failed == 0
+
+
+def provision_many(args, targets):
+    """Prepare the shared plan once, then apply it to every target on a process pool"""
+    if not targets:
+        print("Error: no targets given")
+        return False
+    if not os.path.isdir(os.path.join(args.repo, "dotfiles")):
+        print(f"Error: {args.repo} is not a configs repository")
+        return False
+    cache = ArtifactCache(args.cache_dir, offline=args.offline,
+                          max_size=args.cache_max_size * 1024 ** 2)
+    staging = tempfile.mkdtemp(prefix="configs-cli-staging-")
+    try:
+        plan = prepare(args, cache, staging)
+        print_step(f"Provisioning {len(targets)} targets with {args.jobs} processes")
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker,
+                                 initargs=(plan,)) as pool:
+            results = list(pool.map(apply_target, targets, chunksize=max(1, len(targets) // (args.jobs * 4))))
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+    return print_report(results)
@@ -0,0 +1,224 @@
+"""
+Local artifact cache shared by clones and downloads.
+
+Layout under the cache root (default ~/.cache/configs-cli):
+    mirrors/<name>-<hash>.git   bare mirrors of every repository setup clones
+    blobs/<aa>/<sha256>         downloaded files, keyed by content hash
+    downloads.json              URL -> content hash index for the blobs
+    build/yay                   yay sources while the AUR helper is built
+    toolchains.json             the cached Ruby toolchain probe (see toolchain.py)
+
+The same directory can be seeded onto a USB stick or NFS share and used with
+`configs-cli setup --offline --cache-dir PATH` to provision without network.
+"""
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+
+from configs_cli import trace
+
+DEFAULT_CACHE_DIR = os.path.expanduser("~/.cache/configs-cli")
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3  # 2 GiB
+
+
+class CacheMiss(Exception):
+    """Raised when an artifact is needed in offline mode but is not cached"""
+
+
+def file_sha256(path):
+    """Return the hex sha256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def tree_size(path):
+    """Return the number of bytes used by the files under path"""
+    if not os.path.isdir(path):
+        return os.lstat(path).st_size
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+class ArtifactCache:
+    """Bare git mirrors plus content-addressed downloads, with size-based eviction"""
+
+    def __init__(self, root=None, offline=False, max_size=DEFAULT_MAX_SIZE):
+        self.root = os.path.abspath(os.path.expanduser(root or DEFAULT_CACHE_DIR))
+        self.offline = offline
+        self.max_size = max_size
+        self.mirrors_dir = os.path.join(self.root, "mirrors")
+        self.blobs_dir = os.path.join(self.root, "blobs")
+        self.index_path = os.path.join(self.root, "downloads.json")
+        self._lock = threading.Lock()
+        self._url_locks = {}
+
+    def _url_lock(self, url):
+        with self._lock:
+            return self._url_locks.setdefault(url, threading.Lock())
+
+    # -- git mirrors ---------------------------------------------------------
+
+    def mirror_path(self, url):
+        """Return where the bare mirror of url lives in the cache"""
+        name = url.rstrip("/").split("/")[-1]
+        if name.endswith(".git"):
+            name = name[:-4]
+        key = hashlib.sha256(url.encode()).hexdigest()[:16]
+        return os.path.join(self.mirrors_dir, f"{name}-{key}.git")
+
+    def ensure_mirror(self, url):
+        """
+        Make sure an up-to-date bare mirror of url is in the cache and return its path.
+        In offline mode an existing mirror is used as-is and a missing one is a CacheMiss.
+        """
+        path = self.mirror_path(url)
+        with self._url_lock(url):
+            if os.path.isdir(path):
+                if not self.offline:
+                    trace.run(["git", "-C", path, "remote", "update", "--prune"],
+                              check=True, stdout=subprocess.DEVNULL)
+            elif self.offline:
+                raise CacheMiss(f"{url} is not in the cache at {self.root}")
+            else:
+                os.makedirs(self.mirrors_dir, exist_ok=True)
+                tmp = tempfile.mkdtemp(prefix=".mirror-", dir=self.mirrors_dir)
+                try:
+                    trace.run(["git", "clone", "--quiet", "--mirror", url, tmp], check=True)
+                    os.rename(tmp, path)
+                except BaseException:
+                    shutil.rmtree(tmp, ignore_errors=True)
+                    raise
+            os.utime(path)
+        return path
+
+    # -- downloads -----------------------------------------------------------
+
+    def _read_index(self):
+        try:
+            with open(self.index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_index(self, index):
+        os.makedirs(self.root, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".downloads-", dir=self.root)
+        with os.fdopen(fd, "w") as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.index_path)
+
+    def blob_path(self, digest):
+        """Return where the blob with the given sha256 lives in the cache"""
+        return os.path.join(self.blobs_dir, digest[:2], digest)
+
+    def digest(self, url):
+        """
+        Return the sha256 last downloaded from url, or None. The index outlives
+        eviction, so this is still known after the blob itself is gone.
+        """
+        with self._lock:
+            return self._read_index().get(url)
+
+    def lookup(self, url):
+        """Return the cached blob for url, or None"""
+        digest = self.digest(url)
+        if digest:
+            path = self.blob_path(digest)
+            if os.path.isfile(path):
+                os.utime(path)
+                return path
+        return None
+
+    def store(self, url, src):
+        """Move a downloaded file into the cache under its content hash and return the blob path"""
+        digest = file_sha256(src)
+        path = self.blob_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if os.path.exists(path):
+            os.remove(src)
+            os.utime(path)
+        else:
+            shutil.move(src, path)
+        with self._lock:
+            index = self._read_index()
+            index[url] = digest
+            self._write_index(index)
+        return path
+
+    def fetch_file(self, urls, dest, sha256=None):
+        """
+        Put the content of the file at urls (mirrors of the same file) into dest.
+        Online, the mirrors are raced by fetch.fetch() and the result is cached;
+        offline, the URLs are only looked up in the cache.
+        """
+        from configs_cli.fetch import fetch
+
+        if isinstance(urls, str):
+            urls = [urls]
+        if not urls:
+            raise ValueError("fetch_file needs at least one URL")
+        if self.offline:
+            for url in urls:
+                blob = self.lookup(url)
+                if blob and (sha256 is None or file_sha256(blob) == sha256):
+                    shutil.copyfile(blob, dest)
+                    return url
+            raise CacheMiss(f"none of {', '.join(urls)} is in the cache at {self.root}")
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp = os.path.join(self.root, f".download-{os.getpid()}-{threading.get_ident()}")
+        with trace.span("download " + urls[0], "download", urls=urls) as attrs:
+            url = fetch(urls, tmp, sha256=sha256)
+            attrs["url"] = url
+        shutil.copyfile(self.store(url, tmp), dest)
+        return url
+
+    # -- eviction ------------------------------------------------------------
+
+    def entries(self):
+        """Return (last_used, size, path) for every mirror and blob in the cache"""
+        found = []
+        if os.path.isdir(self.mirrors_dir):
+            for entry in os.scandir(self.mirrors_dir):
+                if entry.name.endswith(".git") and not entry.name.startswith("."):
+                    found.append((entry.stat().st_mtime, tree_size(entry.path), entry.path))
+        if os.path.isdir(self.blobs_dir):
+            for bucket in os.scandir(self.blobs_dir):
+                if bucket.is_dir():
+                    for entry in os.scandir(bucket.path):
+                        st = entry.stat()
+                        found.append((st.st_mtime, st.st_size, entry.path))
+        return found
+
+    def evict(self):
+        """Remove least recently used artifacts until the cache fits in max_size"""
+        if not self.max_size:
+            return []
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        removed = []
+        for _, size, path in entries:
+            if total <= self.max_size:
+                break
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            else:
+                os.remove(path)
+            total -= size
+            removed.append(path)
+        if removed:
+            print(f"Evicted {len(removed)} cached artifacts from {self.root}")
+        return removed
@@ -0,0 +1,83 @@
+"""Bounded, concurrent git clone pool for every repository setup fetches."""
+import os
+import shutil
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from configs_cli import trace
+from configs_cli.cache import CacheMiss
+
+
+class Repository:
+    """A git repository setup needs and where it should be checked out"""
+
+    def __init__(self, name, url, dest, depth=1, branch=None):
+        self.name = name
+        self.url = url
+        self.dest = dest
+        self.depth = depth
+        self.branch = branch
+
+    def __repr__(self):
+        return f"Repository({self.name!r}, {self.url!r}, {self.dest!r})"
+
+
+def clone_command(repo, source=None):
+    """Build the git command that clones one repository, optionally from a local mirror"""
+    cmd = ["git", "clone", "--quiet"]
+    if repo.depth:
+        cmd += ["--depth", str(repo.depth)]
+    if repo.branch:
+        cmd += ["--branch", repo.branch]
+    return cmd + [source or repo.url, repo.dest]
+
+
+def clone_repository(repo, cache=None):
+    """
+    Clone a single repository unless its destination already exists.
+    With a cache the clone is made from the cached bare mirror and origin is
+    pointed back at the real URL afterwards.
+    A failed clone removes whatever it left behind, so a later run retries it.
+    """
+    if os.path.exists(repo.dest):
+        return False
+    parent = os.path.dirname(repo.dest)
+    if parent:
+        os.makedirs(parent, exist_ok=True)
+    try:
+        if cache is not None:
+            # file:// makes git honour --depth for a local source
+            mirror = cache.ensure_mirror(repo.url)
+            trace.run(clone_command(repo, "file://" + mirror), check=True)
+            trace.run(["git", "-C", repo.dest, "remote", "set-url", "origin", repo.url], check=True)
+        else:
+            trace.run(clone_command(repo), check=True)
+    except (subprocess.CalledProcessError, OSError, CacheMiss):
+        if os.path.lexists(repo.dest):
+            shutil.rmtree(repo.dest, ignore_errors=True)
+        raise
+    return True
+
+
+def clone_all(repos, jobs=4, cache=None):
+    """
+    Clone all repositories at once, with at most `jobs` clones in flight.
+    Failures are isolated per repository: the result maps each repository name
+    to None on success (or if it was already present) and to the error otherwise.
+    """
+    repos = list(repos)
+    results = {}
+    if not repos:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, int(jobs))) as pool:
+        futures = {repo.name: pool.submit(clone_repository, repo, cache) for repo in repos}
+        for repo in repos:
+            try:
+                if futures[repo.name].result():
+                    print(f"Cloned {repo.name} into {repo.dest}")
+                results[repo.name] = None
+            except (subprocess.CalledProcessError, OSError, CacheMiss) as e:
+                print(f"Warning: failed to clone {repo.name} from {repo.url}: {e}")
+                results[repo.name] = e
+    return results
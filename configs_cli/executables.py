@@ -0,0 +1,121 @@
+"""
+Memoized index of the executables on PATH.
+
+PATH is scanned once (one os.scandir per directory) and every lookup after that
+is a dictionary hit. Call refresh_executables() after anything that installs
+software.
+"""
+import os
+import threading
+
+# Tools setup and the shell configuration rely on, grouped by what needs them
+REQUIRED_TOOLS = {
+    "setup": ["git", "sudo", "pacman", "makepkg", "systemctl", "chsh", "gem", "ruby"],
+    "shell": ["zsh", "tmux", "nvim", "kitty", "colorls"],
+    "desktop": ["i3", "i3-msg", "picom", "feh", "rofi", "dunst"],
+    "aur": ["yay"],
+}
+
+
+class ExecutableIndex:
+    """Name -> path of the first executable with that name on a PATH"""
+
+    def __init__(self, path=None):
+        self.path = os.environ.get("PATH", os.defpath) if path is None else path
+        self._candidates = None
+        self._resolved = {}
+        self._lock = threading.Lock()
+
+    def _scan(self):
+        candidates = {}
+        seen = set()
+        for directory in self.path.split(os.pathsep):
+            directory = directory or os.curdir
+            if directory in seen:
+                continue
+            seen.add(directory)
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        candidates.setdefault(entry.name, []).append(entry.path)
+            except OSError:
+                continue
+        return candidates
+
+    def which(self, name):
+        """Return the path of the executable called name, or None"""
+        if os.sep in name:
+            return name if os.path.isfile(name) and os.access(name, os.X_OK) else None
+        with self._lock:
+            if name in self._resolved:
+                return self._resolved[name]
+            if self._candidates is None:
+                self._candidates = self._scan()
+            found = None
+            for path in self._candidates.get(name, ()):
+                if os.path.isfile(path) and os.access(path, os.X_OK):
+                    found = path
+                    break
+            self._resolved[name] = found
+            return found
+
+    def find(self, names):
+        """Return {name: path or None} for all the names, scanning PATH at most once"""
+        return {name: self.which(name) for name in names}
+
+    def missing(self, names):
+        """Return the names (in order) that are not found on PATH"""
+        return [name for name, path in self.find(names).items() if path is None]
+
+    def refresh(self):
+        """Forget everything, so the next lookup rescans PATH"""
+        with self._lock:
+            self.path = os.environ.get("PATH", os.defpath)
+            self._candidates = None
+            self._resolved = {}
+
+
+_index = ExecutableIndex()
+
+
+def _current_index():
+    if _index.path != os.environ.get("PATH", os.defpath):
+        _index.refresh()
+    return _index
+
+
+def which(name):
+    """Look name up in the process-wide executable index"""
+    return _current_index().which(name)
+
+
+def find_executables(names):
+    """Return {name: path or None} for many names in one call"""
+    return _current_index().find(names)
+
+
+def missing_executables(names):
+    """Return the names that are not on PATH, in one call"""
+    return _current_index().missing(names)
+
+
+def refresh_executables():
+    """Rescan PATH on the next lookup; call this after installing software"""
+    _index.refresh()
+
+
+def doctor():
+    """Report which required tools are present; returns True if none are missing"""
+    found = find_executables([tool for tools in REQUIRED_TOOLS.values() for tool in tools])
+    all_present = True
+    for group, tools in REQUIRED_TOOLS.items():
+        print(f"\n{group}:")
+        for tool in tools:
+            path = found[tool]
+            if path:
+                print(f"\033[92m✓\033[0m {tool}: {path}")
+            else:
+                print(f"\033[91m✗\033[0m {tool}: not found")
+                all_present = False
+    print()
+    return all_present
@@ -0,0 +1,140 @@
+"""
+In-process HTTP downloads with hedged requests across mirrors.
+
+fetch() asks the first mirror, and if it has not delivered a good file within
+the hedge delay, asks the next one as well (a mirror that fails outright hands
+over immediately). The first complete response whose sha256 matches, when one
+is expected, wins; the others are abandoned. Every attempt streams into its own
+temporary file next to the destination, and the winner is renamed into place,
+so dest is never seen half-written. Socket timeouts bound each request, so a
+stalled mirror costs the hedge delay rather than minutes.
+"""
+import atexit
+import hashlib
+import os
+import queue
+import tempfile
+import threading
+import time
+import urllib.request
+
+HEDGE_DELAY = 0.3  # seconds before the next mirror is asked as well
+TIMEOUT = 10.0  # seconds for the connection and for each read
+CHUNK_SIZE = 64 * 1024
+USER_AGENT = "configs-cli"
+
+
+# Temporary files of attempts still running; a stalled loser can outlive fetch()
+_in_flight = set()
+
+
+@atexit.register
+def _remove_in_flight():
+    for path in list(_in_flight):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+class FetchError(OSError):
+    """No mirror delivered the file"""
+
+
+class _Cancelled(Exception):
+    pass
+
+
+def _attempt(url, directory, sha256, timeout, deadline, cancelled, lock, results):
+    """Download url into a temporary file and report (url, path, error) on results"""
+    fd, tmp = tempfile.mkstemp(prefix=".fetch-", dir=directory)
+    _in_flight.add(tmp)
+    try:
+        digest = hashlib.sha256()
+        request = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
+        with os.fdopen(fd, "wb") as out, urllib.request.urlopen(request, timeout=timeout) as response:
+            while True:
+                if cancelled.is_set():
+                    raise _Cancelled()
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError("took longer than the overall deadline")
+                chunk = response.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                out.write(chunk)
+                digest.update(chunk)
+        if sha256 and digest.hexdigest() != sha256.lower():
+            raise FetchError(f"sha256 mismatch: expected {sha256}, got {digest.hexdigest()}")
+        with lock:
+            # Once a winner is chosen nobody collects this file, so it goes
+            if cancelled.is_set():
+                raise _Cancelled()
+            results.put((url, tmp, None))
+    except BaseException as e:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        if not isinstance(e, _Cancelled):
+            results.put((url, None, e))
+    finally:
+        _in_flight.discard(tmp)
+
+
+def fetch(urls, dest, sha256=None, hedge_delay=HEDGE_DELAY, timeout=TIMEOUT, deadline=None):
+    """
+    Download the first good copy of the file from urls (mirrors of the same
+    file, in order of preference) to dest and return the URL it came from.
+    deadline is an optional limit in seconds for the whole fetch.
+    Raises FetchError when no mirror delivers, and ValueError when urls is empty.
+    """
+    if isinstance(urls, str):
+        urls = [urls]
+    if not urls:
+        raise ValueError("fetch needs at least one URL")
+    directory = os.path.dirname(os.path.abspath(dest))
+    os.makedirs(directory, exist_ok=True)
+    ends = time.monotonic() + deadline if deadline else None
+    results = queue.Queue()
+    cancelled = threading.Event()
+    lock = threading.Lock()
+    pending = list(urls)
+    running = 0
+    errors = []
+
+    def start_next():
+        url = pending.pop(0)
+        threading.Thread(target=_attempt, args=(url, directory, sha256, timeout, ends, cancelled, lock, results),
+                         name=f"fetch {url}", daemon=True).start()
+        return 1
+
+    running += start_next()
+    try:
+        while running:
+            wait = hedge_delay if pending else None
+            if ends is not None:
+                remaining = ends - time.monotonic()
+                if remaining <= 0:
+                    break
+                wait = remaining if wait is None else min(wait, remaining)
+            try:
+                url, tmp, error = results.get(timeout=wait)
+            except queue.Empty:
+                # Hedge: the mirrors asked so far are slow, ask the next one too
+                if pending:
+                    running += start_next()
+                continue
+            running -= 1
+            if error is None:
+                os.replace(tmp, dest)
+                return url
+            errors.append(f"{url}: {error}")
+            if pending:
+                running += start_next()
+    finally:
+        with lock:
+            cancelled.set()
+        # Files from attempts that finished while the winner was being chosen
+        while not results.empty():
+            _, tmp, _ = results.get_nowait()
+            if tmp and os.path.exists(tmp):
+                os.remove(tmp)
+    if running:
+        errors.append(f"gave up after {deadline} s")
+    raise FetchError("could not download the file: " + "; ".join(errors))
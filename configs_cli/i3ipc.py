@@ -0,0 +1,104 @@
+"""
+A minimal client for the i3 IPC protocol.
+
+Every message, in both directions, is the magic string "i3-ipc", the payload
+length and the message type as native-endian 32-bit integers, then a JSON
+payload. Replies carry the type of the request; events have the high bit set.
+"""
+import json
+import os
+import select
+import socket
+import struct
+import subprocess
+
+MAGIC = b"i3-ipc"
+HEADER = struct.Struct("=6sII")
+
+RUN_COMMAND = 0
+SUBSCRIBE = 2
+EVENT_BIT = 0x80000000
+WINDOW_EVENT = EVENT_BIT | 3
+
+
+class I3Error(OSError):
+    """i3 could not be reached or answered something unexpected"""
+
+
+def socket_path():
+    """The i3 IPC socket: $I3SOCK, else what `i3 --get-socketpath` says"""
+    path = os.environ.get("I3SOCK")
+    if path:
+        return path
+    try:
+        result = subprocess.run(["i3", "--get-socketpath"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.TimeoutExpired) as e:
+        raise I3Error(f"cannot find the i3 socket: {e}")
+    if result.returncode != 0 or not result.stdout.strip():
+        raise I3Error("cannot find the i3 socket: is i3 running?")
+    return result.stdout.strip()
+
+
+class Connection:
+    """One IPC connection; a subscribed connection receives events between replies"""
+
+    def __init__(self, path=None):
+        self.path = path or socket_path()
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.sock.connect(self.path)
+        except OSError as e:
+            self.sock.close()
+            raise I3Error(f"cannot connect to i3 at {self.path}: {e}")
+
+    def close(self):
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def send(self, kind, payload=""):
+        data = payload.encode()
+        self.sock.sendall(HEADER.pack(MAGIC, len(data), kind) + data)
+
+    def _read_exactly(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise I3Error("i3 closed the connection")
+            data += chunk
+        return data
+
+    def receive(self, timeout=None):
+        """Return the next (type, payload) message, or None if nothing arrives within timeout seconds"""
+        # Wait for the start of a message, then read all of it, so a timeout never splits one
+        if not select.select([self.sock], [], [], timeout)[0]:
+            return None
+        magic, length, kind = HEADER.unpack(self._read_exactly(HEADER.size))
+        if magic != MAGIC:
+            raise I3Error(f"not an i3 IPC message: {magic!r}")
+        return kind, json.loads(self._read_exactly(length))
+
+    def request(self, kind, payload=""):
+        """Send a message and return the payload of its reply, skipping any events in between"""
+        self.send(kind, payload)
+        while True:
+            reply_kind, reply = self.receive()
+            if reply_kind == kind:
+                return reply
+
+    def command(self, command):
+        """Run i3 commands; raises I3Error if any of them failed"""
+        replies = self.request(RUN_COMMAND, command)
+        errors = [reply.get("error", "failed") for reply in replies if not reply.get("success")]
+        if errors:
+            raise I3Error(f"{command!r}: {'; '.join(errors)}")
+        return replies
+
+    def subscribe(self, events):
+        if not self.request(SUBSCRIBE, json.dumps(events)).get("success"):
+            raise I3Error(f"i3 refused the subscription to {events}")
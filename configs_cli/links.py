@@ -0,0 +1,176 @@
+"""
+Declarative link manifest and the plan/apply engine behind `setup` and `check-links`.
+
+The manifest says which repository path each managed home path should link to.
+plan_links() compares it with the live filesystem in a single scandir pass per
+parent directory, and apply_links() only touches the links that differ.
+"""
+import os
+
+from configs_cli.ui import print_step
+
+
+class Link:
+    """A managed symlink: repository-relative source, home-relative destination"""
+
+    def __init__(self, src, dest, description, de=None):
+        self.src = src
+        self.dest = dest
+        self.description = description
+        self.de = de  # only linked for this desktop environment, if set
+
+    def __repr__(self):
+        return f"Link({self.src!r}, {self.dest!r})"
+
+
+LINKS = [
+    Link("dotfiles/zshrc", ".zshrc", "zshrc"),
+    Link("dotfiles/tmux.conf", ".tmux.conf", "tmux.conf"),
+    Link("config/nvim", ".config/nvim", "nvim config"),
+    Link("config/i3", ".config/i3", "i3 config", de="i3"),
+    Link("config/picom", ".config/picom", "picom config"),
+    Link("config/kitty", ".config/kitty", "kitty config"),
+]
+
+OK = "ok"
+MISSING = "missing"
+WRONG_TARGET = "wrong-target"
+NOT_A_LINK = "not-a-link"
+
+
+class LinkAction:
+    """The planned state of one link: where it is, where it should point, and what is there now"""
+
+    def __init__(self, link, src, dest, status, current=None):
+        self.link = link
+        self.src = src
+        self.dest = dest
+        self.status = status
+        self.current = current  # current link target, for existing symlinks
+
+    @property
+    def needs_change(self):
+        return self.status != OK
+
+    def __repr__(self):
+        return f"LinkAction({self.dest!r}, {self.status!r})"
+
+
+def manifest(de=None):
+    """Return the links that apply to a desktop environment (all of them if de is None)"""
+    return [link for link in LINKS if de is None or link.de in (None, de)]
+
+
+def plan_links(repo_dir, home=None, de=None, links=None):
+    """
+    Compare the manifest with the filesystem and return one LinkAction per link.
+    Each parent directory is read with a single os.scandir call.
+    """
+    home = home or os.path.expanduser("~")
+    repo_dir = os.path.abspath(repo_dir)
+    links = manifest(de) if links is None else links
+
+    listings = {}
+    plan = []
+    for link in links:
+        src = os.path.join(repo_dir, link.src)
+        dest = os.path.join(home, link.dest)
+        parent, name = os.path.split(dest)
+        if parent not in listings:
+            try:
+                with os.scandir(parent) as entries:
+                    listings[parent] = {entry.name: entry for entry in entries}
+            except OSError:
+                listings[parent] = {}
+        entry = listings[parent].get(name)
+        if entry is None:
+            plan.append(LinkAction(link, src, dest, MISSING))
+        elif entry.is_symlink():
+            current = os.readlink(dest)
+            status = OK if current == src else WRONG_TARGET
+            plan.append(LinkAction(link, src, dest, status, current))
+        else:
+            plan.append(LinkAction(link, src, dest, NOT_A_LINK))
+    return plan
+
+
+def swap_link(src, dest):
+    """Point dest at src by creating a temporary link and renaming it over dest"""
+    tmp = f"{dest}.configs-cli-{os.getpid()}"
+    if os.path.lexists(tmp):
+        os.remove(tmp)
+    os.symlink(src, tmp)
+    os.replace(tmp, dest)
+
+
+def apply_links(plan, snapshot=None):
+    """
+    Create or fix every link in the plan that differs; returns the actions applied.
+    With a snapshot, whatever was at each changed path is recorded in it (real
+    files and directories are moved aside) so the change can be rolled back;
+    without one, real files and directories in the way are deleted.
+    """
+    applied = []
+    for action in plan:
+        if not action.needs_change:
+            continue
+        os.makedirs(os.path.dirname(action.dest), exist_ok=True)
+        if snapshot is not None:
+            snapshot.record(action.dest)
+        elif action.status == NOT_A_LINK:
+            # A real file or directory cannot be replaced by rename()
+            if os.path.isdir(action.dest):
+                import shutil  # only needed here; keeps `check-links` startup lean
+                shutil.rmtree(action.dest)
+            else:
+                os.remove(action.dest)
+        swap_link(action.src, action.dest)
+        print(f"Created symlink: {action.dest} -> {action.src}")
+        applied.append(action)
+    return applied
+
+
+def print_plan(plan):
+    """Print what applying the plan would do"""
+    changes = [action for action in plan if action.needs_change]
+    for action in plan:
+        if action.status == OK:
+            print(f"  = {action.dest} -> {action.src}")
+        elif action.status == MISSING:
+            print(f"  + {action.dest} -> {action.src}")
+        elif action.status == WRONG_TARGET:
+            print(f"  ~ {action.dest} -> {action.src} (currently -> {action.current})")
+        else:
+            print(f"  ! {action.dest} -> {action.src} (replaces an existing file or directory)")
+    print(f"\n{len(changes)} of {len(plan)} links to change")
+
+
+def check_symlinks(repo_dir, show_plan=False):
+    """Check all symlinks created by configs-cli against the link manifest"""
+    plan = plan_links(repo_dir)
+    
+    if show_plan:
+        print_step("Link plan")
+        print_plan(plan)
+        return
+    
+    print_step("Checking symlinks status")
+    
+    def check_link_group(actions, header):
+        print(f"\n{header}:")
+        for action in actions:
+            description, link_path = action.link.description, action.dest
+            if action.status == NOT_A_LINK:
+                print(f"\033[93m⚠\033[0m {description}: {link_path} exists but is not a symlink")
+            elif action.status == MISSING:
+                print(f"\033[91m✗\033[0m {description}: {link_path} does not exist")
+            elif not os.path.exists(link_path):
+                print(f"\033[91m✗\033[0m {description}: {link_path} is a broken link to {action.current}")
+            elif action.status == WRONG_TARGET:
+                print(f"\033[93m⚠\033[0m {description}: {link_path} -> {action.current} (expected {action.src})")
+            else:
+                print(f"\033[92m✓\033[0m {description}: {link_path} -> {os.path.realpath(link_path)}")
+    
+    check_link_group([a for a in plan if not a.link.dest.startswith(".config/")], "Home directory symlinks")
+    check_link_group([a for a in plan if a.link.dest.startswith(".config/")], "Config directory symlinks")
+    print()  # Add final newline for cleaner output
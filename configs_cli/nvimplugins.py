@@ -0,0 +1,175 @@
+"""
+Neovim plugins checked out ahead of the first editor launch.
+
+lazy.nvim clones every plugin in config/nvim/lazy-lock.json the first time
+nvim starts, one after the other while the editor waits. Setup does that work
+instead: the plugin URLs are read from the lua specs, each plugin is cloned
+from the artifact cache's bare mirror (a local clone, so the objects are
+hard-linked rather than copied) into lazy's data directory, and its branch is
+pointed at the locked commit. Plugins are handled concurrently, and one whose
+checkout is already at the locked commit is skipped without running git.
+"""
+import json
+import os
+import re
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from configs_cli import trace
+from configs_cli.cache import CacheMiss
+from configs_cli.update import local_head
+
+LAZY_DIR = os.path.join(".local", "share", "nvim", "lazy")
+
+# "owner/repo" plugin specs and full GitHub URLs in the lua config
+SPEC = re.compile(r"""["']([\w.-]+)/([\w.-]+)["']""")
+GITHUB_URL = re.compile(r"""["']https://github\.com/([\w.-]+)/([\w.-]+?)(?:\.git)?["']""")
+# An explicit `name = "..."` renames the spec before it
+NAME = re.compile(r"""\bname\s*=\s*["']([\w.-]+)["']""")
+
+UP_TO_DATE = "up to date"
+CLONED = "cloned"
+MOVED = "moved"
+FAILED = "failed"
+
+
+class Plugin:
+    """A locked plugin and where lazy.nvim expects its checkout"""
+
+    def __init__(self, name, url, branch, commit, dest):
+        self.name = name
+        self.url = url
+        self.branch = branch
+        self.commit = commit
+        self.dest = dest
+
+    def __repr__(self):
+        return f"Plugin({self.name!r}, {self.commit[:10]!r})"
+
+
+def read_lockfile(path):
+    """Return {plugin name: (branch, commit)} from a lazy-lock.json"""
+    with open(path) as f:
+        return {name: (entry.get("branch"), entry["commit"]) for name, entry in json.load(f).items()}
+
+
+def plugin_urls(nvim_dir):
+    """Map plugin names to clone URLs by scanning the lua files under nvim_dir"""
+    urls = {}
+    for dirpath, _, filenames in os.walk(nvim_dir):
+        for filename in sorted(filenames):
+            if not filename.endswith(".lua"):
+                continue
+            with open(os.path.join(dirpath, filename)) as f:
+                text = f.read()
+            found = sorted([(m.start(), m.end(), "spec", m.groups()) for m in SPEC.finditer(text)] +
+                           [(m.start(), m.end(), "spec", m.groups()) for m in GITHUB_URL.finditer(text)] +
+                           [(m.start(), m.end(), "name", m.group(1)) for m in NAME.finditer(text)])
+            last = None
+            for _, _, kind, value in found:
+                if kind == "spec":
+                    owner, repo = value
+                    last = f"https://github.com/{owner}/{repo}.git"
+                    urls.setdefault(repo, last)
+                elif last is not None:
+                    urls.setdefault(value, last)
+    return urls
+
+
+def locked_plugins(repo_dir, target):
+    """The plugins of the repository's lockfile, and the lock names no URL was found for"""
+    nvim_dir = os.path.join(repo_dir, "config", "nvim")
+    urls = plugin_urls(nvim_dir)
+    plugins, unknown = [], []
+    for name, (branch, commit) in sorted(read_lockfile(os.path.join(nvim_dir, "lazy-lock.json")).items()):
+        if name in urls:
+            plugins.append(Plugin(name, urls[name], branch, commit, target.path(LAZY_DIR, name)))
+        else:
+            unknown.append(name)
+    return plugins, unknown
+
+
+def checked_out_commit(path):
+    """The commit a checkout is at, read from .git without running git; None if it is no checkout"""
+    if not os.path.isfile(os.path.join(path, ".git", "HEAD")):
+        return None
+    try:
+        return local_head(path)[1]
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def provision_plugin(plugin, cache):
+    """Bring one plugin checkout to its locked commit; returns (status, error)"""
+    if checked_out_commit(plugin.dest) == plugin.commit:
+        return UP_TO_DATE, None
+    try:
+        mirror = cache.ensure_mirror(plugin.url)
+        if os.path.isdir(os.path.join(plugin.dest, ".git")):
+            status = MOVED
+            trace.run(["git", "-C", plugin.dest, "fetch", "--quiet", mirror,
+                       "+refs/heads/*:refs/remotes/origin/*"], check=True)
+        else:
+            status = CLONED
+            os.makedirs(os.path.dirname(plugin.dest), exist_ok=True)
+            trace.run(["git", "clone", "--quiet", "--no-checkout", mirror, plugin.dest], check=True)
+            trace.run(["git", "-C", plugin.dest, "remote", "set-url", "origin", plugin.url], check=True)
+        # On its branch at the locked commit, the state lazy.nvim itself leaves a locked plugin in
+        branch = ["-B", plugin.branch] if plugin.branch else ["--detach"]
+        trace.run(["git", "-C", plugin.dest, "checkout", "--quiet"] + branch + [plugin.commit], check=True)
+    except (subprocess.CalledProcessError, OSError, CacheMiss) as e:
+        return FAILED, e
+    actual = checked_out_commit(plugin.dest)
+    if actual != plugin.commit:
+        return FAILED, f"checkout is at {actual}, not {plugin.commit}"
+    return status, None
+
+
+def provision_plugins(plugins, cache, jobs=8):
+    """Provision every plugin concurrently; returns {name: (status, error)}"""
+    plugins = list(plugins)
+    if not plugins:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, int(jobs))) as pool:
+        results = pool.map(lambda plugin: provision_plugin(plugin, cache), plugins)
+        return {plugin.name: result for plugin, result in zip(plugins, results)}
+
+
+def provision_nvim_plugins(repo_dir, target, cache, jobs=8):
+    """The setup step: check out every locked plugin where lazy.nvim looks for it; False if any failed"""
+    from configs_cli.ui import print_step
+
+    plugins, unknown = locked_plugins(repo_dir, target)
+    for name in unknown:
+        print(f"Warning: no plugin spec found for {name} in lazy-lock.json; lazy.nvim will install it")
+    pending = [plugin for plugin in plugins if checked_out_commit(plugin.dest) != plugin.commit]
+    if not pending:
+        print("All Neovim plugins are at their locked commits")
+        return
+    print_step(f"Checking out {len(pending)} Neovim plugins" + (" from the local cache" if cache.offline else ""))
+    results = provision_plugins(pending, cache, jobs)
+    cache.evict()
+    for plugin in pending:
+        status, error = results[plugin.name]
+        if status == FAILED:
+            print(f"Warning: could not check out {plugin.name} at {plugin.commit[:10]}: {error}")
+        elif status == MOVED:
+            print(f"Moved {plugin.name} to {plugin.commit[:10]}")
+        else:
+            print(f"Cloned {plugin.name} at {plugin.commit[:10]}")
+    return all(status != FAILED for status, _ in results.values())
+
+
+def nvim_plugins_inputs(repo_dir, target):
+    """The lockfile and the commit every plugin checkout is at"""
+    from configs_cli.state import file_digest
+
+    lockfile = os.path.join(repo_dir, "config", "nvim", "lazy-lock.json")
+    try:
+        names = sorted(read_lockfile(lockfile))
+    except (OSError, ValueError):
+        names = []
+    return {
+        "lock": file_digest(lockfile),
+        "heads": {name: checked_out_commit(target.path(LAZY_DIR, name)) for name in names},
+    }
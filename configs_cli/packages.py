@@ -0,0 +1,216 @@
+"""Package-state resolution: work out what is missing once, then install it in one go."""
+import os
+import re
+import threading
+
+from configs_cli import trace
+from configs_cli.executables import refresh_executables
+from configs_cli.privileged import privileged
+
+# Local package databases, read straight from disk. The environment overrides
+# let tests and benchmarks point at fixture directories laid out the same way.
+PACMAN_DB_DIR = os.environ.get("CONFIGS_CLI_PACMAN_DB", "/var/lib/pacman/local")
+DPKG_STATUS = os.environ.get("CONFIGS_CLI_DPKG_STATUS", "/var/lib/dpkg/status")
+
+_database = None
+_database_lock = threading.Lock()
+
+
+class PackageDatabase:
+    """In-memory index of installed packages, the names they provide and their groups"""
+
+    def __init__(self, versions=None, provides=None, groups=None):
+        self.versions = versions or {}
+        self.provides = provides or {}
+        self.groups = groups or set()
+
+    def __contains__(self, name):
+        """Whether a package, or a package providing name, is installed; groups are checked by is_installed"""
+        return name in self.versions or name in self.provides
+
+    def __len__(self):
+        return len(self.versions)
+
+    def version(self, name):
+        """Return the installed version of name (or of the package providing it), or None"""
+        if name in self.versions:
+            return self.versions[name]
+        owner = self.provides.get(name)
+        return self.versions.get(owner) if owner else None
+
+
+def _strip_constraint(dep):
+    """Turn 'sh=5.2' or 'libfoo (>= 1.0)' into the bare name"""
+    return re.split(r"[<>=\s(:]", dep.strip(), maxsplit=1)[0]
+
+
+def parse_pacman_desc(text):
+    """Parse a pacman local-db desc file into a dict of %SECTION% -> list of values"""
+    sections = {}
+    current = None
+    for line in text.splitlines():
+        if line.startswith("%") and line.endswith("%") and len(line) > 2:
+            current = sections.setdefault(line[1:-1], [])
+        elif line and current is not None:
+            current.append(line)
+        else:
+            current = None
+    return sections
+
+
+def read_pacman_db(path=PACMAN_DB_DIR):
+    """Index the pacman local database (one <name>-<version>/desc per package)"""
+    db = PackageDatabase()
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if not entry.is_dir():
+                continue
+            try:
+                with open(os.path.join(entry.path, "desc"), encoding="utf-8", errors="replace") as f:
+                    sections = parse_pacman_desc(f.read())
+            except OSError:
+                continue
+            name = (sections.get("NAME") or [None])[0]
+            if not name:
+                continue
+            db.versions[name] = (sections.get("VERSION") or [""])[0]
+            for dep in sections.get("PROVIDES", []):
+                db.provides.setdefault(_strip_constraint(dep), name)
+            db.groups.update(sections.get("GROUPS", []))
+    return db
+
+
+def read_dpkg_status(path=DPKG_STATUS):
+    """Index the dpkg status file, keeping only packages that are actually installed"""
+    db = PackageDatabase()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        paragraphs = f.read().split("\n\n")
+    for paragraph in paragraphs:
+        fields = {}
+        for line in paragraph.splitlines():
+            if line[:1] in (" ", "\t"):
+                continue  # continuation of a multi-line field we do not need
+            key, _, value = line.partition(":")
+            fields[key] = value.strip()
+        name = fields.get("Package")
+        if not name or not fields.get("Status", "").endswith(" installed"):
+            continue
+        db.versions[name] = fields.get("Version", "")
+        for dep in fields.get("Provides", "").split(","):
+            if dep.strip():
+                db.provides.setdefault(_strip_constraint(dep), name)
+    return db
+
+
+def installed_packages():
+    """
+    Return the installed-package index for this machine.
+    It is read from disk once and cached for the rest of the run; call
+    forget_installed_packages() after installing anything.
+    """
+    global _database
+    with _database_lock:
+        if _database is None:
+            if os.path.isdir(PACMAN_DB_DIR):
+                _database = read_pacman_db(PACMAN_DB_DIR)
+            elif os.path.isfile(DPKG_STATUS):
+                _database = read_dpkg_status(DPKG_STATUS)
+            else:
+                _database = PackageDatabase()
+        return _database
+
+
+def forget_installed_packages():
+    """Drop the cached index so the next query re-reads the database"""
+    global _database
+    with _database_lock:
+        _database = None
+
+
+class PackagePlan:
+    """The official-repo and AUR packages that still have to be installed"""
+
+    def __init__(self, official, aur):
+        self.official = official
+        self.aur = aur
+
+    def __bool__(self):
+        return bool(self.official or self.aur)
+
+    def __repr__(self):
+        return f"PackagePlan(official={self.official!r}, aur={self.aur!r})"
+
+
+def group_members(group):
+    """The packages `pacman -S --needed group` would consider, from the sync database; None if unknown"""
+    try:
+        result = trace.run(["pacman", "-Sgq", group], capture_output=True, text=True)
+    except OSError:
+        return None
+    members = result.stdout.split()
+    return members if result.returncode == 0 and members else None
+
+
+def is_installed(name, installed):
+    """
+    Whether name is installed: a package, something an installed package
+    provides, or a group all of whose members are installed. The local
+    database only knows the members of a group that are installed, so a
+    group it lists is expanded from the sync database.
+    """
+    if name in installed:
+        return True
+    if name not in installed.groups:
+        return False
+    members = group_members(name)
+    if members is None:
+        # No sync database to ask: the group is at least partly there
+        return True
+    return all(member in installed for member in members)
+
+
+def missing_packages(wanted, installed):
+    """Return the wanted packages that are not installed, without duplicates, in order"""
+    missing = []
+    for pkg in wanted:
+        if pkg not in missing and not is_installed(pkg, installed):
+            missing.append(pkg)
+    return missing
+
+
+def plan_packages(official, aur=(), installed=None):
+    """Compute which official and AUR packages are missing"""
+    if installed is None:
+        installed = installed_packages()
+    return PackagePlan(missing_packages(official, installed), missing_packages(aur, installed))
+
+
+def install_official(packages):
+    """
+    Refresh the sync databases and install all packages in a single pacman
+    transaction. The refresh comes with a full upgrade (-Syu): installing
+    against a refreshed database without upgrading is a partial upgrade,
+    which Arch does not support.
+    """
+    if not packages:
+        print("All official packages are already installed")
+        return
+    print(f"Installing {len(packages)} packages: {' '.join(packages)}")
+    try:
+        privileged().run(["pacman", "-Syu", "--needed", "--noconfirm"] + list(packages))
+    finally:
+        forget_installed_packages()
+        refresh_executables()
+
+
+def install_aur(packages):
+    """Install all AUR packages in a single yay transaction"""
+    if not packages:
+        print("All AUR packages are already installed")
+        return
+    print(f"Installing {len(packages)} AUR packages: {' '.join(packages)}")
+    try:
+        trace.run(["yay", "-S", "--needed", "--noconfirm"] + list(packages), check=True)
+    finally:
+        forget_installed_packages()
+        refresh_executables()
@@ -0,0 +1,327 @@
+"""
+Long-lived privileged helper.
+
+Instead of one `sudo` per privileged command, setup starts this module once as
+`sudo python -m configs_cli.privileged` and sends it requests over a pipe, one
+JSON object per line. The helper performs filesystem operations natively and
+runs commands (pacman, systemctl) as root, streaming their output back.
+
+Requests carry an "id" and an "op":
+    mkdir  path, mode
+    write  path, data, mode, owner     (atomic: temporary file + rename)
+    copy   src, dest, mode, owner      (atomic, src is read by the helper)
+    chmod  path, mode
+    chown  path, owner                 ("user:group")
+    run    cmd                         (replies with {"line": ...} until it exits)
+    batch  ops                         (runs ops in order, stops at the first error)
+Every request gets a final reply {"id": ..., "ok": true|false, "error": ...}.
+Requests are handled concurrently, each in its own thread, so a long `run`
+(a pacman transaction) does not hold up a chmod sent meanwhile; replies are
+matched to their request by id.
+
+Test mode: with `--root DIR` (or CONFIGS_CLI_PRIVILEGED_ROOT=DIR on the client
+side) every path is taken relative to DIR, ownership changes are skipped when
+not running as root, and the helper is started without sudo.
+"""
+import json
+import os
+import shutil
+import subprocess
+import sys
+import queue
+import tempfile
+import threading
+
+ROOT_ENV = "CONFIGS_CLI_PRIVILEGED_ROOT"
+
+
+class PrivilegedError(OSError):
+    """A privileged operation failed, or the helper could not be started"""
+
+
+# -- helper side -------------------------------------------------------------
+
+def parse_owner(owner):
+    """Turn "user:group" into (uid, gid)"""
+    import grp
+    import pwd
+    user, _, group = owner.partition(":")
+    uid = pwd.getpwnam(user).pw_uid if user else -1
+    gid = grp.getgrnam(group).gr_gid if group else -1
+    return uid, gid
+
+
+class Helper:
+    """Carries out requests, mapping paths into root when one is given"""
+
+    def __init__(self, root=None, out=None):
+        self.root = os.path.abspath(root) if root else None
+        self.out = out or sys.stdout
+        self._out_lock = threading.Lock()
+
+    def path(self, path):
+        if self.root is None:
+            return path
+        return os.path.join(self.root, os.path.abspath(path).lstrip("/"))
+
+    def reply(self, message):
+        with self._out_lock:
+            self.out.write(json.dumps(message) + "\n")
+            self.out.flush()
+
+    def chown(self, path, owner):
+        # Without root (test mode) ownership cannot be changed, so it is skipped
+        if owner and os.geteuid() == 0:
+            uid, gid = parse_owner(owner)
+            os.chown(path, uid, gid)
+
+    def atomic_write(self, path, fill, mode, owner):
+        directory = os.path.dirname(path) or "."
+        fd, tmp = tempfile.mkstemp(prefix=".configs-cli-", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                fill(f)
+                f.flush()
+                os.fchmod(f.fileno(), mode)
+                os.fsync(f.fileno())
+            self.chown(tmp, owner)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def op_mkdir(self, req):
+        os.makedirs(self.path(req["path"]), mode=req.get("mode", 0o755), exist_ok=True)
+
+    def op_write(self, req):
+        data = req["data"].encode()
+        self.atomic_write(self.path(req["path"]), lambda f: f.write(data),
+                          req.get("mode", 0o644), req.get("owner"))
+
+    def op_copy(self, req):
+        with open(req["src"], "rb") as src:
+            self.atomic_write(self.path(req["dest"]), lambda f: shutil.copyfileobj(src, f),
+                              req.get("mode", 0o644), req.get("owner"))
+
+    def op_chmod(self, req):
+        os.chmod(self.path(req["path"]), req["mode"])
+
+    def op_chown(self, req):
+        self.chown(self.path(req["path"]), req["owner"])
+
+    def op_run(self, req):
+        proc = subprocess.Popen(req["cmd"], stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                                stdin=subprocess.DEVNULL)
+        for line in proc.stdout:
+            self.reply({"id": req["id"], "line": line.decode(errors="replace").rstrip("\n")})
+        return {"exit_code": proc.wait()}
+
+    def op_batch(self, req):
+        for index, op in enumerate(req["ops"]):
+            try:
+                self.dispatch(dict(op, id=req["id"]))
+            except Exception as e:
+                raise PrivilegedError(f"operation {index + 1} ({op.get('op')}) failed: {e}") from e
+        return {"done": len(req["ops"])}
+
+    def dispatch(self, req):
+        handler = getattr(self, "op_" + str(req.get("op")), None)
+        if handler is None:
+            raise PrivilegedError(f"unknown operation {req.get('op')!r}")
+        return handler(req) or {}
+
+    def handle(self, line):
+        req = {}
+        try:
+            req = json.loads(line)
+            result = self.dispatch(req)
+            self.reply(dict(result, id=req.get("id"), ok=True))
+        except Exception as e:
+            self.reply({"id": req.get("id"), "ok": False, "error": f"{type(e).__name__}: {e}"})
+
+    def serve(self, stream):
+        """Handle requests, each in its own thread, until the client closes the pipe"""
+        threads = []
+        for line in stream:
+            if not line.strip():
+                continue
+            thread = threading.Thread(target=self.handle, args=(line,))
+            thread.start()
+            threads.append(thread)
+            threads = [thread for thread in threads if thread.is_alive()]
+        for thread in threads:
+            thread.join()
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description="configs-cli privileged helper (speaks JSON lines on stdin/stdout)")
+    parser.add_argument("--root", default=None, help="Treat every path as relative to this directory (test mode)")
+    args = parser.parse_args(argv)
+    Helper(args.root).serve(sys.stdin)
+
+
+# -- client side -------------------------------------------------------------
+
+class PrivilegedClient:
+    """Starts the helper on first use; requests from several threads share it, matched by id"""
+
+    def __init__(self, root=None):
+        self.root = root if root is not None else os.environ.get(ROOT_ENV) or None
+        self._proc = None
+        self._reader = None
+        self._next_id = 0
+        self._pending = {}  # request id -> queue of its replies
+        self._exited = False
+        self._lock = threading.Lock()
+
+    def command(self):
+        """The command line that starts the helper"""
+        cmd = [sys.executable, "-m", "configs_cli.privileged"]
+        if self.root:
+            return cmd + ["--root", self.root]
+        return ["sudo"] + cmd
+
+    def _start(self):
+        from configs_cli import trace
+        cmd = self.command()
+        # -m puts the working directory on sys.path, which keeps the package
+        # importable under sudo even when it is not installed for root
+        package_parent = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        with trace.span(" ".join(cmd), "command", cmd=cmd, helper=True):
+            try:
+                self._proc = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                              cwd=package_parent, text=True, bufsize=1)
+            except OSError as e:
+                raise PrivilegedError(f"could not start the privileged helper: {e}") from e
+        self._reader = threading.Thread(target=self._read_replies, args=(self._proc.stdout,), daemon=True)
+        self._reader.start()
+
+    def _read_replies(self, stdout):
+        """Hand every reply to the queue of its request; None tells them all the helper is gone"""
+        for line in stdout:
+            reply = json.loads(line)
+            with self._lock:
+                replies = self._pending.get(reply.get("id"))
+            if replies is not None:
+                replies.put(reply)
+        with self._lock:
+            for replies in self._pending.values():
+                replies.put(None)
+            self._pending.clear()
+            self._exited = True
+
+    def _request(self, op, on_line=None, **fields):
+        with self._lock:
+            if self._proc is None:
+                self._start()
+            if self._exited:
+                raise PrivilegedError("the privileged helper exited (was sudo refused?)")
+            self._next_id += 1
+            request = dict(fields, op=op, id=self._next_id)
+            replies = self._pending[request["id"]] = queue.Queue()
+            try:
+                self._proc.stdin.write(json.dumps(request) + "\n")
+                self._proc.stdin.flush()
+            except OSError as e:
+                del self._pending[request["id"]]
+                raise PrivilegedError(f"the privileged helper is not running: {e}") from e
+        # Only sending holds the lock; other threads' requests go out while this one waits
+        try:
+            while True:
+                reply = replies.get()
+                if reply is None:
+                    raise PrivilegedError("the privileged helper exited (was sudo refused?)")
+                if "line" in reply:
+                    if on_line:
+                        on_line(reply["line"])
+                    continue
+                return reply
+        finally:
+            with self._lock:
+                self._pending.pop(request["id"], None)
+
+    def _checked(self, op, **fields):
+        from configs_cli import trace
+        with trace.span(f"privileged {op}", "privileged"):
+            reply = self._request(op, **fields)
+        if not reply.get("ok"):
+            raise PrivilegedError(reply.get("error", "unknown error"))
+        return reply
+
+    def mkdir(self, path, mode=0o755):
+        return self._checked("mkdir", path=path, mode=mode)
+
+    def write(self, path, data, mode=0o644, owner=None):
+        return self._checked("write", path=path, data=data, mode=mode, owner=owner)
+
+    def copy(self, src, dest, mode=0o644, owner=None):
+        return self._checked("copy", src=os.path.abspath(src), dest=dest, mode=mode, owner=owner)
+
+    def chmod(self, path, mode):
+        return self._checked("chmod", path=path, mode=mode)
+
+    def chown(self, path, owner):
+        return self._checked("chown", path=path, owner=owner)
+
+    def batch(self, ops):
+        """Run several operations in one round trip, e.g. [{"op": "mkdir", "path": ...}, ...]"""
+        ops = [dict(op, src=os.path.abspath(op["src"])) if "src" in op else op for op in ops]
+        return self._checked("batch", ops=ops)
+
+    def run(self, cmd, check=True):
+        """Run cmd as root, streaming its output like runner.run(); returns the exit code"""
+        from configs_cli import runner, trace, ui
+        cmd = [str(part) for part in cmd]
+        prefix = runner.current_step.get() or os.path.basename(cmd[0])
+        counter = [0]
+
+        def show(line):
+            counter[0] += len(line) + 1
+            ui.emit(prefix, line)
+
+        with trace.span(" ".join(cmd), "command", cmd=cmd, privileged=True) as attrs:
+            reply = self._request("run", on_line=show, cmd=cmd)
+            if not reply.get("ok"):
+                raise PrivilegedError(reply.get("error", "unknown error"))
+            attrs["exit_code"] = reply["exit_code"]
+            attrs["output_bytes"] = counter[0]
+        if check and reply["exit_code"] != 0:
+            raise subprocess.CalledProcessError(reply["exit_code"], cmd)
+        return reply["exit_code"]
+
+    def close(self):
+        """Stop the helper; it exits when its stdin is closed"""
+        with self._lock:
+            proc, reader = self._proc, self._reader
+            self._proc = self._reader = None
+        if proc is not None:
+            proc.stdin.close()
+            proc.wait()
+            reader.join()
+            self._exited = False
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def privileged():
+    """Return the process-wide helper client; the helper itself starts on first use"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = PrivilegedClient()
+        return _client
+
+
+def close_privileged():
+    """Stop the helper if it was started"""
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+
+
+if __name__ == "__main__":
+    main()
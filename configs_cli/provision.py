@@ -0,0 +1,748 @@
+"""The `configs-cli setup` steps: packages, clones, Oh My Zsh, links, keyboard and shell."""
+import subprocess
+import os
+import sys
+import shutil
+import tempfile
+
+from configs_cli import trace
+from configs_cli.cache import ArtifactCache, CacheMiss
+from configs_cli.clone import Repository, clone_all
+from configs_cli.executables import missing_executables, refresh_executables, which
+from configs_cli.links import apply_links, manifest, plan_links, print_plan
+from configs_cli.nvimplugins import LAZY_DIR, nvim_plugins_inputs, provision_nvim_plugins
+from configs_cli.rcfile import edit_rc_file
+from configs_cli.reload import reload_i3, reload_tmux
+from configs_cli.privileged import PrivilegedError, close_privileged, privileged
+from configs_cli.packages import install_aur, install_official, installed_packages, plan_packages
+from configs_cli.scheduler import Step, run_steps
+from configs_cli.services import Service, reconcile_services
+from configs_cli.shellinit import compile_inputs, compile_shell, default_output_dir
+from configs_cli.snapshots import SnapshotStore
+from configs_cli.state import StateJournal, file_digest, path_state
+from configs_cli.target import Target
+from configs_cli.toolchain import ruby_toolchain
+from configs_cli.ui import print_step
+
+# Standard directories created under the home directory, and their subdirectories
+STANDARD_DIRS = {
+    "Documents": ["Projects", "Work", "Personal"],
+    "Downloads": ["temp"],
+    "Pictures": ["screenshots", "wallpapers"],
+    "Videos": [],
+    ".config": [],
+    ".local/share": [],
+    ".local/bin": [],
+    ".cache": [],
+    "Github": []
+}
+
+# Directories under a home that setup fills, besides the links and STANDARD_DIRS
+HOME_TREES = [".zsh", ".tmux", ".oh-my-zsh"]
+
+OH_MY_ZSH_INSTALLER_URLS = [
+    "https://install.ohmyz.sh",
+    "https://raw.githubusercontent.com/ohmyzsh/ohmyzsh/master/tools/install.sh",
+]
+
+def user_repositories(target):
+    """
+    The repositories every provisioned home gets a checkout of.
+    Plugins are cloned under ~/.zsh rather than into ~/.oh-my-zsh, because the
+    Oh My Zsh installer refuses to run when its directory already exists.
+    """
+    return [
+        Repository("catppuccin-zsh-syntax-highlighting",
+                   "https://github.com/catppuccin/zsh-syntax-highlighting.git",
+                   target.path(".zsh", "catppuccin-zsh-syntax-highlighting")),
+        Repository("zsh-autosuggestions",
+                   "https://github.com/zsh-users/zsh-autosuggestions.git",
+                   target.path(".zsh", "zsh-autosuggestions")),
+        Repository("zsh-autocomplete",
+                   "https://github.com/marlonrichert/zsh-autocomplete.git",
+                   target.path(".zsh", "zsh-autocomplete")),
+        Repository("tpm",
+                   "https://github.com/tmux-plugins/tpm",
+                   target.path(".tmux", "plugins", "tpm")),
+    ]
+
+def yay_build_dir(cache):
+    """Where the yay sources are cloned to when the AUR helper has to be built"""
+    return os.path.join(cache.root, "build", "yay")
+
+def yay_repository(args, cache):
+    """The yay sources, if the AUR helper has to be built; None otherwise"""
+    # System packages, yay included, are not installed into a root filesystem
+    if args.system in ["arch", "archlinux"] and not args.target.root and not which("yay"):
+        return Repository("yay", "https://aur.archlinux.org/yay.git", yay_build_dir(cache))
+    return None
+
+def managed_repositories(args, cache):
+    """Collect the git repositories the home is provisioned from, so they can be cloned together"""
+    repos = user_repositories(args.target)
+    if not os.path.isdir(args.repo):
+        # The configs repository is a working checkout, so keep its full history.
+        repos.append(Repository("configs", args.repo_url, args.repo, depth=None))
+    return repos
+
+def clone_yay(args, cache):
+    """
+    Fetch the yay sources on their own, so building yay and the pacman
+    transaction do not wait for the rest of the clones; False if it failed
+    """
+    repo = yay_repository(args, cache)
+    if repo is None or os.path.exists(repo.dest):
+        return
+    print_step("Cloning yay" + (" from the local cache" if cache.offline else ""))
+    return clone_all([repo], cache=cache)["yay"] is None
+
+def clone_repositories(args, cache):
+    """Fetch all managed repositories at once, through the artifact cache; False if any clone failed"""
+    repos = managed_repositories(args, cache)
+    if not any(not os.path.exists(repo.dest) for repo in repos):
+        print("All repositories are already cloned")
+        return
+    print_step("Cloning repositories" + (" from the local cache" if cache.offline else ""))
+    results = clone_all(repos, jobs=args.clone_jobs, cache=cache)
+    cache.evict()
+    if results.get("configs") is not None:
+        print(f"Error: could not clone the configs repository from {args.repo_url}")
+        sys.exit(1)
+    # A failed clone leaves the step unfinished, so the next run retries it
+    return all(error is None for error in results.values())
+
+def install_oh_my_zsh_theme(target):
+    """Install the Catppuccin theme and zsh plugins"""
+    # Create directories
+    themes_dir = target.path(".oh-my-zsh", "custom", "themes")
+    zsh_dir = target.path(".zsh")
+    plugins_dir = target.path(".oh-my-zsh", "custom", "plugins")
+    os.makedirs(themes_dir, exist_ok=True)
+    os.makedirs(zsh_dir, exist_ok=True)
+    os.makedirs(plugins_dir, exist_ok=True)
+    
+    # Copy the mocha theme file out of the Catppuccin theme repository
+    catppuccin_dir = os.path.join(zsh_dir, "catppuccin-zsh-syntax-highlighting")
+    theme_src = f"{catppuccin_dir}/themes/catppuccin_mocha-zsh-syntax-highlighting.zsh"
+    theme_dest = f"{zsh_dir}/catppuccin_mocha-zsh-syntax-highlighting.zsh"
+    # Refreshed when `configs-cli update` moved the repository
+    if os.path.exists(theme_src) and file_digest(theme_src) != file_digest(theme_dest):
+        print_step("Installing Catppuccin syntax highlighting theme")
+        shutil.copyfile(theme_src, theme_dest)
+
+    # Expose zsh-autosuggestions as an Oh My Zsh custom plugin. The link is
+    # relative so it stays valid when the home is copied or lives in a rootfs.
+    autosuggestions_src = os.path.join(zsh_dir, "zsh-autosuggestions")
+    autosuggestions_dir = os.path.join(plugins_dir, "zsh-autosuggestions")
+    if os.path.isdir(autosuggestions_src) and not os.path.lexists(autosuggestions_dir):
+        print_step("Installing zsh-autosuggestions plugin")
+        os.symlink(os.path.relpath(autosuggestions_src, plugins_dir), autosuggestions_dir)
+
+def oh_my_zsh_installer_urls():
+    """Mirrors of the Oh My Zsh installer, in order of preference (CONFIGS_CLI_OH_MY_ZSH_URLS overrides them)"""
+    override = os.environ.get("CONFIGS_CLI_OH_MY_ZSH_URLS", "").split()
+    return override or OH_MY_ZSH_INSTALLER_URLS
+
+def oh_my_zsh_installer_sha256(cache, urls):
+    """
+    The sha256 the installer must have. Unless CONFIGS_CLI_OH_MY_ZSH_SHA256 is
+    set this is trust on first use: whatever the first download delivered is
+    recorded in the downloads index, and later downloads must match it even
+    after the blob itself was evicted. None on the very first fetch.
+    """
+    pinned = os.environ.get("CONFIGS_CLI_OH_MY_ZSH_SHA256", "").strip()
+    if pinned:
+        return pinned.lower()
+    for url in urls:
+        digest = cache.digest(url)
+        if digest:
+            return digest
+    return None
+
+def install_oh_my_zsh(cache, target):
+    """Install Oh My Zsh if not already installed"""
+    oh_my_zsh_dir = target.path(".oh-my-zsh")
+    zshrc_backup = target.path(".zshrc.pre-oh-my-zsh")
+    
+    if not os.path.exists(oh_my_zsh_dir):
+        print_step("Installing Oh My Zsh")
+        
+        # Backup existing .zshrc if it exists
+        zshrc_path = target.path(".zshrc")
+        if os.path.exists(zshrc_path):
+            print(f"Backing up existing .zshrc to {zshrc_backup}")
+            shutil.copy2(zshrc_path, zshrc_backup)
+        # First verify zsh version
+        try:
+            zsh_version = trace.check_output(["zsh", "--version"]).decode()
+            print(f"Found ZSH: {zsh_version.strip()}")
+        except subprocess.CalledProcessError:
+            print("Error: ZSH is not properly installed")
+            sys.exit(1)
+
+        # Download the install script first for inspection
+        fd, install_script = tempfile.mkstemp(prefix="install-ohmyzsh-", suffix=".sh")
+        os.close(fd)
+        sha256 = None
+        try:
+            print_step("Downloading Oh My Zsh installer")
+            urls = oh_my_zsh_installer_urls()
+            sha256 = oh_my_zsh_installer_sha256(cache, urls)
+            if sha256 is None:
+                print("Warning: no sha256 is pinned for the Oh My Zsh installer; this download is trusted and pinned")
+            url = cache.fetch_file(urls, install_script, sha256=sha256)
+            print("Download completed successfully from", url)
+        except (OSError, CacheMiss) as e:
+            os.remove(install_script)
+            print(f"Error downloading Oh My Zsh installer: {e}")
+            if sha256:
+                print("If the installer changed upstream on purpose, set CONFIGS_CLI_OH_MY_ZSH_SHA256 to its new sha256")
+            sys.exit(1)
+
+        # Make the script executable
+        os.chmod(install_script, 0o755)
+        
+        # Run the installer
+        try:
+            print_step("Running Oh My Zsh installer")
+            # The installer works on $HOME and $ZSH, so point both at the target
+            env = dict(os.environ, HOME=target.home, ZSH=oh_my_zsh_dir)
+            trace.run([install_script, "--unattended"], check=True, env=env)
+            
+            # Remove the default .zshrc created by oh-my-zsh installation
+            zshrc_path = target.path(".zshrc")
+            if os.path.exists(zshrc_path):
+                # Compare with backup to see if it's the default oh-my-zsh config
+                if os.path.exists(zshrc_backup):
+                    with open(zshrc_path, 'r') as f1, open(zshrc_backup, 'r') as f2:
+                        if f1.read() != f2.read():
+                            print("Oh My Zsh created a new config, removing it")
+                            os.remove(zshrc_path)
+                        else:
+                            print("Restoring original .zshrc")
+                            shutil.copy2(zshrc_backup, zshrc_path)
+                else:
+                    os.remove(zshrc_path)
+        except subprocess.CalledProcessError as e:
+            print(f"Error installing Oh My Zsh: {e}")
+            sys.exit(1)
+        finally:
+            os.remove(install_script)
+    else:
+        print("Oh My Zsh is already installed")
+    install_oh_my_zsh_theme(target)
+
+def arch_packages(de):
+    """Return the official-repo and AUR packages to install on Arch for a desktop environment"""
+    # Essential packages
+    essential_packages = ["zsh", "tmux"]
+
+    # Base packages for all environments
+    base_packages = [
+        "neovim", "curl", "git", "wget", "kitty",
+        "pipewire", "pipewire-pulse", "wireplumber", "pavucontrol", "alsa-utils",
+        "networkmanager", "network-manager-applet",
+        "bluez", "bluez-utils", "blueman",
+        "discord", "ruby", "ruby-rake", "gcc",
+        "ttf-jetbrains-mono-nerd"
+    ]
+
+    # zsh plugins
+    zsh_plugins = ["zsh-syntax-highlighting", "zsh-autosuggestions", "zsh-completions"]
+
+    # Environment-specific packages
+    de_packages = {
+        "i3": [
+            "i3-wm", "i3status", "i3blocks", "i3lock",
+            "picom", "feh", "rofi", "dunst",
+            "xorg-server", "xorg-xinit", "xorg-xrandr", "xorg-xsetroot",
+            "lightdm", "lightdm-gtk-greeter"
+        ],
+        "kde": [
+            "plasma", "plasma-wayland-session", "plasma-desktop",
+            "sddm", "sddm-kcm", "plasma-sddm", "xorg-server", "xorg-xinit", "kde-applications-meta",
+            "plasma-pa", "plasma-nm", "dolphin", "konsole"
+        ]
+    }
+
+    # Combine everything with the DE-specific packages (which include SDDM for KDE)
+    core_packages = essential_packages + zsh_plugins + base_packages + de_packages[de]
+    aur_packages = ["spotify", "slack-desktop"]
+    return core_packages, aur_packages
+
+def install_dependencies(system, args, cache):
+    """Install system dependencies based on the operating system; False if anything failed"""
+    system = system.lower()
+    if args.target.root:
+        print(f"Skipping system packages and services for {args.target.root}: "
+              f"install them into the image itself (for example with pacstrap)")
+        return
+    
+    if system in ["arch", "archlinux"]:
+        print_step("Installing dependencies on Arch Linux")
+        
+        core_packages, aur_packages = arch_packages(args.de)
+        complete = True
+
+        # The tools this step runs, checked with one lookup in the executable index
+        missing = missing_executables(["pacman"] + ([] if which("yay") else ["makepkg"]))
+        if missing:
+            print(f"Error: {', '.join(missing)} not found; is this an Arch Linux system?")
+            return False
+
+        try:
+            # Work out what is missing from one query of the installed set, then
+            # install it with at most one pacman and one yay transaction.
+            plan = plan_packages(core_packages, aur_packages)
+            install_official(plan.official)
+            
+            # Check and install yay if needed, from the sources the yay-sources step fetched
+            if not which("yay"):
+                print("\nInstalling yay AUR helper...")
+                try:
+                    # A missing build directory (failed clone) raises FileNotFoundError here
+                    trace.run(["makepkg", "-si", "--noconfirm"], cwd=yay_build_dir(cache), check=True)
+                    refresh_executables()
+                    print("yay installed successfully")
+                except (subprocess.CalledProcessError, OSError):
+                    print("Failed to install yay. Please install it manually.")
+                    print("You can do this by running:")
+                    print("git clone https://aur.archlinux.org/yay.git")
+                    print("cd yay && makepkg -si")
+                    return False
+                finally:
+                    shutil.rmtree(yay_build_dir(cache), ignore_errors=True)
+
+            # Install AUR packages
+            if plan.aur and which("yay"):
+                print("\nInstalling AUR packages...")
+                try:
+                    install_aur(plan.aur)
+                except subprocess.CalledProcessError:
+                    print(f"Failed to install AUR packages: {' '.join(plan.aur)}")
+                    complete = False
+            elif plan.aur:
+                print("\nSkipping AUR packages as yay is not available")
+                complete = False
+            
+            # colorls is only installed when no gem specification for it exists
+            complete = install_gem("colorls", cache) and complete
+
+            # Enable and start what is not already running, in as few systemctl
+            # calls as possible; running services are never restarted.
+            print("\nReconciling services...")
+            # PipeWire runs in the user's service manager, not the system one
+            services = [
+                Service("NetworkManager"),
+                Service("bluetooth"),
+                Service("pipewire", user=True),
+                Service("pipewire-pulse", user=True),
+            ]
+
+            # Configure and enable display manager based on DE choice.
+            # The display manager is enabled for the next boot, not started.
+            if args.de == "i3":
+                services += [Service("sddm", enabled=False), Service("lightdm", start=False, force=True)]
+            elif args.de == "kde":
+                services += [Service("lightdm", enabled=False), Service("sddm", start=False, force=True)]
+
+                # SDDM and its Plasma components were installed with the core packages
+                print("Configuring SDDM...")
+                
+                # Create default SDDM configuration, in one round trip to the privileged helper
+                privileged().batch([
+                    {"op": "mkdir", "path": "/etc/sddm.conf.d"},
+                    {"op": "write", "path": "/etc/sddm.conf.d/kde_settings.conf", "mode": 0o644,
+                     "owner": "root:root", "data": """[General]
+Session=plasma
+[Theme]
+Current=breeze
+
+[Users]
+MaximumUid=60000
+MinimumUid=1000
+"""},
+                ])
+
+            reconcile_services(services)
+            if args.de == "i3":
+                print("\nLightDM enabled. After reboot, select i3 as your session.")
+            elif args.de == "kde":
+                print("\nSDDM configured and enabled. System will boot into KDE Plasma after restart.")
+
+            # i3 is only restarted when its config differs from the one it last loaded
+            if args.de == "i3" and args.target.is_host:
+                reload_i3(args.repo, os.path.join(args.target.state_dir(), "reload.json"))
+
+        except (subprocess.CalledProcessError, PrivilegedError) as e:
+            print(f"Error during installation: {e}")
+            print("Please check the error messages above and try to resolve any conflicts.")
+            return False
+        return complete
+
+    elif system in ["ubuntu", "debian"]:
+        print("Ubuntu/Debian support not implemented yet")
+        sys.exit(1)
+    elif system in ["macos", "mac"]:
+        print("MacOS support not implemented yet")
+        sys.exit(1)
+    elif system in ["windows"]:
+        print("Windows support not implemented yet")
+        sys.exit(1)
+    else:
+        print("Unknown system type. Please specify one of: ubuntu, arch, macos, or windows")
+        sys.exit(1)
+
+def install_gem(name, cache):
+    """Install a gem for the user unless it is already installed; False if it could not be"""
+    try:
+        toolchain = ruby_toolchain(cache.root)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Could not inspect the Ruby installation: {e}")
+        return False
+    if toolchain is None:
+        print(f"\nSkipping {name}: ruby is not installed")
+        return False
+    if toolchain.has_gem(name):
+        print(f"\n{name} is already installed")
+        return True
+    print(f"\nInstalling {name} gem...")
+    try:
+        trace.run(["gem", "install", name, "--user-install"], check=True)
+        refresh_executables()
+        print(f"{name} installed successfully")
+        return True
+    except (subprocess.CalledProcessError, OSError):
+        print(f"Failed to install {name}. You may need to install it manually with:")
+        print(f"gem install {name} --user-install")
+        return False
+
+def ruby_gem_bin_lines(cache):
+    """
+    Return the PATH lines for the Ruby gem bin directories: the system gem
+    directory's, and the versioned user directory's if it exists. The
+    directories come from the toolchain probe cached in the artifact cache.
+    """
+    try:
+        toolchain = ruby_toolchain(cache.root)
+    except (subprocess.CalledProcessError, OSError) as e:
+        print(f"Skipping gem PATH update: {e}")
+        return []
+    if toolchain is None:
+        print("Skipping gem PATH update: ruby is not installed")
+        return []
+    lines = [f'export PATH="{toolchain.bin_dir}:$PATH"']
+    if os.path.isdir(toolchain.user_bin_dir):
+        lines.append(f'export PATH="{toolchain.user_bin_dir}:$PATH"')
+    return lines
+
+def update_zshrc(zshrc_path, cache):
+    """
+    Make sure ~/.local/bin and the Ruby gem bin directories are on PATH and
+    conda references are removed, in one edit of the zshrc managed block.
+    """
+    add = ['export PATH="$HOME/.local/bin:$PATH"'] + ruby_gem_bin_lines(cache)
+    try:
+        if edit_rc_file(zshrc_path, add=add, remove=["conda"]):
+            print(f"Updated {zshrc_path}")
+        else:
+            print(f"{zshrc_path} is already up to date")
+    except OSError as e:
+        print(f"Error updating {zshrc_path}: {e}")
+
+def link_home(repo_dir, de, target):
+    """Point the target's managed paths at the repository and write its .xinitrc"""
+    # Links hold the repository path as seen from inside the target
+    plan = plan_links(target.inside(repo_dir), target.home, de)
+    # Whatever the links replace is kept in a snapshot for `configs-cli rollback`
+    if not any(action.needs_change for action in plan):
+        print("All symlinks are already in place")
+    else:
+        snapshot = SnapshotStore(os.path.join(target.state_dir(), "snapshots")).new("setup")
+        apply_links(plan, snapshot)
+        snapshot.discard()
+        if snapshot.entries:
+            print(f"Saved the replaced paths as snapshot {snapshot.id} (undo with `configs-cli rollback {snapshot.id}`)")
+
+    # DE-specific configuration
+    if de == "i3":
+        # Create xinitrc for i3; i3 starts the workspace apps itself with `configs-cli session`
+        xinitrc_path = target.path(".xinitrc")
+        xinitrc = ("#!/bin/sh\n\n"
+                   "# Start i3\n"
+                   "exec i3\n")
+        try:
+            with open(xinitrc_path) as f:
+                unchanged = f.read() == xinitrc
+        except OSError:
+            unchanged = False
+        if not unchanged:
+            with open(xinitrc_path, "w") as f:
+                f.write(xinitrc)
+            os.chmod(xinitrc_path, 0o755)
+            print("Created .xinitrc with i3 configuration")
+    elif de == "kde":
+        # KDE configs are handled by the system, no manual symlinks needed
+        print("Using KDE Plasma - configurations will be managed by the system")
+
+def compile_shell_init(repo_dir, target):
+    """Resolve the zshrc into a precompiled init file for the target's shells"""
+    if target.root is not None:
+        # Its paths would have to be probed from inside the root filesystem
+        print("Skipping the compiled shell init for a root filesystem target")
+        return
+    try:
+        compile_shell(os.path.abspath(os.path.join(repo_dir, "dotfiles", "zshrc")), home=target.home)
+    except OSError as e:
+        print(f"Could not compile the shell init: {e}")
+
+def create_symlinks(repo_dir, args, cache):
+    """Create symlinks for configuration files based on chosen environment"""
+    dotfiles_dir = os.path.join(repo_dir, "dotfiles")
+
+    # Verify that the dotfiles directory exists.
+    if not os.path.isdir(dotfiles_dir):
+        print(f"Error: {dotfiles_dir} does not exist. Please check your repository.")
+        sys.exit(1)
+    
+    # Link everything in the manifest that is missing or points elsewhere
+    link_home(repo_dir, args.de, args.target)
+    
+    # Update and clean the source dotfile
+    zshrc_src = os.path.abspath(os.path.join(dotfiles_dir, "zshrc"))
+    update_zshrc(zshrc_src, cache)
+    
+    # The tmux plugin manager (TPM) is cloned by the clone step.
+    # Only the invoking user's tmux server can be told to reload.
+    if not args.target.is_host:
+        return
+
+    # Source tmux config to load plugins
+    reload_tmux(args.target.home)
+
+def set_default_shell(shell):
+    if os.name != 'nt':
+        # Get the current shell from /etc/passwd instead of environment
+        try:
+            import pwd
+            current_shell = pwd.getpwuid(os.getuid()).pw_shell
+            if shell == current_shell:
+                print(f"Default shell is already {shell}")
+            else:
+                print_step(f"Changing default shell to {shell}")
+                trace.check_call(["chsh", "-s", shell], interactive=True)
+        except ImportError:
+            print("Could not import pwd module, falling back to environment check")
+            current_shell = os.environ.get("SHELL", "")
+            if shell not in current_shell:
+                print_step(f"Changing default shell to {shell}")
+                trace.check_call(["chsh", "-s", shell], interactive=True)
+            else:
+                print(f"Default shell is already {shell}")
+    else:
+        print("Skipping default shell change on Windows.")
+
+def configure_keyboard(repo_dir, target):
+    """Configure keyboard settings using Xorg"""
+    xorg_dir = target.host_path("/etc/X11/xorg.conf.d")
+    keyboard_conf = os.path.join(xorg_dir, "00-keyboard.conf")
+    source_conf = os.path.join(repo_dir, "config/xorg/00-keyboard.conf")
+    
+    print_step("Configuring keyboard settings")
+    
+    # Create the directory and copy the configuration in one privileged round trip
+    privileged().batch([
+        {"op": "mkdir", "path": xorg_dir},
+        {"op": "copy", "src": source_conf, "dest": keyboard_conf, "mode": 0o644, "owner": "root:root"},
+    ])
+    
+    print(f"Keyboard configuration copied to {keyboard_conf}")
+
+def setup_filesystem(target):
+    """Create standard filesystem structure"""
+    home = target.home
+    
+    print_step("Setting up filesystem structure...")
+    for parent, subdirs in STANDARD_DIRS.items():
+        parent_path = os.path.join(home, parent)
+        os.makedirs(parent_path, exist_ok=True)
+        print(f"Created: {parent_path}")
+        
+        for subdir in subdirs:
+            subdir_path = os.path.join(parent_path, subdir)
+            os.makedirs(subdir_path, exist_ok=True)
+            print(f"Created: {subdir_path}")
+    
+    print("\nFilesystem structure created successfully!")
+
+def setup_default_shell(target):
+    """Make zsh the login shell if it is installed"""
+    if not target.is_host:
+        print(f"Skipping the login shell for {target}: chsh only changes the invoking user's shell")
+        return
+    zsh_path = which("zsh")
+    if zsh_path:
+        set_default_shell(zsh_path)
+    else:
+        print("zsh not found; please install it!")
+
+def filesystem_inputs(target):
+    """Which of the standard directories exist"""
+    home = target.home
+    return [os.path.isdir(os.path.join(home, parent, sub))
+            for parent, subdirs in STANDARD_DIRS.items() for sub in [""] + subdirs]
+
+def yay_sources_inputs(args, cache):
+    """Whether yay has to be built and whether its sources are there"""
+    repo = yay_repository(args, cache)
+    return repo and [repo.url, os.path.isdir(repo.dest)]
+
+def clones_inputs(args, cache):
+    """Every managed repository and whether it is checked out"""
+    return [[repo.url, os.path.isdir(repo.dest)] for repo in managed_repositories(args, cache)]
+
+def dependencies_inputs(args):
+    """The requested packages with their installed versions, plus the helpers setup uses"""
+    inputs = {"system": args.system, "de": args.de}
+    if args.system in ["arch", "archlinux"]:
+        installed = installed_packages()
+        core_packages, aur_packages = arch_packages(args.de)
+        inputs["packages"] = {pkg: installed.version(pkg) or (pkg in installed or pkg in installed.groups)
+                              for pkg in core_packages + aur_packages}
+        inputs["yay"] = which("yay")
+    return inputs
+
+def oh_my_zsh_inputs(target):
+    """The Oh My Zsh installation, theme and plugin link"""
+    return [path_state(target.path(path)) for path in [
+        ".oh-my-zsh/oh-my-zsh.sh",
+        ".zsh/catppuccin_mocha-zsh-syntax-highlighting.zsh",
+        ".oh-my-zsh/custom/plugins/zsh-autosuggestions",
+    ]]
+
+def shell_init_inputs(args):
+    """The zshrc, everything the compiled init resolved and the init file itself"""
+    output_dir = default_output_dir(args.target.home)
+    return {
+        "zshrc": file_digest(os.path.join(args.repo, "dotfiles", "zshrc")),
+        "resolved": compile_inputs(output_dir),
+        "init": path_state(os.path.join(output_dir, "init.zsh")),
+    }
+
+def symlinks_inputs(args):
+    """The repository dotfiles, the current link destinations and the Ruby version"""
+    home = args.target.home
+    dests = [link.dest for link in manifest(args.de)] + [".xinitrc"]
+    return {
+        "repo": os.path.abspath(args.repo),
+        "de": args.de,
+        "zshrc": file_digest(os.path.join(args.repo, "dotfiles", "zshrc")),
+        "xinitrc": file_digest(os.path.join(home, ".xinitrc")),
+        "links": {dest: path_state(os.path.join(home, dest)) for dest in dests},
+        "ruby": installed_packages().version("ruby"),
+    }
+
+def keyboard_inputs(args):
+    """The keyboard configuration in the repository and the installed copy"""
+    return [file_digest(os.path.join(args.repo, "config/xorg/00-keyboard.conf")),
+            file_digest(args.target.host_path("/etc/X11/xorg.conf.d/00-keyboard.conf"))]
+
+def default_shell_inputs():
+    """The login shell and the zsh binary it should be"""
+    try:
+        import pwd
+        current_shell = pwd.getpwuid(os.getuid()).pw_shell
+    except ImportError:
+        current_shell = os.environ.get("SHELL", "")
+    return [current_shell, which("zsh")]
+
+def setup_steps(args, cache):
+    """
+    Declare the setup steps, what each of them depends on and which inputs
+    decide whether it has to run again.
+    The list is in the historical serial order, which is also the order used
+    when running with --jobs 1.
+    """
+    steps = [
+        Step("filesystem", lambda: setup_filesystem(args.target), inputs=lambda: filesystem_inputs(args.target)),
+        Step("clones", lambda: clone_repositories(args, cache), requires=["filesystem"],
+             inputs=lambda: clones_inputs(args, cache)),
+        Step("yay-sources", lambda: clone_yay(args, cache), requires=["filesystem"],
+             inputs=lambda: yay_sources_inputs(args, cache)),
+        # Only yay's sources are needed to install packages, so pacman runs while
+        # the plugins are cloned; a configs repository still being cloned is
+        # waited for, since the i3 reload reads its config.
+        Step("dependencies", lambda: install_dependencies(args.system, args, cache),
+             requires=["filesystem", "yay-sources"] + ([] if os.path.isdir(args.repo) else ["clones"]),
+             inputs=lambda: dependencies_inputs(args)),
+    ]
+    if args.system != "windows":
+        # The Oh My Zsh installer needs zsh and drops its own ~/.zshrc, which
+        # the symlink step has to replace afterwards. The theme comes from a clone.
+        steps.append(Step("oh-my-zsh", lambda: install_oh_my_zsh(cache, args.target),
+                          requires=["clones", "dependencies"], inputs=lambda: oh_my_zsh_inputs(args.target)))
+    steps.append(Step("symlinks", lambda: create_symlinks(args.repo, args, cache),
+                      requires=["clones", "dependencies"] +
+                               (["oh-my-zsh"] if args.system != "windows" else []),
+                      inputs=lambda: symlinks_inputs(args)))
+    if args.system != "windows":
+        # Configure keyboard before shell changes
+        if args.system in ["arch", "ubuntu"]:  # Only for Linux systems
+            steps.append(Step("keyboard", lambda: configure_keyboard(args.repo, args.target), requires=["clones"],
+                              inputs=lambda: keyboard_inputs(args)))
+        steps.append(Step("default-shell", lambda: setup_default_shell(args.target), requires=["dependencies"],
+                          inputs=default_shell_inputs))
+        # Plugins lazy.nvim would otherwise clone on the first nvim launch
+        steps.append(Step("nvim-plugins",
+                          lambda: provision_nvim_plugins(args.repo, args.target, cache, args.clone_jobs),
+                          requires=["clones"], inputs=lambda: nvim_plugins_inputs(args.repo, args.target)))
+        # Compiled from the zshrc after the symlink step has edited it
+        steps.append(Step("shell-init", lambda: compile_shell_init(args.repo, args.target), requires=["symlinks"],
+                          inputs=lambda: shell_init_inputs(args)))
+    else:
+        steps.append(Step("default-shell", lambda: print("Default shell change skipped on Windows.")))
+    return steps
+
+def adopt_home(target, de):
+    """When provisioning someone else's home as root, hand them the files setup created"""
+    paths = [os.path.join(parent, sub) for parent, subdirs in STANDARD_DIRS.items() for sub in [""] + subdirs]
+    paths += [link.dest for link in manifest(de)] + [".xinitrc", ".zshrc.pre-oh-my-zsh"]
+    target.adopt([target.path(path) for path in paths])
+    target.adopt([target.path(path) for path in HOME_TREES + [".local/state/configs-cli", ".cache/configs-cli/zsh", LAZY_DIR]], recursive=True)
+
+def run_setup(args):
+    """Run the setup command"""
+    print_step("Starting configs-cli setup tool")
+    args.target = Target(home=args.home, root=args.root)
+    if args.plan:
+        print_step("Link plan")
+        print_plan(plan_links(args.target.inside(args.repo), args.target.home, args.de))
+        return
+
+    # Fail early, before any work is scheduled, if there is no repository to use.
+    if not os.path.isdir(args.repo) and not args.repo_url:
+        print(f"Error: repository directory {args.repo} does not exist. "
+              f"Either clone it there or provide --repo-url to auto-clone it.")
+        sys.exit(1)
+    cache = ArtifactCache(args.cache_dir, offline=args.offline,
+                          max_size=args.cache_max_size * 1024 ** 2)
+    steps = setup_steps(args, cache)
+    unknown = set(args.force) - {step.name for step in steps} - {"all"}
+    if unknown:
+        print(f"Error: unknown step(s) for --force: {', '.join(sorted(unknown))}. "
+              f"Choose from: {', '.join(step.name for step in steps)}")
+        sys.exit(1)
+    try:
+        journal = StateJournal(os.path.join(args.target.state_dir(), "journal.json"))
+        unfinished = run_steps(steps, jobs=args.jobs, journal=journal, force=args.force)
+        if not args.target.is_host:
+            adopt_home(args.target, args.de)
+        if unfinished:
+            print(f"\nSetup did not finish: {', '.join(unfinished)} failed and will be retried on the next run")
+            sys.exit(1)
+    finally:
+        close_privileged()
+        if args.profile:
+            ndjson, chrome = trace.tracer().write(args.profile)
+            trace.tracer().summary()
+            print(f"\nTrace written to {ndjson} and {chrome}")
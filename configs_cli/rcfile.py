@@ -0,0 +1,83 @@
+"""
+Single-pass editor for shell rc files.
+
+All additions go into one block delimited by marker comments, and all edits are
+applied with one read, one in-memory transform and at most one atomic write.
+"""
+import os
+import tempfile
+
+BEGIN_MARKER = "# >>> managed by configs-cli >>>"
+END_MARKER = "# <<< managed by configs-cli <<<"
+
+
+def split_managed_block(lines):
+    """Split lines into (lines outside the managed block, lines inside it)"""
+    outside, inside = [], []
+    in_block = False
+    for line in lines:
+        if line.strip() == BEGIN_MARKER:
+            in_block = True
+        elif line.strip() == END_MARKER:
+            in_block = False
+        elif in_block:
+            inside.append(line)
+        else:
+            outside.append(line)
+    return outside, inside
+
+
+def render(text, add=(), remove=()):
+    """
+    Return text with every line containing one of `remove` dropped and the
+    managed block rebuilt from `add`. Lines that already appear outside the
+    block are not repeated inside it.
+    """
+    outside, _ = split_managed_block(text.splitlines())
+    outside = [line for line in outside if not any(pattern in line for pattern in remove)]
+    while outside and not outside[-1].strip():
+        outside.pop()
+    existing = "\n".join(outside)
+
+    block = []
+    for line in add:
+        if line not in existing and line not in block and not any(p in line for p in remove):
+            block.append(line)
+
+    result = list(outside)
+    if block:
+        result += ["", BEGIN_MARKER] + block + [END_MARKER]
+    return "\n".join(result) + "\n" if result else ""
+
+
+def atomic_write(path, text):
+    """Replace the file behind path (following symlinks) with text in one rename"""
+    real = os.path.realpath(path)
+    directory = os.path.dirname(real)
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(real)}.", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        try:
+            os.chmod(tmp, os.stat(real).st_mode & 0o7777)
+        except OSError:
+            os.chmod(tmp, 0o644)
+        os.replace(tmp, real)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+def edit_rc_file(path, add=(), remove=()):
+    """Apply all additions and removals to path; returns False when nothing had to change"""
+    try:
+        with open(path) as f:
+            original = f.read()
+    except FileNotFoundError:
+        original = ""
+    updated = render(original, add, remove)
+    if updated == original:
+        return False
+    atomic_write(path, updated)
+    return True
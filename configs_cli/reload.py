@@ -0,0 +1,112 @@
+"""
+Reloading the programs that read the linked configs.
+
+Each program gets the cheapest reload that picks up a new config: tmux
+re-sources its file, kitty and picom re-read theirs on SIGUSR1, the compiled
+zsh init is rebuilt, and i3 is restarted in place. An i3 restart redraws every
+window, so it only happens when the content of the i3 config differs from the
+one i3 last loaded, which is remembered in the state directory.
+"""
+import json
+import os
+import subprocess
+
+from configs_cli import trace
+from configs_cli.state import file_digest
+
+# Repository paths and the program that reads them
+CONSUMERS = [
+    ("config/i3", "i3"),
+    ("config/kitty", "kitty"),
+    ("config/picom", "picom"),
+    ("dotfiles/tmux.conf", "tmux"),
+    ("dotfiles/zshrc", "zsh"),
+]
+
+
+def consumer_of(repo_dir, path):
+    """Name of the program that reads path (inside the repository), or None"""
+    relative = os.path.relpath(path, repo_dir)
+    for prefix, name in CONSUMERS:
+        if relative == prefix or relative.startswith(prefix + os.sep):
+            return name
+    return None
+
+
+def _load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_state(path, state):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}"
+    with open(tmp, "w") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+
+
+def reload_i3(repo_dir, state_path):
+    """Restart i3 in place if its config changed since i3 last loaded it"""
+    digest = file_digest(os.path.join(repo_dir, "config", "i3", "config"))
+    state = _load_state(state_path)
+    if digest == state.get("i3"):
+        print("i3 config unchanged, not restarting i3")
+        return False
+    try:
+        running = trace.run(["i3", "--get-socketpath"], capture_output=True, text=True, timeout=10).returncode == 0
+        if running:
+            trace.run(["i3-msg", "restart"], check=True, stdout=subprocess.DEVNULL, timeout=30)
+            print("i3 restarted with the new config")
+        else:
+            print("i3 is not currently running - it will read the new config when it starts")
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError) as e:
+        print(f"Note: Could not restart i3: {e}")
+        return False
+    state["i3"] = digest
+    _save_state(state_path, state)
+    return running
+
+
+def reload_tmux(home):
+    """Make a running tmux server re-read ~/.tmux.conf"""
+    conf = os.path.join(home, ".tmux.conf")
+    try:
+        trace.run(["tmux", "source-file", conf], check=True, capture_output=True, timeout=30)
+        print("Tmux configuration sourced successfully")
+        return True
+    except (subprocess.CalledProcessError, subprocess.TimeoutExpired, OSError):
+        print(f"Note: Run 'tmux source-file {conf}' after starting tmux to load plugins")
+        return False
+
+
+def signal_reload(program):
+    """Send SIGUSR1, the reload signal of kitty and picom, to the user's instances of program"""
+    try:
+        result = trace.run(["pkill", "-USR1", "-u", str(os.getuid()), "-x", program], capture_output=True)
+    except OSError as e:
+        print(f"Note: Could not signal {program}: {e}")
+        return False
+    if result.returncode == 0:
+        print(f"{program} reloaded its config")
+        return True
+    print(f"{program} is not running")
+    return False
+
+
+def reload_program(name, repo_dir, target):
+    """Run the reload for one consumer name from CONSUMERS"""
+    if name == "i3":
+        return reload_i3(repo_dir, os.path.join(target.state_dir(), "reload.json"))
+    if name == "tmux":
+        return reload_tmux(target.home)
+    if name in ("kitty", "picom"):
+        return signal_reload(name)
+    if name == "zsh":
+        from configs_cli.shellinit import compile_shell
+        compile_shell(os.path.join(repo_dir, "dotfiles", "zshrc"), home=target.home)
+        return True
+    raise ValueError(f"no reload for {name}")
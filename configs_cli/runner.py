@@ -0,0 +1,110 @@
+"""
+asyncio-based command runner used for every external command.
+
+Output is streamed line by line as it arrives, prefixed with the name of the
+step that started the command, so several commands can be in flight at once
+and their logs stay readable. Commands support timeouts and are killed when
+cancelled. run() accepts the subset of subprocess.run() arguments this code
+base uses and returns a subprocess.CompletedProcess.
+"""
+import asyncio
+import contextvars
+import os
+import subprocess
+
+from configs_cli import ui
+
+# Name of the step the current command belongs to; set by the scheduler
+current_step = contextvars.ContextVar("current_step", default=None)
+
+
+def _last_frame(line):
+    """Keep only the final redraw of progress bars that rewrite a line with \\r"""
+    return line.rstrip(b"\r").rsplit(b"\r", 1)[-1]
+
+
+async def _pump(stream, prefix, capture, chunks, counter, is_stderr):
+    """Copy a pipe line by line to the console and/or a capture buffer"""
+    pending = b""
+    while True:
+        data = await stream.read(65536)
+        if capture:
+            chunks.append(data)
+        counter[0] += len(data)
+        if not capture:
+            pending += data
+            *lines, pending = pending.split(b"\n")
+            if not data and pending:
+                lines, pending = [pending], b""
+            for line in lines:
+                ui.emit(prefix, _last_frame(line).decode(errors="replace"), stderr=is_stderr)
+        if not data:
+            break
+
+
+def _target(value):
+    """Map a subprocess.run stdout/stderr argument to (asyncio argument, capture?, stream?)"""
+    if value is None:
+        return asyncio.subprocess.PIPE, False, True
+    if value == subprocess.PIPE:
+        return asyncio.subprocess.PIPE, True, True
+    return value, False, False  # DEVNULL or an open file
+
+
+async def run_async(cmd, check=False, cwd=None, env=None, timeout=None, stdout=None, stderr=None,
+                    capture_output=False, text=False, prefix=None, interactive=False):
+    """
+    Run cmd and stream (or capture) its output.
+    interactive=True leaves stdout/stderr attached to the terminal, for commands
+    that prompt without a trailing newline.
+    """
+    if capture_output:
+        stdout = stderr = subprocess.PIPE
+    prefix = prefix or current_step.get() or os.path.basename(cmd[0])
+    if interactive:
+        out_arg, out_capture, out_stream = None, False, False
+        err_arg, err_capture, err_stream = None, False, False
+    else:
+        out_arg, out_capture, out_stream = _target(stdout)
+        err_arg, err_capture, err_stream = _target(stderr)
+
+    proc = await asyncio.create_subprocess_exec(*cmd, cwd=cwd, env=env, stdout=out_arg, stderr=err_arg)
+    out_chunks, err_chunks, counter = [], [], [0]
+    pumps = []
+    if out_stream:
+        pumps.append(_pump(proc.stdout, prefix, out_capture, out_chunks, counter, False))
+    if err_stream:
+        pumps.append(_pump(proc.stderr, prefix, err_capture, err_chunks, counter, True))
+
+    try:
+        await asyncio.wait_for(asyncio.gather(proc.wait(), *pumps), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    except asyncio.CancelledError:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+
+    def collect(chunks, captured):
+        if not captured:
+            return None
+        data = b"".join(chunks)
+        return data.decode(errors="replace") if text else data
+
+    result = subprocess.CompletedProcess(cmd, proc.returncode,
+                                         collect(out_chunks, out_capture), collect(err_chunks, err_capture))
+    result.output_bytes = counter[0] if (out_stream or err_stream) else None
+    if check and result.returncode != 0:
+        error = subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
+        error.output_bytes = result.output_bytes
+        raise error
+    return result
+
+
+def run(cmd, **kwargs):
+    """Run one command to completion on a private event loop"""
+    return asyncio.run(run_async(list(cmd), **kwargs))
+
@@ -0,0 +1,140 @@
+"""Dependency-graph scheduler for the steps that make up `configs-cli setup`."""
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+from configs_cli import runner, trace, ui
+from configs_cli.state import inputs_digest
+
+
+class Step:
+    """
+    A named unit of setup work and the steps that must finish before it.
+    `inputs`, if given, returns a JSON-serialisable description of everything
+    the step's result depends on; it is what the state journal hashes.
+    A step that carries on past a failure of its own (one clone out of many,
+    an AUR install) returns False: it is recorded as failed, so the next run
+    retries it, but the steps after it still run.
+    """
+
+    def __init__(self, name, func, requires=(), inputs=None):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.inputs = inputs
+
+    def __repr__(self):
+        return f"Step({self.name!r}, requires={self.requires!r})"
+
+
+def order_steps(steps):
+    """
+    Return the steps in a valid serial order.
+    Declaration order is kept wherever the dependencies allow it, so running the
+    result one by one gives the same end state as the old hard-coded sequence.
+    """
+    by_name = {}
+    for step in steps:
+        if step.name in by_name:
+            raise ValueError(f"Duplicate step name: {step.name}")
+        by_name[step.name] = step
+    for step in steps:
+        for dep in step.requires:
+            if dep not in by_name:
+                raise ValueError(f"Step {step.name} requires unknown step {dep}")
+
+    ordered = []
+    done = set()
+    pending = list(steps)
+    while pending:
+        ready = [s for s in pending if all(dep in done for dep in s.requires)]
+        if not ready:
+            names = ", ".join(s.name for s in pending)
+            raise ValueError(f"Dependency cycle between steps: {names}")
+        step = ready[0]
+        ordered.append(step)
+        done.add(step.name)
+        pending.remove(step)
+    return ordered
+
+
+def run_step(step, journal=None, force=()):
+    """
+    Run one step, or skip it if the journal says its inputs are unchanged, and
+    return "ok", "skipped" or "failed" (for a step that returned False).
+    The digest recorded after a successful run is taken again at that point,
+    so steps whose inputs include their own outputs settle after one run.
+    Commands the step runs are prefixed with its name in the output.
+    """
+    runner.current_step.set(step.name)
+    with trace.span(step.name, "step") as attrs:
+        if journal is None or step.inputs is None:
+            status = "failed" if step.func() is False else "ok"
+            attrs["status"] = status
+            return status
+        digest = inputs_digest(step.inputs())
+        if step.name not in force and "all" not in force and journal.is_current(step.name, digest):
+            print(f"Skipping {step.name}: unchanged since the last successful run")
+            attrs["status"] = "skipped"
+            return "skipped"
+        start = time.monotonic()
+        try:
+            status = "failed" if step.func() is False else "ok"
+        except BaseException:
+            attrs["status"] = "failed"
+            journal.record(step.name, digest, "failed", time.monotonic() - start)
+            raise
+        attrs["status"] = status
+        journal.record(step.name, inputs_digest(step.inputs()), status, time.monotonic() - start)
+        return status
+
+
+def run_steps(steps, jobs=1, journal=None, force=()):
+    """
+    Run steps on a pool of at most `jobs` workers, starting each one as soon as
+    everything it requires has finished. Once a step fails no new steps are
+    started; the running ones are allowed to finish and the first error is
+    re-raised (including SystemExit from steps that call sys.exit).
+    With a journal, steps whose inputs have not changed are skipped unless
+    they are named in `force` (or `force` contains "all").
+    Returns the names of the steps that finished but reported a failure.
+    """
+    ordered = order_steps(steps)
+    jobs = max(1, int(jobs))
+    unknown = set(force) - {step.name for step in ordered} - {"all"}
+    if unknown:
+        raise ValueError(f"Unknown step(s) to force: {', '.join(sorted(unknown))}")
+
+    done = set()
+    failed = []
+    running = {}
+    pending = list(ordered)
+    error = None
+
+    with ThreadPoolExecutor(max_workers=jobs) as pool, ui.live_status() as show_running:
+        while pending or running:
+            if error is None:
+                for step in list(pending):
+                    if len(running) >= jobs:
+                        break
+                    if all(dep in done for dep in step.requires):
+                        pending.remove(step)
+                        running[pool.submit(run_step, step, journal, force)] = step
+            elif not running:
+                break
+
+            show_running([step.name for step in running.values()])
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                step = running.pop(future)
+                exc = future.exception()
+                if exc is not None:
+                    if error is None:
+                        error = exc
+                    continue
+                if future.result() == "failed":
+                    failed.append(step.name)
+                done.add(step.name)
+
+    if error is not None:
+        raise error
+    return [step.name for step in ordered if step.name in failed]
@@ -0,0 +1,130 @@
+"""
+systemd service reconciler.
+
+The wanted state of every unit is declared up front. All units of a scope
+(system or --user) are read with one `systemctl show` call, and only the units
+that differ are changed, with one batched systemctl call per kind of change.
+Units that are already enabled and running are left alone, so provisioning a
+machine never restarts its network or audio.
+"""
+import subprocess
+
+from configs_cli import trace
+from configs_cli.privileged import PrivilegedError, privileged
+
+# UnitFileState values that need no `systemctl enable`
+ENABLED_STATES = {"enabled", "enabled-runtime", "static", "indirect", "generated", "alias", "linked"}
+# ActiveState values that need no start
+RUNNING_STATES = {"active", "activating", "reloading"}
+
+
+class Service:
+    """
+    The wanted state of one unit.
+    enabled=False disables it; start=True also starts it when it is not running;
+    force replaces conflicting aliases on enable (display managers);
+    user=True manages it in the user's service manager instead of the system one.
+    """
+
+    def __init__(self, name, enabled=True, start=True, force=False, user=False):
+        self.name = name
+        self.enabled = enabled
+        self.start = start and enabled
+        self.force = force
+        self.user = user
+
+    def __repr__(self):
+        return f"Service({self.name!r}, enabled={self.enabled!r}, user={self.user!r})"
+
+
+def systemctl(user, *args):
+    """The systemctl command line for a scope"""
+    if user:
+        return ["systemctl", "--user"] + list(args)
+    return ["systemctl"] + list(args)
+
+
+def parse_show(text, names):
+    """Split `systemctl show` output (one block per unit, in argument order) into name -> properties"""
+    blocks = [block for block in text.strip().split("\n\n") if block.strip()]
+    states = {}
+    for name, block in zip(names, blocks):
+        props = {}
+        for line in block.splitlines():
+            key, _, value = line.partition("=")
+            props[key] = value
+        states[name] = props
+    return states
+
+
+def query_units(names, user=False):
+    """Read the load, enablement and activity state of all the units with one call"""
+    if not names:
+        return {}
+    output = trace.check_output(systemctl(user, "show", "--no-pager",
+                                          "-p", "Id,LoadState,UnitFileState,ActiveState", "--", *names),
+                                text=True)
+    return parse_show(output, names)
+
+
+def plan_services(services, states):
+    """
+    Group the units that need changing by the systemctl call that changes them.
+    Returns a dict of (verb, flags) -> [unit names], with units that are not
+    installed left out.
+    """
+    batches = {}
+    for service in services:
+        props = states.get(service.name, {})
+        if props.get("LoadState", "not-found") == "not-found":
+            continue
+        enabled = props.get("UnitFileState") in ENABLED_STATES
+        running = props.get("ActiveState") in RUNNING_STATES
+        if not service.enabled:
+            if props.get("UnitFileState") in ("enabled", "enabled-runtime"):
+                batches.setdefault(("disable", ()), []).append(service.name)
+        elif service.force and not enabled:
+            batches.setdefault(("enable", ("--force",)), []).append(service.name)
+        elif service.start and (not enabled or not running):
+            batches.setdefault(("enable", ("--now",)), []).append(service.name)
+        elif not enabled:
+            batches.setdefault(("enable", ()), []).append(service.name)
+    return batches
+
+
+def reconcile_services(services):
+    """
+    Bring every unit to its wanted state with the fewest systemctl calls.
+    Returns the names of the units that were changed.
+    """
+    changed = []
+    for user in (False, True):
+        scoped = [service for service in services if service.user == user]
+        if not scoped:
+            continue
+        scope = "user" if user else "system"
+        try:
+            states = query_units([service.name for service in scoped], user=user)
+        except (subprocess.CalledProcessError, OSError) as e:
+            print(f"Warning: could not read {scope} service states: {e}")
+            continue
+        for service in scoped:
+            if states.get(service.name, {}).get("LoadState", "not-found") == "not-found" and service.enabled:
+                print(f"Warning: {scope} unit {service.name} is not installed")
+        batches = plan_services(scoped, states)
+        if not batches:
+            print(f"All {scope} services are already in the wanted state")
+        # Disable first, so a display manager switch frees the display-manager alias
+        for (verb, flags), names in sorted(batches.items(), key=lambda item: item[0][0] != "disable"):
+            cmd = systemctl(user, verb, *flags, *names)
+            print(f"systemctl {' '.join((verb,) + flags)} ({scope}): {', '.join(names)}")
+            try:
+                # System units are changed by the privileged helper
+                if user:
+                    trace.run(cmd, check=True)
+                else:
+                    privileged().run(cmd)
+                changed += names
+            except (subprocess.CalledProcessError, PrivilegedError) as e:
+                print(f"Warning: failed to {verb} {', '.join(names)}: {e}")
+    return changed
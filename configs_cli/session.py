@@ -0,0 +1,120 @@
+"""
+`configs-cli session`: start the workspace apps and place their windows.
+
+The apps and their workspaces are listed in config/i3/session.json. All of
+them are started at once through i3, and a connection subscribed to window
+events moves each app's first window to its workspace the moment i3 reports
+it, so the desktop is ready as soon as the slowest app is, instead of after a
+fixed series of sleeps. An app whose window does not show up within its
+timeout is reported and left alone.
+"""
+import json
+import os
+import time
+
+from configs_cli.i3ipc import WINDOW_EVENT, Connection, I3Error
+
+DEFAULT_TIMEOUT = 30  # seconds an app gets to open its window
+
+
+class App:
+    """An app to start and the workspace its window belongs on"""
+
+    def __init__(self, command, workspace, window_class, timeout=DEFAULT_TIMEOUT):
+        self.command = command
+        self.workspace = workspace
+        self.window_class = window_class
+        self.timeout = timeout
+        self.placed_after = None  # seconds from launch until the window was moved
+
+    def __repr__(self):
+        return f"App({self.command!r}, {self.workspace!r})"
+
+    def matches(self, container):
+        """Whether an i3 container is this app's window (by WM_CLASS class or instance)"""
+        properties = container.get("window_properties") or {}
+        wanted = self.window_class.lower()
+        return any((properties.get(key) or "").lower() == wanted for key in ("class", "instance"))
+
+
+def default_session_file():
+    return os.path.expanduser(os.path.join("~", ".config", "i3", "session.json"))
+
+
+def load_session(path, timeout=None):
+    """Return (apps, workspace to focus at the end) from a session file; timeout overrides the file's"""
+    with open(path) as f:
+        spec = json.load(f)
+    default = spec.get("timeout", DEFAULT_TIMEOUT)
+    apps = [App(app["command"], app["workspace"], app.get("class", app["command"]),
+                timeout or app.get("timeout", default))
+            for app in spec.get("apps", [])]
+    return apps, spec.get("focus")
+
+
+def quote(value):
+    """Quote a string for an i3 command"""
+    return '"' + value.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def launch_session(apps, focus=None, socket=None):
+    """
+    Start every app through i3 and move each one's first new window to its
+    workspace. Returns the apps whose window did not appear in time.
+    """
+    with Connection(socket) as events, Connection(socket or events.path) as commands:
+        # Subscribe before anything starts, so no window can be missed
+        events.subscribe(["window"])
+        started = time.monotonic()
+        for app in apps:
+            commands.command(f"exec --no-startup-id {app.command}")
+        pending = list(apps)
+        while pending:
+            elapsed = time.monotonic() - started
+            for app in [app for app in pending if app.timeout <= elapsed]:
+                pending.remove(app)
+            if not pending:
+                break
+            message = events.receive(timeout=min(app.timeout for app in pending) - elapsed)
+            if message is None:
+                continue
+            kind, event = message
+            if kind != WINDOW_EVENT or event.get("change") != "new":
+                continue
+            container = event.get("container") or {}
+            app = next((app for app in pending if app.matches(container)), None)
+            if app is None:
+                continue
+            commands.command(f"[con_id={container['id']}] move container to workspace {quote(app.workspace)}")
+            app.placed_after = time.monotonic() - started
+            pending.remove(app)
+        if focus:
+            commands.command(f"workspace {quote(focus)}")
+    return [app for app in apps if app.placed_after is None]
+
+
+def print_session(apps):
+    width = max([len(app.command) for app in apps] + [3])
+    for app in apps:
+        if app.placed_after is None:
+            print(f"{app.command:<{width}}  no window within {app.timeout:g} s")
+        else:
+            print(f"{app.command:<{width}}  on {app.workspace} after {app.placed_after:.2f} s")
+
+
+def run_session(args):
+    """Run the session command; returns False if i3 was unreachable or an app timed out"""
+    path = args.session or default_session_file()
+    try:
+        apps, focus = load_session(path, args.timeout)
+    except (OSError, ValueError, KeyError) as e:
+        print(f"Error: cannot read session file {path}: {e}")
+        return False
+    try:
+        missing = launch_session(apps, focus, socket=args.socket)
+    except I3Error as e:
+        print(f"Error: {e}")
+        return False
+    # Apps that never showed a window count as errors, even with --quiet
+    print_session(missing if args.quiet else apps)
+    return not missing
@@ -0,0 +1,291 @@
+"""
+`configs-cli compile-shell`: flatten the zshrc into a precompiled init file.
+
+dotfiles/zshrc probes the machine on every shell start: it runs readlink in a
+subshell, tests for each plugin file, pipes secrets.env through grep and xargs
+and starts conda. None of the answers change between shell starts, so they are
+resolved here, once:
+
+- `if [ -f PATH ]` / `[ -d PATH ]` chains on static paths keep only the branch
+  that applies on this machine,
+- DOTFILES_DIR is written out as the directory the ~/.zshrc link resolves to,
+- secrets.env is read with a zsh loop instead of grep | xargs,
+- conda is initialised by a stub function on first use instead of at startup.
+
+Everything else is copied unchanged. The result is written to
+~/.cache/configs-cli/zsh/init.zsh and zcompiled to init.zsh.zwc. The guard block
+at the top of the zshrc sources it and stops; init.zsh itself checks that the
+zshrc and every path it resolved are unchanged, and if not, returns non-zero
+(so the full zshrc runs) and rebuilds itself in the background.
+"""
+import json
+import os
+import re
+import subprocess
+
+from configs_cli import trace
+from configs_cli.rcfile import atomic_write
+
+GUARD_BEGIN = "# >>> configs-cli compiled init >>>"
+GUARD_END = "# <<< configs-cli compiled init <<<"
+INIT_NAME = "init.zsh"
+MANIFEST_NAME = "init.json"
+
+# if [ -f "$HOME/x" ]; then   /   elif [[ -d /usr/share/y ]]; then
+STATIC_TEST = re.compile(r'^\s*(if|elif)\s+\[\[?\s+(-[fde])\s+"?([^"\s\]]+)"?\s+\]\]?\s*;\s*then\s*$')
+DOTFILES_DIR_LINE = re.compile(r'^\s*export\s+DOTFILES_DIR=.*readlink\s+-f\s+\$\{?HOME\}?/\.zshrc')
+SECRETS_LINE = re.compile(r"""^(\s*)export\s+\$\(grep\s+-v\s+'\^#'\s+"?([^"\s|]+)"?\s*\|\s*xargs\)\s*$""")
+CONDA_SETUP = re.compile(r'^\s*__conda_setup="\$\("?([^"]+/bin/conda)"?')
+CONDA_ACTIVATE = re.compile(r'^\s*conda\s+activate\s+(\S+)\s*$')
+
+
+def default_output_dir(home=None):
+    return os.path.join(home or os.path.expanduser("~"), ".cache", "configs-cli", "zsh")
+
+
+class Resolver:
+    """Answers the zshrc's path tests for one home and remembers what it looked at"""
+
+    def __init__(self, home):
+        self.home = home
+        self.inputs = set()
+
+    def expand(self, path):
+        """Expand $HOME in a path; None if anything else in it is dynamic"""
+        path = path.replace("${HOME}", self.home).replace("$HOME", self.home)
+        if path.startswith("~/"):
+            path = os.path.join(self.home, path[2:])
+        if "$" in path or "`" in path or not os.path.isabs(path):
+            return None
+        return path
+
+    def test(self, flag, path):
+        self.inputs.add(path)
+        if flag == "-f":
+            return os.path.isfile(path)
+        if flag == "-d":
+            return os.path.isdir(path)
+        return os.path.exists(path)
+
+
+def _opens_block(stripped):
+    return (stripped.startswith("if ") or stripped.startswith("case ")) and not re.search(r"\b(fi|esac)\s*$", stripped)
+
+
+def _closes_block(stripped):
+    return stripped in ("fi", "esac")
+
+
+def parse_static_if(lines, start, resolver):
+    """
+    Parse the if/elif/else chain starting at lines[start].
+    Returns (index after the closing fi, branches) where branches is a list of
+    (condition result or None for else, body lines), or None if a condition is
+    not a static path test or the block does not close.
+    """
+    branches = []
+    depth = 0
+    body = None
+    for index in range(start, len(lines)):
+        stripped = lines[index].strip()
+        if depth == 0 and (index == start or stripped.startswith("elif ")):
+            match = STATIC_TEST.match(lines[index])
+            path = resolver.expand(match.group(3)) if match else None
+            if path is None:
+                return None
+            body = []
+            branches.append((resolver.test(match.group(2), path), body))
+            continue
+        if depth == 0 and stripped == "else":
+            body = []
+            branches.append((None, body))
+            continue
+        if depth == 0 and _closes_block(stripped):
+            return index + 1, branches
+        if _opens_block(stripped):
+            depth += 1
+        elif _closes_block(stripped):
+            depth -= 1
+        body.append(lines[index])
+    return None
+
+
+def dedent(lines):
+    indents = [len(line) - len(line.lstrip()) for line in lines if line.strip()]
+    cut = min(indents) if indents else 0
+    return [line[cut:] for line in lines]
+
+
+def conda_block(lines, start, resolver, conda):
+    """The conda hook block (from __conda_setup= to unset __conda_setup) as a lazy stub"""
+    end = start
+    while end < len(lines) and lines[end].strip() != "unset __conda_setup":
+        end += 1
+    if end == len(lines):
+        return None
+    env = None
+    for line in lines[end + 1:]:
+        match = CONDA_ACTIVATE.match(line)
+        if match:
+            env = match.group(1)
+            break
+
+    conda = resolver.expand(conda)
+    if conda is None:
+        return None
+    prefix = os.path.dirname(os.path.dirname(conda))
+    profile = os.path.join(prefix, "etc", "profile.d", "conda.sh")
+    if resolver.test("-f", conda):
+        init = f'eval "$("{conda}" shell.zsh hook 2> /dev/null)"'
+    elif resolver.test("-f", profile):
+        init = f'. "{profile}"'
+    else:
+        return end + 1, ["# conda is not installed"], env
+
+    out = ["# conda is set up on first use rather than at every shell start"]
+    env_dir = os.path.join(prefix, "envs", env) if env else None
+    if env_dir and resolver.test("-d", env_dir):
+        # The environment's tools are on PATH right away; `conda` itself activates it properly
+        out.append(f'export PATH="{env_dir}/bin:$PATH"')
+    out += ["conda() {",
+            "    unfunction conda",
+            f"    {init}"]
+    if env:
+        out.append(f"    conda activate {env}")
+    out += ['    conda "$@"', "}"]
+    return end + 1, out, env
+
+
+def flatten(lines, resolver, zshrc_link):
+    """Return the zshrc lines with every static probe resolved"""
+    out = []
+    drop_activate = None
+    index = 0
+    while index < len(lines):
+        line = lines[index]
+        stripped = line.strip()
+
+        if stripped == GUARD_BEGIN:
+            while index < len(lines) and lines[index].strip() != GUARD_END:
+                index += 1
+            index += 1
+            continue
+
+        if STATIC_TEST.match(line) and stripped.startswith("if "):
+            parsed = parse_static_if(lines, index, resolver)
+            if parsed is not None:
+                index, branches = parsed
+                indent = line[:len(line) - len(line.lstrip())]
+                for result, body in branches:
+                    if result is None or result:
+                        out += [indent + body_line if body_line.strip() else ""
+                                for body_line in flatten(dedent(body), resolver, zshrc_link)]
+                        break
+                continue
+
+        if DOTFILES_DIR_LINE.match(line):
+            resolver.inputs.add(zshrc_link)
+            out.append(f'export DOTFILES_DIR="{os.path.dirname(os.path.realpath(zshrc_link))}"')
+            index += 1
+            continue
+
+        match = SECRETS_LINE.match(line)
+        if match and resolver.expand(match.group(2)):
+            indent, path = match.group(1), resolver.expand(match.group(2))
+            out += [f"{indent}while IFS= read -r __line || [[ -n $__line ]]; do",
+                    f"{indent}    [[ -z $__line || $__line == \\#* ]] || export \"${{(Q)__line}}\"",
+                    f'{indent}done < "{path}"',
+                    f"{indent}unset __line"]
+            index += 1
+            continue
+
+        match = CONDA_SETUP.match(line)
+        if match:
+            converted = conda_block(lines, index, resolver, match.group(1))
+            if converted is not None:
+                index, stub, drop_activate = converted
+                out += stub
+                continue
+
+        match = CONDA_ACTIVATE.match(line)
+        if match and match.group(1) == drop_activate:
+            drop_activate = None
+            index += 1
+            continue
+
+        out.append(line)
+        index += 1
+    return out
+
+
+def freshness_check(init_path, zshrc, inputs):
+    """The zsh that makes init.zsh step aside when anything it was built from changed"""
+    tests = [f'"{zshrc}" -nt "{init_path}"']
+    for path in sorted(inputs):
+        if os.path.lexists(path):
+            tests.append(f'! -e "{path}" || "{path}" -nt "{init_path}"')
+        else:
+            tests.append(f'-e "{path}"')
+    return ["if [[ " + " || \\\n      ".join(tests) + " ]]; then",
+            "    (( $+commands[configs-cli] )) && { configs-cli compile-shell --quiet &> /dev/null &! }",
+            "    return 1",
+            "fi"]
+
+
+def zcompile(path, zsh):
+    """Compile path to path.zwc; returns False if zsh is unavailable or failed"""
+    if not zsh:
+        return False
+    try:
+        trace.run([zsh, "-fc", 'zcompile -U -- "$1"', "zsh", path], check=True,
+                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except (subprocess.CalledProcessError, OSError):
+        return False
+    return os.path.exists(path + ".zwc")
+
+
+def compile_shell(zshrc=None, home=None, output_dir=None, zsh=None, quiet=False):
+    """
+    Flatten zshrc (default: what ~/.zshrc points to) into output_dir/init.zsh
+    and zcompile it. Returns the path of the init file.
+    """
+    from configs_cli.executables import which
+    home = home or os.path.expanduser("~")
+    zshrc_link = os.path.join(home, ".zshrc")
+    zshrc = os.path.abspath(zshrc or os.path.realpath(zshrc_link))
+    output_dir = output_dir or default_output_dir(home)
+    init_path = os.path.join(output_dir, INIT_NAME)
+
+    with open(zshrc) as f:
+        lines = f.read().splitlines()
+    resolver = Resolver(home)
+    body = flatten(lines, resolver, zshrc_link)
+    resolver.inputs.discard(zshrc)
+
+    text = "\n".join([f"# Generated by `configs-cli compile-shell` from {zshrc}; do not edit.",
+                      "# Sourced by the guard block at the top of the zshrc."]
+                     + freshness_check(init_path, zshrc, resolver.inputs)
+                     + [""] + body + ["", "return 0", ""])
+    os.makedirs(output_dir, exist_ok=True)
+    atomic_write(init_path, text)
+    with open(os.path.join(output_dir, MANIFEST_NAME), "w") as f:
+        json.dump({"zshrc": zshrc, "inputs": sorted(resolver.inputs)}, f, indent=2)
+
+    compiled = zcompile(init_path, zsh or which("zsh"))
+    if not quiet:
+        print(f"Wrote {init_path} ({len(lines)} zshrc lines -> {len(body)})")
+        if not compiled:
+            print("Note: zsh is not available, so init.zsh was not zcompiled")
+    return init_path
+
+
+def compile_inputs(output_dir):
+    """What the compiled init depends on, for the setup journal"""
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    from configs_cli.state import file_digest, path_state
+    paths = [manifest.get("zshrc", "")] + manifest.get("inputs", [])
+    return {path: file_digest(path) if os.path.isfile(path) else path_state(path) for path in paths}
@@ -0,0 +1,278 @@
+"""
+Snapshots of everything setup replaces, and `configs-cli rollback`.
+
+Before a link is created over an existing file or directory, the old path is
+moved into a snapshot with os.rename, which costs the same for a 1 KB file
+and a multi-GB ~/.config/nvim. When the snapshot store is on another
+filesystem, the snapshot for that path is kept next to it (in a hidden
+.configs-cli-snapshots directory) so the rename still works; when a rename is
+impossible altogether, the tree is copied with reflinks or hard links and
+only falls back to copying bytes file by file.
+
+Each snapshot records, per path, what was there before: a stashed file or
+directory, a symlink target, or nothing. Rolling back restores exactly that,
+swapping each path back in with a single atomic rename where possible.
+"""
+import ctypes
+import errno
+import json
+import os
+import shutil
+import time
+
+SPILL_DIR = ".configs-cli-snapshots"
+FICLONE = 0x40049409  # ioctl that makes a reflink copy (btrfs, xfs, bcachefs)
+RENAME_EXCHANGE = 2
+
+
+def _renameat2():
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        func = libc.renameat2
+    except (OSError, AttributeError):
+        return None
+    func.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    return func
+
+
+_renameat2_func = _renameat2()
+
+
+def exchange(a, b):
+    """Atomically swap two paths; returns False if the system cannot do it"""
+    if _renameat2_func is None:
+        return False
+    AT_FDCWD = -100
+    if _renameat2_func(AT_FDCWD, os.fsencode(a), AT_FDCWD, os.fsencode(b), RENAME_EXCHANGE) == 0:
+        return True
+    err = ctypes.get_errno()
+    if err in (errno.ENOSYS, errno.EINVAL, errno.EXDEV):
+        return False
+    raise OSError(err, os.strerror(err), a)
+
+
+def clone_file(src, dest, hardlink=True):
+    """
+    Copy one file as a reflink, else a hard link, else byte by byte.
+    Without hardlink the copy never shares an inode with src.
+    """
+    try:
+        import fcntl
+        with open(src, "rb") as fsrc, open(dest, "wb") as fdest:
+            fcntl.ioctl(fdest.fileno(), FICLONE, fsrc.fileno())
+        shutil.copystat(src, dest)
+        return
+    except (OSError, ImportError):
+        if os.path.exists(dest):
+            os.remove(dest)
+    if hardlink:
+        try:
+            os.link(src, dest)
+            return
+        except OSError:
+            pass
+    shutil.copy2(src, dest)
+
+
+def clone_tree(src, dest, hardlink=True):
+    """Copy a file or directory tree using clone_file for every file"""
+    if os.path.isdir(src) and not os.path.islink(src):
+        shutil.copytree(src, dest, symlinks=True,
+                        copy_function=lambda s, d: clone_file(s, d, hardlink))
+    elif os.path.islink(src):
+        os.symlink(os.readlink(src), dest)
+    else:
+        clone_file(src, dest, hardlink)
+
+
+def remove_path(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path)
+    else:
+        os.remove(path)
+
+
+class Snapshot:
+    """One run's worth of replaced paths; its directory is reserved when it is started"""
+
+    def __init__(self, store, snapshot_id, label=""):
+        self.store = store
+        self.id = snapshot_id
+        self.label = label
+        self.dir = os.path.join(store.root, snapshot_id)
+        self.entries = []
+        self.created = time.time()
+
+    def discard(self):
+        """Give up the reserved directory of a snapshot that recorded nothing"""
+        if not self.entries:
+            try:
+                os.rmdir(self.dir)
+            except OSError:
+                pass
+
+    def _save(self):
+        os.makedirs(self.dir, exist_ok=True)
+        tmp = os.path.join(self.dir, ".manifest.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"id": self.id, "label": self.label, "created": self.created,
+                       "entries": self.entries}, f, indent=2)
+        os.replace(tmp, os.path.join(self.dir, "manifest.json"))
+
+    def _location(self, path, index):
+        """Where the stashed copy of path goes: the store, or next to path on its own filesystem"""
+        name = f"{index}-{os.path.basename(path)}"
+        parent = os.path.dirname(path)
+        os.makedirs(self.dir, exist_ok=True)
+        if os.stat(parent).st_dev == os.stat(self.dir).st_dev:
+            return os.path.join(self.dir, name)
+        spill = os.path.join(parent, SPILL_DIR, self.id)
+        os.makedirs(spill, exist_ok=True)
+        return os.path.join(spill, name)
+
+    def record(self, path):
+        """
+        Remember what is at path before setup changes it.
+        Real files and directories are moved out of the way; symlinks and
+        missing paths are only noted.
+        """
+        path = os.path.abspath(path)
+        if any(entry["path"] == path for entry in self.entries):
+            return
+        entry = {"path": path}
+        if os.path.islink(path):
+            entry.update(kind="link", target=os.readlink(path))
+        elif not os.path.lexists(path):
+            entry.update(kind="absent")
+        else:
+            stored = self._location(path, len(self.entries))
+            try:
+                os.rename(path, stored)
+                entry.update(kind="moved", stored=stored)
+            except OSError:
+                clone_tree(path, stored)
+                remove_path(path)
+                entry.update(kind="copied", stored=stored)
+        self.entries.append(entry)
+        self._save()
+
+
+class SnapshotStore:
+    """A directory of snapshots, newest last"""
+
+    def __init__(self, root):
+        self.root = root
+
+    def new(self, label=""):
+        """
+        Start a snapshot. Its id is reserved by creating its directory, so two
+        runs within the same second get different snapshots.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        base = time.strftime("%Y%m%d-%H%M%S")
+        snapshot_id, n = base, 1
+        while True:
+            try:
+                os.mkdir(os.path.join(self.root, snapshot_id))
+                return Snapshot(self, snapshot_id, label)
+            except FileExistsError:
+                n += 1
+                snapshot_id = f"{base}-{n}"
+
+    def load(self, snapshot_id):
+        with open(os.path.join(self.root, snapshot_id, "manifest.json")) as f:
+            data = json.load(f)
+        snapshot = Snapshot(self, data["id"], data.get("label", ""))
+        snapshot.entries = data["entries"]
+        snapshot.created = data["created"]
+        return snapshot
+
+    def list(self):
+        """Return every snapshot, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        snapshots = []
+        for name in sorted(os.listdir(self.root)):
+            try:
+                snapshots.append(self.load(name))
+            except (OSError, ValueError, KeyError):
+                continue
+        return sorted(snapshots, key=lambda s: s.created)
+
+
+def restore_entry(entry):
+    """Put one recorded path back the way it was; returns False if it was left alone"""
+    path = entry["path"]
+    current_is_link = os.path.islink(path)
+    if os.path.lexists(path) and not current_is_link:
+        print(f"Skipping {path}: it was replaced by something other than a link since the snapshot")
+        return False
+    kind = entry["kind"]
+    if kind == "absent":
+        if current_is_link:
+            os.remove(path)
+    elif kind == "link":
+        tmp = f"{path}.configs-cli-{os.getpid()}"
+        os.symlink(entry["target"], tmp)
+        os.replace(tmp, path)
+    else:
+        stored = entry["stored"]
+        if not current_is_link:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.rename(stored, path)
+        elif exchange(stored, path):
+            # The link setup made now sits where the stash was
+            os.remove(stored)
+        elif os.path.isdir(stored):
+            os.remove(path)
+            os.rename(stored, path)
+        else:
+            os.replace(stored, path)
+    return True
+
+
+def rollback(store, snapshot_id=None):
+    """Restore a snapshot (the newest if none is given); returns True if every path was restored"""
+    snapshots = store.list()
+    if not snapshots:
+        print(f"No snapshots in {store.root}")
+        return False
+    if snapshot_id is None:
+        snapshot = snapshots[-1]
+    else:
+        matches = [s for s in snapshots if s.id == snapshot_id]
+        if not matches:
+            print(f"No snapshot {snapshot_id}; available: {', '.join(s.id for s in snapshots)}")
+            return False
+        snapshot = matches[0]
+
+    print(f"Rolling back snapshot {snapshot.id}" + (f" ({snapshot.label})" if snapshot.label else ""))
+    ok = True
+    for entry in reversed(snapshot.entries):
+        try:
+            if restore_entry(entry):
+                print(f"Restored {entry['path']}")
+            else:
+                ok = False
+        except OSError as e:
+            print(f"Error restoring {entry['path']}: {e}")
+            ok = False
+    if ok:
+        for entry in snapshot.entries:
+            spill = os.path.dirname(entry.get("stored", ""))
+            if spill and os.path.basename(spill) == snapshot.id and os.path.basename(os.path.dirname(spill)) == SPILL_DIR:
+                shutil.rmtree(spill, ignore_errors=True)
+        shutil.rmtree(snapshot.dir, ignore_errors=True)
+    return ok
+
+
+def print_snapshots(store):
+    """List the snapshots in a store"""
+    snapshots = store.list()
+    if not snapshots:
+        print(f"No snapshots in {store.root}")
+        return
+    for snapshot in snapshots:
+        created = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(snapshot.created))
+        changed = ", ".join(os.path.basename(entry["path"]) for entry in snapshot.entries)
+        print(f"{snapshot.id}  {created}  {len(snapshot.entries)} paths: {changed}")
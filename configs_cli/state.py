@@ -0,0 +1,81 @@
+"""
+Persistent state journal for incremental setup runs.
+
+Every step that declares its inputs gets a hash of them recorded together with
+its outcome. On the next run a step whose inputs hash is unchanged and whose
+last outcome was a success is skipped.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+DEFAULT_STATE_DIR = os.path.join(
+    os.environ.get("XDG_STATE_HOME") or os.path.expanduser("~/.local/state"), "configs-cli")
+
+
+def inputs_digest(inputs):
+    """Hash any JSON-serialisable description of a step's inputs"""
+    encoded = json.dumps(inputs, sort_keys=True, default=str).encode()
+    return hashlib.sha256(encoded).hexdigest()
+
+
+def file_digest(path):
+    """Return the sha256 of a file's contents, or None if it cannot be read"""
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def path_state(path):
+    """Describe what is at path (kind, link target, size) without following symlinks"""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return None
+    if os.path.islink(path):
+        return ["link", os.readlink(path)]
+    if os.path.isdir(path):
+        return ["dir"]
+    return ["file", st.st_size, st.st_mode & 0o777]
+
+
+class StateJournal:
+    """Inputs hash and outcome of each step, stored as JSON"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(DEFAULT_STATE_DIR, "journal.json")
+        self._lock = threading.Lock()
+        try:
+            with open(self.path) as f:
+                self.steps = json.load(f).get("steps", {})
+        except (OSError, ValueError):
+            self.steps = {}
+
+    def is_current(self, name, digest):
+        """Whether the step last succeeded with exactly these inputs"""
+        entry = self.steps.get(name)
+        return bool(entry) and entry.get("status") == "ok" and entry.get("inputs") == digest
+
+    def record(self, name, digest, status, duration):
+        """Record a step outcome and write the journal atomically"""
+        with self._lock:
+            self.steps[name] = {
+                "inputs": digest,
+                "status": status,
+                "finished": time.time(),
+                "duration": round(duration, 3),
+            }
+            self._save()
+
+    def _save(self):
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".journal-", dir=directory)
+        with os.fdopen(fd, "w") as f:
+            json.dump({"steps": self.steps}, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
@@ -0,0 +1,106 @@
+"""
+Where setup writes: the invoking user's home, another home directory, or a
+home inside a root filesystem (a chroot or container image).
+
+Paths are kept in two forms. `home` is where the files are on this machine;
+`inside()` gives the path as seen from within the target, which is what
+symlinks and generated scripts have to contain when the target is a rootfs.
+"""
+import os
+
+
+class Target:
+    """A home directory to provision, optionally inside a root filesystem"""
+
+    def __init__(self, home=None, root=None):
+        self.root = os.path.abspath(root) if root else None
+        if home is None:
+            home = "/root" if self.root else os.path.expanduser("~")
+        self.home_inside = os.path.abspath(home)
+        self.home = self.host_path(self.home_inside)
+
+    def __repr__(self):
+        return f"Target(home={self.home_inside!r}, root={self.root!r})"
+
+    def __str__(self):
+        return f"{self.root}:{self.home_inside}" if self.root else self.home
+
+    @property
+    def is_host(self):
+        """Whether this is the home of the user running configs-cli"""
+        return self.root is None and self.home == os.path.abspath(os.path.expanduser("~"))
+
+    def host_path(self, path):
+        """Map an absolute path inside the target to where it is on this machine"""
+        if self.root is None:
+            return path
+        return os.path.join(self.root, os.path.abspath(path).lstrip("/"))
+
+    def inside(self, path):
+        """Map a path on this machine to how it is seen from within the target"""
+        path = os.path.abspath(path)
+        if self.root is None or os.path.commonpath([self.root, path]) != self.root:
+            return path
+        relative = os.path.relpath(path, self.root)
+        return "/" if relative == os.curdir else "/" + relative
+
+    def path(self, *parts):
+        """Join parts onto the target's home directory (the target's "~")"""
+        return os.path.join(self.home, *parts)
+
+    def state_dir(self):
+        """Where the state journal for this target lives"""
+        if self.is_host:
+            from configs_cli.state import DEFAULT_STATE_DIR
+            return DEFAULT_STATE_DIR
+        return self.path(".local", "state", "configs-cli")
+
+    def owner(self):
+        """Return (uid, gid) of the home directory, or None if it does not exist yet"""
+        try:
+            st = os.stat(self.home)
+        except OSError:
+            return None
+        return st.st_uid, st.st_gid
+
+    def adopt(self, paths, recursive=False):
+        """
+        Give paths (and with recursive, everything under them) to the owner of
+        the home directory, without following symlinks. This only does
+        something when running as root for somebody else's home.
+        """
+        owner = self.owner()
+        if owner is None or os.geteuid() != 0 or owner == (0, 0):
+            return
+        uid, gid = owner
+        for path in paths:
+            if not os.path.lexists(path):
+                continue
+            os.lchown(path, uid, gid)
+            if recursive and os.path.isdir(path) and not os.path.islink(path):
+                for dirpath, dirnames, filenames in os.walk(path):
+                    for name in dirnames + filenames:
+                        os.lchown(os.path.join(dirpath, name), uid, gid)
+
+
+def parse_target(spec):
+    """
+    Parse a target given on the command line or in a targets file:
+    `HOME` for a home directory on this machine, `ROOT:HOME` for a home inside
+    a root filesystem (`ROOT:` alone means /root inside it).
+    """
+    root, sep, home = spec.partition(":")
+    if not sep:
+        return Target(home=spec)
+    return Target(home=home or None, root=root)
+
+
+def read_targets_file(path):
+    """Read one target per line, ignoring blank lines and # comments"""
+    targets = []
+    with open(path) as f:
+        for line in f:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                targets.append(parse_target(line))
+    return targets
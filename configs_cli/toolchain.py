@@ -0,0 +1,124 @@
+"""
+Cached probe of the Ruby toolchain.
+
+Asking Ruby where gems live costs an interpreter start, hundreds of
+milliseconds each time. The answer only changes when ruby or gem is replaced,
+so it is stored in toolchains.json in the cache directory (--cache-dir,
+~/.cache/configs-cli by default) keyed on the resolved binaries and their
+mtimes, and repeat runs read it from disk. Installed gems are found by listing
+the gem specification directories instead of running `gem`.
+"""
+import json
+import os
+import re
+import tempfile
+
+from configs_cli import trace
+from configs_cli.cache import DEFAULT_CACHE_DIR
+from configs_cli.executables import which
+
+PROBE_FILE = "toolchains.json"
+# One interpreter start answers everything setup needs to know
+PROBE_SCRIPT = 'print RUBY_VERSION, "\\n", Gem.dir, "\\n", Gem.user_dir, "\\n"'
+PROBE_FIELDS = ["version", "gem_dir", "user_dir"]
+# Spec files are <name>-<version>[-<platform>].gemspec. The version is the last
+# "-<digit>" part, since names can contain one too (foo-2fa-1.0.0.gemspec)
+SPEC_NAME = re.compile(r"(.+)-\d[^-]*(?:-[^-]+)*\.gemspec$")
+
+
+class RubyToolchain:
+    """Where the Ruby found on PATH keeps its gems"""
+
+    def __init__(self, version, gem_dir, user_dir):
+        self.version = version
+        self.gem_dir = gem_dir
+        self.user_dir = user_dir
+
+    def __repr__(self):
+        return f"RubyToolchain({self.version!r}, gem_dir={self.gem_dir!r}, user_dir={self.user_dir!r})"
+
+    @property
+    def bin_dir(self):
+        return os.path.join(self.gem_dir, "bin")
+
+    @property
+    def user_bin_dir(self):
+        """Where `gem install --user-install` puts executables"""
+        return os.path.join(self.user_dir, "bin")
+
+    def installed_gems(self):
+        """Names of the gems installed system-wide or for the user"""
+        names = set()
+        for gem_dir in (self.user_dir, self.gem_dir):
+            try:
+                entries = os.listdir(os.path.join(gem_dir, "specifications"))
+            except OSError:
+                continue
+            for entry in entries:
+                match = SPEC_NAME.match(entry)
+                if match:
+                    names.add(match.group(1))
+        return names
+
+    def has_gem(self, name):
+        return name in self.installed_gems()
+
+
+def probe_key():
+    """What the cached probe depends on, or None if ruby is not installed"""
+    key = {"home": os.path.expanduser("~")}
+    for tool in ("ruby", "gem"):
+        path = which(tool)
+        if path is None:
+            if tool == "ruby":
+                return None
+            key[tool] = None
+            continue
+        path = os.path.realpath(path)
+        key[tool] = [path, os.stat(path).st_mtime_ns]
+    return key
+
+
+def _load(cache_file):
+    try:
+        with open(cache_file) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save(cache_file, data):
+    directory = os.path.dirname(cache_file)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=".toolchains-", dir=directory)
+    with os.fdopen(fd, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, cache_file)
+
+
+def ruby_toolchain(cache_dir=DEFAULT_CACHE_DIR):
+    """
+    Return the RubyToolchain for the ruby on PATH, or None if there is none.
+    Only runs ruby when the binaries changed since the probe cached in cache_dir.
+    Raises CalledProcessError or OSError if the probe itself fails.
+    """
+    cache_file = os.path.join(cache_dir, PROBE_FILE)
+    key = probe_key()
+    if key is None:
+        return None
+    cache = _load(cache_file)
+    entry = cache.get("ruby")
+    if isinstance(entry, dict) and entry.get("key") == key:
+        return RubyToolchain(**entry["probe"])
+
+    output = trace.check_output([key["ruby"][0], "-e", PROBE_SCRIPT], text=True)
+    values = output.splitlines()
+    if len(values) < len(PROBE_FIELDS):
+        raise OSError(f"unexpected output from the Ruby probe: {output!r}")
+    probe = dict(zip(PROBE_FIELDS, values))
+    cache["ruby"] = {"key": key, "probe": probe}
+    try:
+        _save(cache_file, cache)
+    except OSError as e:
+        print(f"Warning: could not save the toolchain probe: {e}")
+    return RubyToolchain(**probe)
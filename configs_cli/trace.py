@@ -0,0 +1,169 @@
+"""
+Structured tracing of setup steps and the commands they run.
+
+Every step and every external command is recorded as a timed span. With
+`configs-cli setup --profile DIR` the spans are written as NDJSON (one span per
+line, easy to diff between machines) and as a Chrome trace-event file that
+chrome://tracing or Perfetto can open, and a summary of the top time sinks is
+printed at the end of the run.
+"""
+import json
+import os
+import subprocess
+import threading
+import time
+from contextlib import contextmanager
+
+
+class Span:
+    """One timed piece of work: a setup step or an external command"""
+
+    def __init__(self, name, kind, start, thread, attrs):
+        self.name = name
+        self.kind = kind
+        self.start = start
+        self.end = None
+        self.thread = thread
+        self.attrs = attrs
+
+    @property
+    def duration(self):
+        return (self.end if self.end is not None else time.perf_counter()) - self.start
+
+
+class Tracer:
+    """Collects spans from every thread of the run"""
+
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.spans = []
+        self._threads = {}
+        self._lock = threading.Lock()
+
+    def _thread_id(self):
+        ident = threading.get_ident()
+        with self._lock:
+            return self._threads.setdefault(ident, len(self._threads) + 1)
+
+    @contextmanager
+    def span(self, name, kind="step", **attrs):
+        """Time the body; the yielded dict can be filled with more attributes"""
+        span = Span(name, kind, time.perf_counter(), self._thread_id(), attrs)
+        with self._lock:
+            self.spans.append(span)
+        try:
+            yield span.attrs
+        except BaseException as e:
+            span.attrs.setdefault("error", repr(e))
+            raise
+        finally:
+            span.end = time.perf_counter()
+
+    def records(self):
+        """Return the finished spans as plain dicts, in start order"""
+        with self._lock:
+            spans = [span for span in self.spans if span.end is not None]
+        return [{
+            "name": span.name,
+            "kind": span.kind,
+            "thread": span.thread,
+            "start_ms": round((span.start - self.origin) * 1000, 3),
+            "duration_ms": round(span.duration * 1000, 3),
+            **span.attrs,
+        } for span in sorted(spans, key=lambda s: s.start)]
+
+    def export_ndjson(self, path):
+        """Write one JSON object per span"""
+        with open(path, "w") as f:
+            for record in self.records():
+                f.write(json.dumps(record, sort_keys=True, default=str) + "\n")
+
+    def export_chrome(self, path):
+        """Write the spans in the Chrome trace-event format"""
+        pid = os.getpid()
+        events = []
+        for record in self.records():
+            args = {k: v for k, v in record.items()
+                    if k not in ("name", "kind", "thread", "start_ms", "duration_ms")}
+            events.append({
+                "name": record["name"],
+                "cat": record["kind"],
+                "ph": "X",
+                "ts": int(record["start_ms"] * 1000),
+                "dur": int(record["duration_ms"] * 1000),
+                "pid": pid,
+                "tid": record["thread"],
+                "args": args,
+            })
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, default=str)
+
+    def summary(self, top=10):
+        """Print the slowest steps and commands"""
+        records = self.records()
+        for kind, title in (("step", "Slowest steps"), ("command", "Slowest commands")):
+            rows = sorted((r for r in records if r["kind"] == kind),
+                          key=lambda r: r["duration_ms"], reverse=True)[:top]
+            if not rows:
+                continue
+            print(f"\n{title}:")
+            print(f"{'seconds':>9}  {'exit':>4}  {'bytes':>8}  name")
+            for r in rows:
+                exit_code = r.get("exit_code", "")
+                size = r.get("output_bytes")
+                print(f"{r['duration_ms'] / 1000:>9.2f}  {'' if exit_code is None else exit_code:>4}  "
+                      f"{'' if size is None else size:>8}  {r['name']}")
+
+    def write(self, directory):
+        """Export NDJSON and Chrome trace files into directory and return their paths"""
+        os.makedirs(directory, exist_ok=True)
+        ndjson = os.path.join(directory, "trace.ndjson")
+        chrome = os.path.join(directory, "trace.json")
+        self.export_ndjson(ndjson)
+        self.export_chrome(chrome)
+        return ndjson, chrome
+
+
+_tracer = Tracer()
+
+
+def tracer():
+    """Return the process-wide tracer"""
+    return _tracer
+
+
+def span(name, kind="step", **attrs):
+    """Record a span on the process-wide tracer"""
+    return _tracer.span(name, kind, **attrs)
+
+
+def run(cmd, **kwargs):
+    """
+    Run cmd through the streaming runner, recorded as a command span with its
+    exit code and output size (streamed or captured)
+    """
+    from configs_cli import runner
+
+    name = " ".join(str(part) for part in cmd) if isinstance(cmd, (list, tuple)) else str(cmd)
+    with span(name, "command", cmd=list(cmd) if isinstance(cmd, (list, tuple)) else cmd) as attrs:
+        try:
+            result = runner.run(cmd, **kwargs)
+        except subprocess.CalledProcessError as e:
+            attrs["exit_code"] = e.returncode
+            attrs["output_bytes"] = getattr(e, "output_bytes", None)
+            raise
+        attrs["exit_code"] = result.returncode
+        attrs["output_bytes"] = result.output_bytes
+        return result
+
+
+def check_call(cmd, **kwargs):
+    """subprocess.check_call through run()"""
+    run(cmd, check=True, **kwargs)
+    return 0
+
+
+def check_output(cmd, **kwargs):
+    """subprocess.check_output through run()"""
+    return run(cmd, check=True, stdout=subprocess.PIPE, **kwargs).stdout
@@ -0,0 +1,64 @@
+"""Console output helpers shared by every command."""
+import sys
+import threading
+from contextlib import contextmanager
+
+# ANSI colours handed out to command prefixes, in order
+PREFIX_COLORS = ["36", "33", "35", "32", "34", "96", "93", "95"]
+
+_lock = threading.Lock()
+_colors = {}
+_console = None
+
+
+def rich_console():
+    """Return a rich Console if rich is installed and stdout is a terminal, else None"""
+    global _console
+    if _console is None:
+        _console = False
+        if sys.stdout.isatty():
+            try:
+                from rich.console import Console
+            except ImportError:
+                pass
+            else:
+                _console = Console(highlight=False)
+    return _console or None
+
+
+def print_step(message):
+    """Print a formatted step message"""
+    with _lock:
+        print("\n" + "="*80)
+        print(f">>> {message}")
+        print("="*80 + "\n", flush=True)
+
+
+def emit(prefix, line, stderr=False):
+    """Print one line of command output under a coloured `[prefix]` tag"""
+    with _lock:
+        console = rich_console()
+        if console is not None:
+            from rich.text import Text
+            text = Text(f"[{prefix}] ", style="bold")
+            text.append(line, style="red" if stderr else "")
+            console.print(text, soft_wrap=True)
+        elif sys.stdout.isatty():
+            color = _colors.setdefault(prefix, PREFIX_COLORS[len(_colors) % len(PREFIX_COLORS)])
+            print(f"\033[{color}m[{prefix}]\033[0m {line}", flush=True)
+        else:
+            print(f"[{prefix}] {line}", flush=True)
+
+
+@contextmanager
+def live_status():
+    """
+    Show a live line listing the steps that are running, when rich is available.
+    Yields a function that takes the current list of running step names.
+    """
+    console = rich_console()
+    if console is None:
+        yield lambda names: None
+        return
+    with console.status("Starting") as status:
+        yield lambda names: status.update("Running: " + ", ".join(names) if names else "Waiting")
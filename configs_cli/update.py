@@ -0,0 +1,160 @@
+"""
+`configs-cli update`: refresh every managed git checkout.
+
+Setup only clones what is missing, so checkouts drift. update finds the
+plugin checkouts, Oh My Zsh and the configs repository, reads each local HEAD
+straight from .git (no git process) and asks every remote for its branch head
+with one `git ls-remote` each, all at once. Only checkouts whose remote head
+moved are fetched: shallow ones with --depth 1, so just the new tip is
+transferred, and full ones with a plain fetch and a fast-forward merge.
+"""
+import os
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from configs_cli import trace
+from configs_cli.clone import Repository
+
+UP_TO_DATE = "up to date"
+UPDATED = "updated"
+FAILED = "failed"
+
+
+class UpdateResult:
+    """What happened to one checkout"""
+
+    def __init__(self, repo, status, old=None, new=None, error=None):
+        self.repo = repo
+        self.status = status
+        self.old = old
+        self.new = new
+        self.error = error
+
+    def __repr__(self):
+        return f"UpdateResult({self.repo.name!r}, {self.status!r})"
+
+
+def read_ref(git_dir, ref):
+    """Resolve a ref from its loose file or packed-refs, without running git"""
+    try:
+        with open(os.path.join(git_dir, ref)) as f:
+            return f.read().strip()
+    except OSError:
+        pass
+    try:
+        with open(os.path.join(git_dir, "packed-refs")) as f:
+            for line in f:
+                sha, _, name = line.strip().partition(" ")
+                if name == ref:
+                    return sha
+    except OSError:
+        pass
+    return None
+
+
+def local_head(path):
+    """Return (branch or None when detached, commit) of a checkout"""
+    git_dir = os.path.join(path, ".git")
+    if os.path.isdir(git_dir):
+        with open(os.path.join(git_dir, "HEAD")) as f:
+            head = f.read().strip()
+        if not head.startswith("ref: "):
+            return None, head
+        ref = head[len("ref: "):]
+        sha = read_ref(git_dir, ref)
+        if sha:
+            return ref[len("refs/heads/"):], sha
+    # Worktrees, unusual layouts: let git answer
+    branch = trace.check_output(["git", "-C", path, "rev-parse", "--abbrev-ref", "HEAD"], text=True).strip()
+    sha = trace.check_output(["git", "-C", path, "rev-parse", "HEAD"], text=True).strip()
+    return (None if branch == "HEAD" else branch), sha
+
+
+def remote_head(path, branch):
+    """The commit origin's branch (or HEAD) points to, or None if it has no such ref"""
+    ref = f"refs/heads/{branch}" if branch else "HEAD"
+    output = trace.check_output(["git", "-C", path, "ls-remote", "origin", ref], text=True)
+    for line in output.splitlines():
+        sha, _, name = line.partition("\t")
+        if name == ref:
+            return sha
+    return None
+
+
+def update_repository(repo):
+    """Check one checkout against its remote and bring it forward if the remote moved"""
+    try:
+        branch, old = local_head(repo.dest)
+        new = remote_head(repo.dest, branch)
+        if new is None:
+            return UpdateResult(repo, FAILED, old, error=f"origin has no {branch or 'HEAD'}")
+        if new == old:
+            return UpdateResult(repo, UP_TO_DATE, old, new)
+        refspec = branch or "HEAD"
+        if repo.depth:
+            trace.run(["git", "-C", repo.dest, "fetch", "--quiet", "--depth", str(repo.depth), "origin", refspec],
+                      check=True)
+            # --keep refuses to overwrite local edits instead of discarding them
+            trace.run(["git", "-C", repo.dest, "reset", "--quiet", "--keep", "FETCH_HEAD"], check=True)
+        else:
+            trace.run(["git", "-C", repo.dest, "fetch", "--quiet", "origin", refspec], check=True)
+            trace.run(["git", "-C", repo.dest, "merge", "--quiet", "--ff-only", "FETCH_HEAD"], check=True)
+        return UpdateResult(repo, UPDATED, old, new)
+    except (subprocess.CalledProcessError, OSError) as e:
+        return UpdateResult(repo, FAILED, error=e)
+
+
+def update_all(repos, jobs=8):
+    """Update every checkout concurrently, at most `jobs` at a time; returns the results in order"""
+    repos = list(repos)
+    if not repos:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, int(jobs))) as pool:
+        return list(pool.map(update_repository, repos))
+
+
+def managed_checkouts(repo_dir, target):
+    """Every git checkout configs-cli manages for a target that exists on disk"""
+    from configs_cli.provision import user_repositories
+    repos = user_repositories(target)
+    # Oh My Zsh clones itself shallowly; the configs repository keeps its history
+    repos.append(Repository("oh-my-zsh", None, target.path(".oh-my-zsh"), depth=1))
+    repos.append(Repository("configs", None, os.path.abspath(repo_dir), depth=None))
+    return [repo for repo in repos if os.path.exists(os.path.join(repo.dest, ".git"))]
+
+
+def print_report(results):
+    """Print one line per checkout and return True if none failed"""
+    width = max([len(result.repo.name) for result in results] + [4])
+    for result in results:
+        if result.status == UPDATED:
+            print(f"{result.repo.name:<{width}}  {result.old[:10]} -> {result.new[:10]}")
+        elif result.status == UP_TO_DATE:
+            print(f"{result.repo.name:<{width}}  {result.old[:10]} (up to date)")
+        else:
+            print(f"{result.repo.name:<{width}}  failed: {result.error}")
+    updated = sum(1 for result in results if result.status == UPDATED)
+    failed = sum(1 for result in results if result.status == FAILED)
+    print(f"\n{updated} updated, {len(results) - updated - failed} up to date, {failed} failed")
+    return failed == 0
+
+
+def run_update(args):
+    """Run the update command; returns False if any checkout failed"""
+    from configs_cli.provision import install_oh_my_zsh_theme
+    from configs_cli.target import Target
+    from configs_cli.ui import print_step
+
+    target = Target(home=args.home, root=args.root)
+    repos = managed_checkouts(args.repo, target)
+    if not repos:
+        print("No managed checkouts found; run `configs-cli setup` first")
+        return True
+    print_step(f"Checking {len(repos)} checkouts")
+    results = update_all(repos, jobs=args.jobs)
+    ok = print_report(results)
+    updated = {result.repo.name for result in results if result.status == UPDATED}
+    if "catppuccin-zsh-syntax-highlighting" in updated:
+        # The theme file is a copy out of that checkout
+        install_oh_my_zsh_theme(target)
+    return ok
@@ -0,0 +1,214 @@
+"""
+`configs-cli watch`: reload programs and repair links as the configs change.
+
+The repository's config/ and dotfiles/ trees and the directories holding the
+managed links are watched with inotify (through ctypes, no extra dependency).
+The process sleeps in poll() until something happens, then keeps collecting
+events until none arrive for the debounce interval, so an editor's
+write-rename-chmod burst or a `git pull` becomes one batch. For each batch the
+links are re-planned and repaired, and every program whose files changed is
+reloaded once.
+"""
+import ctypes
+import errno
+import os
+import select
+import struct
+import time
+
+from configs_cli.links import MISSING, NOT_A_LINK, WRONG_TARGET, apply_links, manifest, plan_links
+from configs_cli.reload import CONSUMERS, consumer_of, reload_program
+
+IN_ATTRIB = 0x004
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ISDIR = 0x40000000
+IN_CLOEXEC = 0o2000000
+
+# Files whose content changed or that appeared or went away
+CONTENT_MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+# Link names appearing, disappearing or being replaced
+LINK_MASK = IN_MOVED_TO | IN_MOVED_FROM | IN_CREATE | IN_DELETE | IN_ATTRIB
+EVENT_HEADER = struct.Struct("iIII")
+# Scratch files editors write next to the real one
+SCRATCH_SUFFIXES = ("~", ".swp", ".swx", ".tmp")
+SCRATCH_NAMES = {"4913"}
+
+
+class Inotify:
+    """A minimal inotify instance: add watches, read (directory, mask, name) events"""
+
+    def __init__(self):
+        self._libc = ctypes.CDLL(None, use_errno=True)
+        self._libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        self.fd = self._libc.inotify_init1(IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, f"inotify_init1: {os.strerror(err)}")
+        self.watches = {}
+
+    def add(self, path, mask):
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err), path)
+        self.watches[wd] = path
+        return wd
+
+    def read(self):
+        """Read the pending events; blocks if there are none"""
+        data = os.read(self.fd, 64 * 1024)
+        events = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+            offset += length
+            directory = self.watches.get(wd)
+            if mask & IN_IGNORED:
+                self.watches.pop(wd, None)
+                continue
+            events.append((directory, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+def is_scratch(name):
+    return name in SCRATCH_NAMES or name.endswith(SCRATCH_SUFFIXES) or name.startswith(".#")
+
+
+class Watcher:
+    """Maps inotify events on the repository and the link directories to link repairs and reloads"""
+
+    def __init__(self, repo_dir, target, de=None, debounce=0.2):
+        self.repo_dir = os.path.abspath(repo_dir)
+        self.target = target
+        self.de = de
+        self.debounce = debounce
+        self.inotify = Inotify()
+        self.trees = [os.path.join(self.repo_dir, part) for part in ("config", "dotfiles")]
+        self.link_paths = {target.path(link.dest) for link in manifest(de)}
+
+    def in_trees(self, path):
+        """Whether path is inside the repository's config/ or dotfiles/ tree"""
+        return any(path == tree or path.startswith(tree + os.sep) for tree in self.trees)
+
+    def watch_tree(self, root):
+        for dirpath, dirnames, _ in os.walk(root):
+            dirnames[:] = [name for name in dirnames if name != ".git"]
+            try:
+                self.inotify.add(dirpath, CONTENT_MASK)
+            except OSError as e:
+                print(f"Warning: cannot watch {dirpath}: {e}")
+
+    def start(self):
+        for tree in self.trees:
+            self.watch_tree(tree)
+        for parent in sorted({os.path.dirname(path) for path in self.link_paths}):
+            os.makedirs(parent, exist_ok=True)
+            self.inotify.add(parent, LINK_MASK)
+
+    def repair_links(self):
+        """Recreate managed links that are missing or point elsewhere; real files are left alone"""
+        plan = plan_links(self.target.inside(self.repo_dir), self.target.home, self.de)
+        broken = [action for action in plan if action.status in (MISSING, WRONG_TARGET)]
+        for action in plan:
+            if action.status == NOT_A_LINK:
+                print(f"Warning: {action.dest} is not a link; run `configs-cli setup` to replace it")
+        return apply_links(broken)
+
+    def collect(self):
+        """Block until events arrive, then gather them until the debounce interval passes quietly"""
+        poller = select.poll()
+        poller.register(self.inotify.fd, select.POLLIN)
+        events = []
+        while True:
+            try:
+                ready = poller.poll(None if not events else self.debounce * 1000)
+            except InterruptedError:
+                continue
+            if not ready:
+                return events
+            events += self.inotify.read()
+
+    def classify(self, events):
+        """Return (programs to reload, whether links need checking) for a batch of events"""
+        programs = set()
+        check_links = False
+        for directory, mask, name in events:
+            if mask & IN_Q_OVERFLOW or directory is None:
+                # Lost events: assume everything changed
+                return {program for _, program in CONSUMERS}, True
+            path = os.path.join(directory, name) if name else directory
+            if path in self.link_paths:
+                check_links = True
+                continue
+            if not self.in_trees(path):
+                # Anything else happening in $HOME or ~/.config is not ours
+                continue
+            if mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO):
+                self.watch_tree(path)
+            if is_scratch(name):
+                continue
+            program = consumer_of(self.repo_dir, path)
+            if program:
+                programs.add(program)
+            if mask & (IN_DELETE_SELF | IN_MOVED_FROM | IN_DELETE):
+                # A linked source may have gone away
+                check_links = True
+        return programs, check_links
+
+    def handle(self, events):
+        programs, check_links = self.classify(events)
+        if not programs and not check_links:
+            return
+        stamp = time.strftime("%H:%M:%S")
+        if check_links:
+            repaired = self.repair_links()
+            if repaired:
+                print(f"[{stamp}] repaired {len(repaired)} link(s)")
+        for program in sorted(programs):
+            print(f"[{stamp}] {program}: config changed")
+            reload_program(program, self.repo_dir, self.target)
+
+    def run(self, batches=None):
+        """Watch until interrupted (or for a number of batches) and react to every batch"""
+        self.start()
+        self.repair_links()
+        print(f"Watching {self.repo_dir} and {len(self.link_paths)} links (Ctrl-C to stop)")
+        handled = 0
+        try:
+            while batches is None or handled < batches:
+                self.handle(self.collect())
+                handled += 1
+        except KeyboardInterrupt:
+            print("\nStopped watching")
+        finally:
+            self.inotify.close()
+
+
+def run_watch(args):
+    """Run the watch command"""
+    from configs_cli.target import Target
+    if not os.path.isdir(os.path.join(args.repo, "dotfiles")):
+        print(f"Error: {args.repo} is not a configs repository")
+        return False
+    try:
+        watcher = Watcher(args.repo, Target(home=args.home), args.de, debounce=args.debounce_ms / 1000)
+    except OSError as e:
+        if e.errno == errno.EMFILE:
+            print("Error: too many inotify instances; raise fs.inotify.max_user_instances")
+        else:
+            print(f"Error: cannot start watching: {e}")
+        return False
+    watcher.run()
+    return True
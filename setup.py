@@ -5,7 +5,7 @@ setup(
     version="0.2.0",
     description="CLI tool for setting up a headless development environment",
     author="Your Name",
-    packages=find_packages(),
+    packages=find_packages(exclude=["tests", "tests.*"]),
     entry_points={
         'console_scripts': [
             'configs-cli=configs_cli.main:main',
@@ -0,0 +1,44 @@
+import os
+import subprocess
+
+import pytest
+
+
+def git(*args, cwd=None):
+    result = subprocess.run(["git", "-c", "user.name=test", "-c", "user.email=test@example.com"] + list(args),
+                            cwd=cwd, check=True, capture_output=True, text=True)
+    return result.stdout.strip()
+
+
+class Upstream:
+    """A bare repository reachable over file:// and a work tree that pushes commits to it"""
+
+    def __init__(self, root, name):
+        self.name = name
+        self.bare = os.path.join(root, "upstream", name + ".git")
+        self.work = os.path.join(root, "upstream", name + "-work")
+        git("init", "--quiet", "--bare", "-b", "main", self.bare)
+        git("clone", "--quiet", self.bare, self.work)
+        git("checkout", "--quiet", "-b", "main", cwd=self.work)
+        self.url = "file://" + self.bare
+        self.commits = []
+
+    def commit(self, filename="README", content=None):
+        """Commit a change to filename, push it and return the new commit id"""
+        with open(os.path.join(self.work, filename), "w") as f:
+            f.write(content if content is not None else f"{self.name} {len(self.commits)}\n")
+        git("add", filename, cwd=self.work)
+        git("commit", "--quiet", "-m", f"change {len(self.commits)}", cwd=self.work)
+        git("push", "--quiet", "origin", "HEAD:main", cwd=self.work)
+        self.commits.append(git("rev-parse", "HEAD", cwd=self.work))
+        return self.commits[-1]
+
+
+@pytest.fixture
+def upstream(tmp_path):
+    """Factory for Upstream repositories with a first commit: upstream("name")"""
+    def make(name):
+        repo = Upstream(str(tmp_path), name)
+        repo.commit()
+        return repo
+    return make
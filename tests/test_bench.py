@@ -0,0 +1,133 @@
+import json
+import os
+
+import pytest
+
+from configs_cli import bench
+from configs_cli.bench import (bench_shell, lazy_plugin_modules, nvim_samples, parse_startuptime, parse_zprof,
+                               zsh_components)
+
+STARTUPTIME = """\
+times in msec
+ clock   self+sourced   self:  sourced script
+000.010  000.010: --- NVIM STARTING ---
+001.000  000.500  000.400: sourcing {home}/.config/nvim/init.lua
+002.000  000.300  000.250: require('telescope')
+003.000  000.200  000.150: sourcing {home}/.local/share/nvim/lazy/telescope.nvim/plugin/telescope.lua
+004.000  000.100  000.100: sourcing /usr/share/nvim/runtime/filetype.lua
+005.000  000.100  000.050: require('options.keys')
+"""
+
+ZPROF = """\
+num  calls                time                       self            name
+-----------------------------------------------------------------------------------
+ 1)    2          12.50     6.25   50.00%      8.00     4.00   32.00%  compinit
+ 2)    1           4.50     4.50   18.00%      4.50     4.50   18.00%  nvm_load
+
+-----------------------------------------------------------------------------------
+
+ 1)    2          12.50     6.25   50.00%      8.00     4.00   32.00%  compinit
+"""
+
+# Writes the startup log nvim would, with the home the test gives it
+FAKE_NVIM = """\
+#!/bin/sh
+while [ $# -gt 0 ]; do
+    [ "$1" = --startuptime ] && log=$2
+    shift
+done
+sed "s|{{home}}|$HOME|" '{template}' > "$log"
+"""
+
+# Plays `zsh -i -c exit` under the profiling ZDOTDIR: it reads the log and zprof
+# paths from the generated .zshrc and reports what the real zshrc would source.
+# The zshrc gets slower with every run; Oh My Zsh is sourced twice per run.
+FAKE_ZSH = """\
+#!/bin/sh
+[ "$*" = "-i -c exit" ] || exit 2
+[ -n "$ZDOTDIR" ] || exit 0
+rc="$ZDOTDIR/.zshrc"
+grep -q 'builtin source "$HOME/.zshrc"' "$rc" || exit 3
+log=$(sed -n 's/^typeset -g __bench_log=//p' "$rc")
+zprof=$(sed -n 's/^zprof > //p' "$rc")
+echo "$ZDOTDIR" >> '{dirs}'
+run=$(( $(cat '{counter}' 2>/dev/null || echo 0) + 1 ))
+echo $run > '{counter}'
+printf '%s\\t%s\\n' "$HOME/.zshrc" "$(( run * 10 ))" >> "$log"
+printf '%s\\t%s\\n' "$HOME/.oh-my-zsh/oh-my-zsh.sh" 4.5 "$HOME/.oh-my-zsh/oh-my-zsh.sh" 1.5 >> "$log"
+printf '%s\\t%s\\n' /usr/share/zsh/plugins/zsh-autocomplete.zsh 2.25 >> "$log"
+cat '{zprof_template}' > "$zprof"
+"""
+
+
+@pytest.fixture
+def home(tmp_path, monkeypatch):
+    home = os.path.realpath(tmp_path / "home")
+    os.makedirs(os.path.join(home, ".config", "nvim"))
+    os.makedirs(os.path.join(home, ".local", "share", "nvim", "lazy", "telescope.nvim", "lua", "telescope"))
+    monkeypatch.setenv("HOME", home)
+    return home
+
+
+def test_startuptime_is_split_per_plugin(home):
+    lazy_root = os.path.join(home, ".local", "share", "nvim", "lazy")
+    modules = lazy_plugin_modules(lazy_root)
+    assert modules == {"telescope": "telescope.nvim"}
+    components = parse_startuptime(STARTUPTIME.format(home=home), lazy_root, modules)
+    assert components == pytest.approx({"config": 0.45, "plugin telescope.nvim": 0.4, "runtime": 0.1})
+
+
+def test_nvim_samples_take_the_median_per_plugin(home, tmp_path):
+    template = tmp_path / "startuptime.log"
+    template.write_text(STARTUPTIME)
+    nvim = tmp_path / "nvim"
+    nvim.write_text(FAKE_NVIM.format(template=template))
+    nvim.chmod(0o755)
+    samples, components = nvim_samples(str(nvim), 3)
+    assert len(samples) == 3 and all(ms > 0 for ms in samples)
+    assert components == pytest.approx({"config": 0.45, "plugin telescope.nvim": 0.4, "runtime": 0.1})
+
+
+def test_zprof_self_times():
+    assert parse_zprof(ZPROF) == {"fn compinit": 8.0, "fn nvm_load": 4.5}
+
+
+@pytest.fixture
+def fake_zsh(home, tmp_path):
+    zprof = tmp_path / "zprof.txt"
+    zprof.write_text(ZPROF)
+    zsh = tmp_path / "zsh"
+    zsh.write_text(FAKE_ZSH.format(dirs=tmp_path / "dirs", counter=tmp_path / "counter", zprof_template=zprof))
+    zsh.chmod(0o755)
+    return str(zsh)
+
+
+def test_zsh_components_attribute_time_per_sourced_file(fake_zsh, tmp_path):
+    components = zsh_components(fake_zsh, 3)
+    assert components == pytest.approx({"source ~/.zshrc": 20.0,
+                                        "source ~/.oh-my-zsh/oh-my-zsh.sh": 6.0,
+                                        "source /usr/share/zsh/plugins/zsh-autocomplete.zsh": 2.25,
+                                        "fn compinit": 8.0,
+                                        "fn nvm_load": 4.5})
+    # Every run used the same private ZDOTDIR, which is removed afterwards
+    dirs = set((tmp_path / "dirs").read_text().split())
+    assert len(dirs) == 1 and not os.path.exists(dirs.pop())
+
+
+def test_bench_shell_reports_p50_p95_and_components(fake_zsh, tmp_path, monkeypatch, capsys):
+    samples = iter(range(10, 210, 10))
+    monkeypatch.setattr(bench, "time_command", lambda cmd, env=None: float(next(samples)))
+    history = tmp_path / "history.json"
+    assert bench_shell(runs=10, zsh=fake_zsh, only=["zsh"], history=str(history), top=2)
+    out = capsys.readouterr().out.splitlines()
+    report = out.index("zsh -i -c exit     p50     50.0 ms   p95    100.0 ms")
+    assert out[report + 1:report + 3] == ["        30.0 ms  source ~/.zshrc", "         8.0 ms  fn compinit"]
+    result = json.loads(history.read_text())[-1]["results"]["zsh"]
+    assert (result["p50"], result["p95"]) == (50.0, 100.0)
+
+    # The next run is compared with the recorded one
+    assert bench_shell(runs=10, zsh=fake_zsh, only=["zsh"], history=str(history), top=2)
+    out = capsys.readouterr().out
+    assert "zsh    p50 50.0 -> 150.0 ms (+100.0 ms, +200%)" in out
+    assert "+50.0 ms  source ~/.zshrc" in out
+    assert len(json.loads(history.read_text())) == 2
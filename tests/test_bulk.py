@@ -0,0 +1,85 @@
+import os
+from types import SimpleNamespace
+
+import pytest
+
+from configs_cli import bulk
+from configs_cli.bulk import SharedPlan, provision_many
+from configs_cli.target import Target
+
+TREES = [os.path.join(".zsh", "zsh-autosuggestions"), ".oh-my-zsh",
+         os.path.join(".zsh", "catppuccin_mocha-zsh-syntax-highlighting.zsh")]
+
+
+def fake_prepare(args, cache, staging):
+    """Stage the shared trees without cloning or installing anything"""
+    args.staging = staging
+    plugin = os.path.join(staging, TREES[0])
+    os.makedirs(os.path.join(plugin, "src"))
+    with open(os.path.join(plugin, "src", "widgets.zsh"), "w") as f:
+        f.write("_zsh_autosuggest_widgets() {}\n")
+    os.symlink("src/widgets.zsh", os.path.join(plugin, "zsh-autosuggestions.zsh"))
+    os.makedirs(os.path.join(staging, ".oh-my-zsh", "custom"))
+    with open(os.path.join(staging, ".oh-my-zsh", "oh-my-zsh.sh"), "w") as f:
+        f.write("# oh my zsh\n")
+    with open(os.path.join(staging, TREES[2]), "w") as f:
+        f.write("# mocha\n")
+    return SharedPlan(os.path.abspath(args.repo), args.de, staging, TREES)
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "repo"
+    (repo / "dotfiles").mkdir(parents=True)
+    (repo / "dotfiles" / "zshrc").write_text("")
+    return repo
+
+
+def test_provision_many_stamps_each_home(tmp_path, repo, monkeypatch):
+    monkeypatch.setattr(bulk, "prepare", fake_prepare)
+    homes = [tmp_path / "alice", tmp_path / "bob"]
+    for uid, home in enumerate(homes, 1001):
+        home.mkdir()
+        (home / ".zshrc").write_text("# my own\n")
+        if os.geteuid() == 0:
+            os.chown(home, uid, uid)
+    args = SimpleNamespace(repo=str(repo), de="i3", jobs=2, clone_jobs=1, offline=True,
+                           cache_dir=str(tmp_path / "cache"), cache_max_size=0)
+
+    assert provision_many(args, [Target(home=str(home)) for home in homes]) is True
+
+    widgets = []
+    for uid, home in enumerate(homes, 1001):
+        plugin = home / TREES[0]
+        assert os.readlink(plugin / "zsh-autosuggestions.zsh") == "src/widgets.zsh"
+        assert (home / ".oh-my-zsh" / "oh-my-zsh.sh").read_text() == "# oh my zsh\n"
+        assert (home / TREES[2]).read_text() == "# mocha\n"
+        assert os.readlink(home / ".zshrc") == str(repo / "dotfiles" / "zshrc")
+        assert (home / ".xinitrc").read_text().endswith("exec i3\n")
+        assert (home / "Documents").is_dir()
+        # The replaced zshrc was kept in the home's own snapshot store
+        assert os.listdir(home / ".local" / "state" / "configs-cli" / "snapshots")
+        widgets.append(os.stat(plugin / "src" / "widgets.zsh"))
+        if os.geteuid() == 0:
+            assert os.stat(plugin / "src" / "widgets.zsh").st_uid == uid
+            assert os.lstat(home / ".oh-my-zsh").st_uid == uid
+
+    # Each home has its own copy, so adopting one never changes the other
+    assert widgets[0].st_ino != widgets[1].st_ino
+    assert not os.path.exists(args.staging)
+
+
+def test_provision_many_reports_failed_targets(tmp_path, repo, monkeypatch, capsys):
+    monkeypatch.setattr(bulk, "prepare", fake_prepare)
+    good = tmp_path / "good"
+    good.mkdir()
+    blocked = tmp_path / "blocked"
+    blocked.write_text("not a directory\n")
+    args = SimpleNamespace(repo=str(repo), de="kde", jobs=2, clone_jobs=1, offline=True,
+                           cache_dir=str(tmp_path / "cache"), cache_max_size=0)
+
+    assert provision_many(args, [Target(home=str(good)), Target(home=str(blocked))]) is False
+    out = capsys.readouterr().out
+    assert "1 of 2 targets provisioned" in out
+    assert f"{blocked}  FAILED" in out
+    assert (good / ".oh-my-zsh" / "oh-my-zsh.sh").exists()
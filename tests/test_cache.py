@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+from configs_cli.cache import ArtifactCache, CacheMiss, file_sha256
+
+
+def seed(cache, tmp_path, url, body, last_used):
+    """Store body as the download of url, last used at the given time"""
+    src = tmp_path / "download"
+    src.write_bytes(body)
+    blob = cache.store(url, str(src))
+    os.utime(blob, (last_used, last_used))
+    return blob
+
+
+def test_evict_removes_least_recently_used_first(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), max_size=250)
+    old = seed(cache, tmp_path, "https://a/old", b"o" * 100, 1000)
+    used = seed(cache, tmp_path, "https://a/used", b"u" * 100, 2000)
+    new = seed(cache, tmp_path, "https://a/new", b"n" * 100, 3000)
+    # A lookup counts as a use
+    assert cache.lookup("https://a/old") == old
+
+    mirror = os.path.join(cache.mirrors_dir, "repo-0123456789abcdef.git")
+    os.makedirs(os.path.join(mirror, "objects"))
+    with open(os.path.join(mirror, "objects", "pack"), "wb") as f:
+        f.write(b"m" * 100)
+    os.utime(mirror, (1500, 1500))
+
+    assert cache.evict() == [mirror, used]
+    assert os.path.exists(old) and os.path.exists(new)
+    assert sum(size for _, size, _ in cache.entries()) <= 250
+    assert cache.evict() == []
+
+
+def test_evict_is_off_without_a_limit(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"), max_size=0)
+    seed(cache, tmp_path, "https://a/file", b"x" * 100, 1000)
+    assert cache.evict() == []
+
+
+def test_store_deduplicates_by_content(tmp_path):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    first = seed(cache, tmp_path, "https://a/install.sh", b"same\n", 1000)
+    second = seed(cache, tmp_path, "https://b/install.sh", b"same\n", 1000)
+    assert first == second == cache.blob_path(file_sha256(first))
+    assert len(cache.entries()) == 1
+
+
+def test_offline_fetch_is_served_from_blobs(tmp_path, monkeypatch):
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    blob = seed(cache, tmp_path, "https://b/install.sh", b"#!/bin/sh\n", 1000)
+    offline = ArtifactCache(cache.root, offline=True)
+
+    def no_network(*args, **kwargs):
+        raise AssertionError("offline fetch used the network")
+
+    monkeypatch.setattr("configs_cli.fetch.fetch", no_network)
+    dest = tmp_path / "install.sh"
+    assert offline.fetch_file(["https://a/install.sh", "https://b/install.sh"], str(dest)) == "https://b/install.sh"
+    assert dest.read_bytes() == b"#!/bin/sh\n"
+    assert os.stat(blob).st_mtime > 1000
+
+    # A cached copy that does not match the expected digest is not used
+    with pytest.raises(CacheMiss):
+        offline.fetch_file("https://b/install.sh", str(tmp_path / "other.sh"), sha256="0" * 64)
+    assert not (tmp_path / "other.sh").exists()
+
+
+def test_offline_fetch_of_an_uncached_file_is_a_cache_miss(tmp_path):
+    offline = ArtifactCache(str(tmp_path / "cache"), offline=True)
+    with pytest.raises(CacheMiss, match="https://a/install.sh"):
+        offline.fetch_file("https://a/install.sh", str(tmp_path / "install.sh"))
+    assert not (tmp_path / "install.sh").exists()
+    assert not os.path.exists(offline.root)
+
+
+def test_offline_mirror_must_be_cached(tmp_path):
+    offline = ArtifactCache(str(tmp_path / "cache"), offline=True)
+    with pytest.raises(CacheMiss):
+        offline.ensure_mirror("https://github.com/example/repo.git")
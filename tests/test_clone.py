@@ -0,0 +1,43 @@
+import os
+
+from configs_cli.cache import ArtifactCache
+from configs_cli.clone import Repository, clone_all
+from tests.conftest import git
+
+
+def test_clones_are_shallow_and_failures_isolated(tmp_path, upstream):
+    first, second = upstream("first"), upstream("second")
+    second.commit()
+    present = tmp_path / "home" / "present"
+    present.mkdir(parents=True)
+    repos = [Repository("first", first.url, str(tmp_path / "home" / "first")),
+             Repository("second", second.url, str(tmp_path / "home" / "nested" / "second")),
+             Repository("present", first.url, str(present)),
+             Repository("missing", "file://" + str(tmp_path / "nowhere.git"), str(tmp_path / "home" / "missing"))]
+
+    results = clone_all(repos, jobs=2)
+
+    assert [name for name, error in results.items() if error is not None] == ["missing"]
+    assert not os.path.exists(tmp_path / "home" / "missing")
+    assert os.listdir(present) == []
+    second_dir = str(tmp_path / "home" / "nested" / "second")
+    assert git("rev-parse", "HEAD", cwd=second_dir) == second.commits[-1]
+    assert git("rev-list", "--count", "HEAD", cwd=second_dir) == "1"
+
+
+def test_clones_through_the_cache_keep_the_real_origin(tmp_path, upstream):
+    repo = upstream("plugin")
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    dest = str(tmp_path / "home" / "plugin")
+
+    assert clone_all([Repository("plugin", repo.url, dest)], cache=cache) == {"plugin": None}
+
+    assert os.path.isdir(cache.mirror_path(repo.url))
+    assert git("remote", "get-url", "origin", cwd=dest) == repo.url
+    assert git("rev-parse", "HEAD", cwd=dest) == repo.commits[-1]
+
+    # Offline, the mirror alone is enough
+    offline = ArtifactCache(str(tmp_path / "cache"), offline=True)
+    again = str(tmp_path / "other" / "plugin")
+    assert clone_all([Repository("plugin", repo.url, again)], cache=offline) == {"plugin": None}
+    assert git("rev-parse", "HEAD", cwd=again) == repo.commits[-1]
@@ -0,0 +1,77 @@
+import os
+
+import pytest
+
+from configs_cli import executables
+from configs_cli.executables import ExecutableIndex, doctor, find_executables, missing_executables, which
+
+TOOLS = ["tool%d" % n for n in range(40)]
+
+
+def install(directory, name):
+    path = directory / name
+    path.write_text("#!/bin/sh\n")
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def scans(monkeypatch):
+    """The directories os.scandir was called on"""
+    scanned = []
+    scandir = os.scandir
+
+    def counting(path="."):
+        scanned.append(str(path))
+        return scandir(path)
+
+    monkeypatch.setattr(executables.os, "scandir", counting)
+    return scanned
+
+
+@pytest.fixture
+def path(tmp_path, monkeypatch):
+    dirs = [tmp_path / name for name in ("bin", "local", "missing")]
+    for directory in dirs[:2]:
+        directory.mkdir()
+    install(dirs[0], "tool1")
+    install(dirs[1], "tool1")
+    install(dirs[1], "tool2")
+    (dirs[1] / "tool3").write_text("not executable\n")
+    monkeypatch.setenv("PATH", os.pathsep.join(str(directory) for directory in dirs + [dirs[0]]))
+    return dirs
+
+
+def test_every_directory_is_scanned_once(path, scans):
+    index = ExecutableIndex()
+    assert index.missing(TOOLS) == [tool for tool in TOOLS if tool not in ("tool1", "tool2")]
+    found = index.find(["tool1", "tool2", "tool3"])
+    assert found == {"tool1": str(path[0] / "tool1"), "tool2": str(path[1] / "tool2"), "tool3": None}
+    for _ in range(3):
+        index.which("tool2")
+    assert scans == [str(directory) for directory in path]
+
+
+def test_the_index_is_refreshed_after_an_install(path, scans):
+    assert missing_executables(["tool2", "yay"]) == ["yay"]
+    yay = install(path[1], "yay")
+    # Still the result of the first scan until something says software was installed
+    assert which("yay") is None
+    executables.refresh_executables()
+    assert find_executables(["yay", "tool2"]) == {"yay": yay, "tool2": str(path[1] / "tool2")}
+    assert len(scans) == 2 * len(path)
+
+
+def test_a_changed_path_is_rescanned(path, monkeypatch):
+    assert which("tool2") is not None
+    monkeypatch.setenv("PATH", str(path[0]))
+    assert which("tool2") is None
+
+
+def test_doctor_reports_every_group(path, monkeypatch, capsys):
+    monkeypatch.setattr(executables, "REQUIRED_TOOLS", {"setup": ["tool1"], "shell": ["tool2", "zsh-nope"]})
+    assert doctor() is False
+    output = capsys.readouterr().out
+    assert f"tool1: {path[0] / 'tool1'}" in output and "zsh-nope: not found" in output
+    monkeypatch.setattr(executables, "REQUIRED_TOOLS", {"setup": ["tool1"]})
+    assert doctor() is True
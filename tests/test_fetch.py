@@ -0,0 +1,94 @@
+import hashlib
+import http.server
+import threading
+import time
+
+import pytest
+
+from configs_cli import provision
+from configs_cli.cache import ArtifactCache
+from configs_cli.fetch import FetchError, fetch
+
+INSTALLER = b"#!/bin/sh\necho installing\n"
+DIGEST = hashlib.sha256(INSTALLER).hexdigest()
+
+
+def serve(body, stall=None):
+    """An HTTP server answering every path with body, after waiting for stall if it is given"""
+
+    class Handler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if stall is not None:
+                stall.wait(10)
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/install.sh"
+
+
+@pytest.fixture
+def mirrors():
+    """(stalling mirror, good mirror, mirror serving something else)"""
+    stall = threading.Event()
+    servers = [serve(INSTALLER, stall), serve(INSTALLER), serve(b"tampered\n")]
+    yield [url for _, url in servers]
+    stall.set()
+    for server, _ in servers:
+        server.shutdown()
+        server.server_close()
+
+
+def test_a_stalled_mirror_is_hedged(tmp_path, mirrors):
+    stalled, good, _ = mirrors
+    started = time.monotonic()
+    assert fetch([stalled, good], str(tmp_path / "install.sh"), hedge_delay=0.05) == good
+    assert time.monotonic() - started < 5
+    assert (tmp_path / "install.sh").read_bytes() == INSTALLER
+
+
+def test_a_wrong_digest_is_refused(tmp_path, mirrors):
+    _, good, tampered = mirrors
+    assert fetch([tampered, good], str(tmp_path / "install.sh"), sha256=DIGEST, hedge_delay=5) == good
+    with pytest.raises(FetchError, match="sha256 mismatch"):
+        fetch([tampered], str(tmp_path / "other.sh"), sha256=DIGEST)
+    assert not (tmp_path / "other.sh").exists()
+    assert [path.name for path in tmp_path.iterdir()] == ["install.sh"]
+
+
+def test_the_first_installer_download_is_pinned(tmp_path, mirrors, monkeypatch):
+    monkeypatch.delenv("CONFIGS_CLI_OH_MY_ZSH_SHA256", raising=False)
+    _, good, tampered = mirrors
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    assert provision.oh_my_zsh_installer_sha256(cache, [good]) is None
+    cache.fetch_file([good], str(tmp_path / "install.sh"))
+    assert provision.oh_my_zsh_installer_sha256(cache, [tampered, good]) == DIGEST
+    monkeypatch.setenv("CONFIGS_CLI_OH_MY_ZSH_SHA256", "ABC")
+    assert provision.oh_my_zsh_installer_sha256(cache, [good]) == "abc"
+
+
+def test_the_pin_survives_eviction(tmp_path, mirrors, monkeypatch):
+    monkeypatch.delenv("CONFIGS_CLI_OH_MY_ZSH_SHA256", raising=False)
+    _, good, tampered = mirrors
+    cache = ArtifactCache(str(tmp_path / "cache"), max_size=1)
+    cache.fetch_file([good], str(tmp_path / "install.sh"))
+    assert len(cache.evict()) == 1
+    assert cache.lookup(good) is None
+    assert provision.oh_my_zsh_installer_sha256(cache, [good]) == DIGEST
+    with pytest.raises(FetchError, match="sha256 mismatch"):
+        cache.fetch_file([tampered], str(tmp_path / "again.sh"),
+                         sha256=provision.oh_my_zsh_installer_sha256(cache, [tampered, good]))
+
+
+def test_no_mirrors_is_a_value_error(tmp_path):
+    with pytest.raises(ValueError, match="at least one URL"):
+        fetch([], str(tmp_path / "install.sh"))
+    with pytest.raises(ValueError, match="at least one URL"):
+        ArtifactCache(str(tmp_path / "cache")).fetch_file([], str(tmp_path / "install.sh"))
@@ -0,0 +1,140 @@
+import os
+
+import pytest
+
+from configs_cli import links
+from configs_cli.links import MISSING, NOT_A_LINK, OK, WRONG_TARGET, Link, apply_links, plan_links, swap_link
+from configs_cli.snapshots import SnapshotStore
+
+LINKS = [
+    Link("dotfiles/zshrc", ".zshrc", "zshrc"),
+    Link("dotfiles/tmux.conf", ".tmux.conf", "tmux.conf"),
+    Link("config/nvim", ".config/nvim", "nvim config"),
+    Link("config/kitty", ".config/kitty", "kitty config"),
+    Link("config/picom", ".config/picom", "picom config"),
+]
+
+
+@pytest.fixture
+def repo(tmp_path):
+    repo = tmp_path / "repo"
+    for directory in ("config/nvim", "config/kitty", "config/picom"):
+        (repo / directory).mkdir(parents=True)
+    (repo / "dotfiles").mkdir()
+    (repo / "dotfiles" / "zshrc").write_text("")
+    (repo / "dotfiles" / "tmux.conf").write_text("")
+    return repo
+
+
+@pytest.fixture
+def home(tmp_path, repo):
+    """One managed path in each state"""
+    home = tmp_path / "home"
+    (home / ".config" / "kitty").mkdir(parents=True)
+    (home / ".config" / "kitty" / "kitty.conf").write_text("font_size 12\n")
+    os.symlink(repo / "dotfiles" / "zshrc", home / ".zshrc")
+    (home / ".tmux.conf").write_text("set -g mouse on\n")
+    os.symlink("/elsewhere/picom", home / ".config" / "picom")
+    return home
+
+
+def statuses(plan):
+    return {action.link.dest: action.status for action in plan}
+
+
+def test_plan_statuses(repo, home):
+    plan = plan_links(str(repo), home=str(home), links=LINKS)
+    assert statuses(plan) == {".zshrc": OK,
+                              ".tmux.conf": NOT_A_LINK,
+                              ".config/nvim": MISSING,
+                              ".config/kitty": NOT_A_LINK,
+                              ".config/picom": WRONG_TARGET}
+    picom = plan[-1]
+    assert picom.current == "/elsewhere/picom"
+    assert picom.src == str(repo / "config" / "picom")
+    assert [action.needs_change for action in plan] == [False, True, True, True, True]
+
+
+def test_plan_reads_each_parent_directory_once(repo, home, monkeypatch):
+    scanned = []
+    real_scandir = os.scandir
+
+    def scandir(path):
+        scanned.append(path)
+        return real_scandir(path)
+
+    monkeypatch.setattr(os, "scandir", scandir)
+    plan_links(str(repo), home=str(home), links=LINKS)
+    assert sorted(scanned) == sorted([str(home), str(home / ".config")])
+
+
+def test_plan_with_a_missing_parent(repo, tmp_path):
+    plan = plan_links(str(repo), home=str(tmp_path / "new-home"), links=LINKS)
+    assert set(statuses(plan).values()) == {MISSING}
+
+
+def test_apply_replaces_files_and_directories(repo, home):
+    applied = apply_links(plan_links(str(repo), home=str(home), links=LINKS))
+    assert [action.link.dest for action in applied] == [".tmux.conf", ".config/nvim", ".config/kitty", ".config/picom"]
+    for link in LINKS:
+        assert os.readlink(home / link.dest) == str(repo / link.src)
+    assert set(statuses(plan_links(str(repo), home=str(home), links=LINKS)).values()) == {OK}
+    assert not [name for name in os.listdir(home) if ".configs-cli-" in name]
+
+
+def test_apply_into_a_snapshot_keeps_what_was_replaced(repo, home, tmp_path):
+    snapshot = SnapshotStore(str(tmp_path / "snapshots")).new("setup")
+    apply_links(plan_links(str(repo), home=str(home), links=LINKS), snapshot)
+    kinds = {entry["path"]: entry["kind"] for entry in snapshot.entries}
+    assert kinds == {str(home / ".tmux.conf"): "moved",
+                     str(home / ".config" / "nvim"): "absent",
+                     str(home / ".config" / "kitty"): "moved",
+                     str(home / ".config" / "picom"): "link"}
+
+
+def test_swap_renames_a_temporary_link_over_the_old_one(tmp_path, monkeypatch):
+    dest = str(tmp_path / ".zshrc")
+    os.symlink("/old/zshrc", dest)
+    # A leftover from an interrupted run is cleared first
+    stale = f"{dest}.configs-cli-{os.getpid()}"
+    os.symlink("/stale", stale)
+
+    calls = []
+    real_symlink, real_replace, real_remove = os.symlink, os.replace, os.remove
+    monkeypatch.setattr(os, "symlink", lambda *args: calls.append(("symlink",) + args) or real_symlink(*args))
+    monkeypatch.setattr(os, "replace", lambda *args: calls.append(("replace",) + args) or real_replace(*args))
+    monkeypatch.setattr(os, "remove", lambda *args: calls.append(("remove",) + args) or real_remove(*args))
+
+    swap_link("/new/zshrc", dest)
+    assert calls == [("remove", stale), ("symlink", "/new/zshrc", stale), ("replace", stale, dest)]
+    assert os.readlink(dest) == "/new/zshrc"
+    assert not os.path.lexists(stale)
+
+
+def tree_state(root):
+    """(inode, mtime) of root and everything under it, without following links"""
+    state = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        for name in [""] + dirnames + filenames:
+            path = os.path.join(dirpath, name)
+            st = os.lstat(path)
+            state[path] = (st.st_ino, st.st_mtime_ns)
+    return state
+
+
+def test_a_second_apply_writes_nothing(repo, home, monkeypatch):
+    apply_links(plan_links(str(repo), home=str(home), links=LINKS))
+    before = tree_state(home)
+
+    def refuse(*args, **kwargs):
+        raise AssertionError(f"unexpected write: {args}")
+
+    for name in ("symlink", "replace", "remove", "makedirs", "rename"):
+        monkeypatch.setattr(os, name, refuse)
+    assert apply_links(plan_links(str(repo), home=str(home), links=LINKS)) == []
+    assert tree_state(home) == before
+
+
+def test_manifest_filters_by_desktop():
+    assert [link.dest for link in links.manifest("i3")] == [link.dest for link in links.LINKS]
+    assert ".config/i3" not in [link.dest for link in links.manifest("gnome")]
@@ -0,0 +1,43 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ["argparse", "configs_cli.provision"]
+
+# Runs one command in a fresh interpreter and reports which heavy modules it loaded
+PROBE = """\
+import json, sys
+from configs_cli.main import main
+try:
+    main(sys.argv[1:])
+except SystemExit:
+    pass
+print(json.dumps(sorted(name for name in {heavy!r} if name in sys.modules)))
+"""
+
+
+def loaded(tmp_path, *argv):
+    result = subprocess.run([sys.executable, "-c", PROBE.format(heavy=HEAVY)] + list(argv),
+                            cwd=ROOT, capture_output=True, text=True,
+                            env=dict(os.environ, HOME=str(tmp_path), CONFIGS_REPO=str(tmp_path / "repo")))
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+@pytest.mark.parametrize("argv", [
+    ["source"],
+    ["help"],
+    ["check-links"],
+    ["check-links", "--plan", "--repo", "/nonexistent"],
+    ["check-links", "--repo=/nonexistent"],
+])
+def test_fast_path_skips_argparse_and_setup(tmp_path, argv):
+    assert loaded(tmp_path, *argv) == []
+
+
+def test_other_commands_take_the_full_path(tmp_path):
+    # An option the fast path does not know is handed to argparse
+    assert loaded(tmp_path, "check-links", "--verbose") == ["argparse"]
@@ -0,0 +1,77 @@
+import json
+import os
+
+import pytest
+
+from configs_cli.cache import ArtifactCache
+from configs_cli.nvimplugins import LAZY_DIR, checked_out_commit, locked_plugins, plugin_urls, provision_nvim_plugins
+from configs_cli.target import Target
+from tests.conftest import git
+
+SPECS = """\
+return {
+  "owner/alpha",
+  { "https://github.com/owner/beta.git", name = "renamed", lazy = true },
+  { dir = "~/projects/local.nvim" },
+}
+"""
+
+
+@pytest.fixture
+def setup(tmp_path, upstream):
+    """A configs repository locking two plugins, and an offline cache holding their mirrors"""
+    repo_dir = tmp_path / "configs"
+    (repo_dir / "config" / "nvim" / "lua").mkdir(parents=True)
+    (repo_dir / "config" / "nvim" / "lua" / "plugins.lua").write_text(SPECS)
+    cache = ArtifactCache(str(tmp_path / "cache"), offline=True)
+    plugins = {"alpha": upstream("alpha"), "renamed": upstream("beta")}
+    for name, plugin in plugins.items():
+        plugin.commit()
+        url = f"https://github.com/owner/{os.path.basename(plugin.bare)}"
+        git("clone", "--quiet", "--mirror", plugin.bare, cache.mirror_path(url))
+
+    def lock(**commits):
+        lockfile = {name: {"branch": "main", "commit": commit} for name, commit in commits.items()}
+        (repo_dir / "config" / "nvim" / "lazy-lock.json").write_text(json.dumps(lockfile))
+
+    lock(alpha=plugins["alpha"].commits[0], renamed=plugins["renamed"].commits[1], unknown="0" * 40)
+    return str(repo_dir), Target(home=str(tmp_path / "home")), cache, plugins, lock
+
+
+def test_spec_urls(tmp_path):
+    (tmp_path / "plugins.lua").write_text(SPECS)
+    assert plugin_urls(str(tmp_path)) == {"alpha": "https://github.com/owner/alpha.git",
+                                          "beta": "https://github.com/owner/beta.git",
+                                          "renamed": "https://github.com/owner/beta.git"}
+
+
+def test_plugins_are_checked_out_at_their_locked_commits(setup, capsys):
+    repo_dir, target, cache, plugins, lock = setup
+    assert provision_nvim_plugins(repo_dir, target, cache) is True
+    output = capsys.readouterr().out
+    assert "no plugin spec found for unknown" in output
+
+    alpha = target.path(LAZY_DIR, "alpha")
+    assert git("rev-parse", "HEAD", cwd=alpha) == plugins["alpha"].commits[0]
+    assert git("symbolic-ref", "--short", "HEAD", cwd=alpha) == "main"
+    assert git("remote", "get-url", "origin", cwd=alpha) == "https://github.com/owner/alpha.git"
+    assert checked_out_commit(target.path(LAZY_DIR, "renamed")) == plugins["renamed"].commits[1]
+
+    # Nothing to do the second time
+    provision_nvim_plugins(repo_dir, target, cache)
+    assert "All Neovim plugins are at their locked commits" in capsys.readouterr().out
+
+    # A new lock moves the existing checkout
+    lock(alpha=plugins["alpha"].commits[1], renamed=plugins["renamed"].commits[1])
+    assert provision_nvim_plugins(repo_dir, target, cache) is True
+    assert f"Moved alpha to {plugins['alpha'].commits[1][:10]}" in capsys.readouterr().out
+    assert git("rev-parse", "HEAD", cwd=alpha) == plugins["alpha"].commits[1]
+
+
+def test_missing_mirrors_fail_the_step(setup, tmp_path):
+    repo_dir, target, _, plugins, _ = setup
+    empty = ArtifactCache(str(tmp_path / "empty"), offline=True)
+    assert provision_nvim_plugins(repo_dir, target, empty) is False
+    assert not os.path.exists(target.path(LAZY_DIR, "alpha"))
+    plugins_found, unknown = locked_plugins(repo_dir, target)
+    assert [plugin.name for plugin in plugins_found] == ["alpha", "renamed"] and unknown == ["unknown"]
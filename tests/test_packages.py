@@ -0,0 +1,99 @@
+import os
+import textwrap
+
+import pytest
+
+from configs_cli.packages import (PackageDatabase, parse_pacman_desc, plan_packages, read_dpkg_status,
+                                  read_pacman_db)
+
+DPKG_STATUS = """\
+Package: bash
+Status: install ok installed
+Version: 5.2.15-2
+Description: GNU Bourne Again SHell
+ Bash is an sh-compatible command language interpreter.
+ Version: not a field
+
+Package: mawk
+Status: install ok installed
+Provides: awk
+Version: 1.3.4-2
+
+Package: zsh
+Status: deinstall ok config-files
+Version: 5.9-4
+"""
+
+
+def pacman_package(db_dir, name, version, provides=(), groups=()):
+    package = db_dir / f"{name}-{version}"
+    package.mkdir(parents=True)
+    desc = f"%NAME%\n{name}\n\n%VERSION%\n{version}\n\n"
+    if provides:
+        desc += "%PROVIDES%\n" + "\n".join(provides) + "\n\n"
+    if groups:
+        desc += "%GROUPS%\n" + "\n".join(groups) + "\n\n"
+    (package / "desc").write_text(desc)
+
+
+@pytest.fixture
+def pacman_db(tmp_path):
+    db_dir = tmp_path / "local"
+    pacman_package(db_dir, "bash", "5.2.026-2", provides=["sh=5.2"])
+    pacman_package(db_dir, "xorg-server", "21.1.13-1", groups=["xorg"])
+    pacman_package(db_dir, "i3-wm", "4.23-2", groups=["i3"])
+    (db_dir / "ALPM_DB_VERSION").write_text("9\n")
+    (db_dir / "broken-1-1").mkdir()
+    return read_pacman_db(str(db_dir))
+
+
+@pytest.fixture
+def sync_groups(tmp_path, monkeypatch):
+    """A pacman on PATH that answers -Sgq from a fixed sync database"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    pacman = bin_dir / "pacman"
+    pacman.write_text(textwrap.dedent("""\
+        #!/bin/sh
+        [ "$1" = -Sgq ] || exit 2
+        case "$2" in
+            xorg) printf 'xorg-server\\nxorg-xinit\\n' ;;
+            i3) printf 'i3-wm\\n' ;;
+            *) echo "error: target not found: $2" >&2; exit 1 ;;
+        esac
+        """))
+    pacman.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+
+def test_desc_sections():
+    sections = parse_pacman_desc("%NAME%\nbash\n\n%DEPENDS%\nglibc\nreadline\n\n%EMPTY%\n\n")
+    assert sections == {"NAME": ["bash"], "DEPENDS": ["glibc", "readline"], "EMPTY": []}
+
+
+def test_pacman_db(pacman_db):
+    assert len(pacman_db) == 3
+    assert "sh" in pacman_db and pacman_db.version("sh") == "5.2.026-2"
+    assert pacman_db.groups == {"xorg", "i3"}
+    # Groups are not packages
+    assert "xorg" not in pacman_db
+
+
+def test_dpkg_status(tmp_path):
+    status = tmp_path / "status"
+    status.write_text(DPKG_STATUS)
+    db = read_dpkg_status(str(status))
+    assert db.versions == {"bash": "5.2.15-2", "mawk": "1.3.4-2"}
+    assert "awk" in db and "zsh" not in db
+
+
+def test_plan_expands_partly_installed_groups(pacman_db, sync_groups):
+    plan = plan_packages(["bash", "sh", "xorg", "i3", "git", "git"], aur=["yay"], installed=pacman_db)
+    assert plan.official == ["xorg", "git"]
+    assert plan.aur == ["yay"]
+
+
+def test_groups_without_a_sync_database_count_as_installed(pacman_db, monkeypatch, tmp_path):
+    monkeypatch.setenv("PATH", str(tmp_path / "empty"))
+    assert plan_packages(["xorg"], installed=pacman_db).official == []
+    assert not plan_packages([], installed=PackageDatabase())
@@ -0,0 +1,57 @@
+import sys
+import threading
+
+import pytest
+
+from configs_cli.privileged import PrivilegedClient, PrivilegedError
+
+# Exits 0 once the flag file exists, 1 if it does not show up within 10 seconds
+WAIT_FOR_FLAG = """
+import os, sys, time
+deadline = time.monotonic() + 10
+print("waiting", flush=True)
+while not os.path.exists(sys.argv[1]):
+    if time.monotonic() > deadline:
+        sys.exit(1)
+    time.sleep(0.01)
+print("found", flush=True)
+"""
+
+
+@pytest.fixture
+def client(tmp_path):
+    client = PrivilegedClient(root=str(tmp_path))
+    yield client
+    client.close()
+
+
+def test_requests_are_not_held_up_by_a_running_command(tmp_path, client):
+    waiting = threading.Event()
+    result = {}
+
+    def run():
+        reply = client._request("run", on_line=lambda line: waiting.set(),
+                                cmd=[sys.executable, "-c", WAIT_FOR_FLAG, str(tmp_path / "flag")])
+        result["exit_code"] = reply["exit_code"]
+
+    runner = threading.Thread(target=run)
+    runner.start()
+    assert waiting.wait(10)
+    # The command only finishes once this write has gone through the same helper
+    client.write("/flag", "ready")
+    runner.join(20)
+    assert result == {"exit_code": 0}
+
+
+def test_operations_are_mapped_into_the_root(tmp_path, client):
+    client.batch([{"op": "mkdir", "path": "/etc/thing"},
+                  {"op": "write", "path": "/etc/thing/conf", "data": "a=1\n", "mode": 0o600}])
+    assert (tmp_path / "etc" / "thing" / "conf").read_text() == "a=1\n"
+    assert (tmp_path / "etc" / "thing" / "conf").stat().st_mode & 0o777 == 0o600
+
+
+def test_failures_are_reported(client):
+    with pytest.raises(PrivilegedError, match="unknown operation"):
+        client._checked("frobnicate")
+    with pytest.raises(PrivilegedError, match="FileNotFoundError"):
+        client.chmod("/missing", 0o644)
@@ -0,0 +1,43 @@
+from types import SimpleNamespace
+
+from configs_cli import provision
+from configs_cli.cache import ArtifactCache
+from configs_cli.target import Target
+
+
+def arguments(tmp_path, monkeypatch, **target):
+    monkeypatch.setattr(provision, "which", lambda name: None)
+    return SimpleNamespace(target=Target(**target), system="arch", de="i3", repo=str(tmp_path), repo_url=None,
+                           clone_jobs=4)
+
+
+def repositories(tmp_path, monkeypatch, **target):
+    args = arguments(tmp_path, monkeypatch, **target)
+    cache = ArtifactCache(str(tmp_path / "cache"))
+    repos = provision.managed_repositories(args, cache) + [provision.yay_repository(args, cache)]
+    return {repo.name: repo for repo in repos if repo is not None}
+
+
+def test_yay_is_built_in_the_artifact_cache(tmp_path, monkeypatch):
+    repos = repositories(tmp_path, monkeypatch, home=str(tmp_path / "other-home"))
+    assert repos["yay"].dest == str(tmp_path / "cache" / "build" / "yay")
+    assert repos["tpm"].dest == str(tmp_path / "other-home" / ".tmux" / "plugins" / "tpm")
+
+
+def test_root_filesystem_targets_do_not_clone_yay(tmp_path, monkeypatch):
+    (tmp_path / "rootfs").mkdir()
+    repos = repositories(tmp_path, monkeypatch, root=str(tmp_path / "rootfs"), home="/home/user")
+    assert "yay" not in repos
+    assert repos["tpm"].dest == str(tmp_path / "rootfs" / "home" / "user" / ".tmux" / "plugins" / "tpm")
+
+
+def test_packages_do_not_wait_for_the_plugin_clones(tmp_path, monkeypatch):
+    args = arguments(tmp_path, monkeypatch, home=str(tmp_path / "home"))
+    steps = {step.name: step for step in provision.setup_steps(args, ArtifactCache(str(tmp_path / "cache")))}
+    assert steps["dependencies"].requires == ("filesystem", "yay-sources")
+    assert "clones" in steps["oh-my-zsh"].requires
+
+    # A configs repository that is still to be cloned is waited for
+    args.repo = str(tmp_path / "missing")
+    steps = {step.name: step for step in provision.setup_steps(args, ArtifactCache(str(tmp_path / "cache")))}
+    assert "clones" in steps["dependencies"].requires
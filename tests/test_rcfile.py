@@ -0,0 +1,112 @@
+import os
+
+import pytest
+
+from configs_cli import rcfile
+from configs_cli.rcfile import BEGIN_MARKER, END_MARKER, atomic_write, edit_rc_file, render
+
+ZSHRC = """\
+export ZSH="$HOME/.oh-my-zsh"
+export PATH="$HOME/.local/bin:$PATH"
+
+# >>> conda initialize >>>
+__conda_setup="$("$HOME/anaconda3/bin/conda" "shell.zsh" "hook" 2> /dev/null)"
+eval "$__conda_setup"
+# <<< conda initialize <<<
+conda activate Finley
+
+"""
+LOCAL_BIN = 'export PATH="$HOME/.local/bin:$PATH"'
+GEM_BIN = 'export PATH="/usr/lib/ruby/gems/3.3.0/bin:$PATH"'
+
+
+def test_render_removes_conda_and_adds_a_block():
+    text = render(ZSHRC, add=[LOCAL_BIN, GEM_BIN], remove=["conda"])
+    assert text == ('export ZSH="$HOME/.oh-my-zsh"\n'
+                    f"{LOCAL_BIN}\n"
+                    "\n"
+                    f"{BEGIN_MARKER}\n"
+                    f"{GEM_BIN}\n"
+                    f"{END_MARKER}\n")
+    assert "conda" not in text
+
+
+def test_render_does_not_add_removed_lines():
+    assert render("", add=['export PATH="$HOME/anaconda3/bin:$PATH"'], remove=["conda"]) == ""
+
+
+def test_render_is_idempotent():
+    once = render(ZSHRC, add=[LOCAL_BIN, GEM_BIN, GEM_BIN], remove=["conda"])
+    assert render(once, add=[LOCAL_BIN, GEM_BIN], remove=["conda"]) == once
+    assert once.count(GEM_BIN) == 1
+
+
+def test_render_replaces_the_existing_block():
+    old = render("echo hi\n", add=[GEM_BIN, 'export PATH="/old/gems/bin:$PATH"'])
+    new = render(old + "alias l=ls\n", add=[GEM_BIN])
+    assert new == f"echo hi\n\nalias l=ls\n\n{BEGIN_MARKER}\n{GEM_BIN}\n{END_MARKER}\n"
+    assert new.count(BEGIN_MARKER) == 1
+
+
+def test_render_drops_an_empty_block():
+    assert render(f"echo hi\n\n{BEGIN_MARKER}\n{GEM_BIN}\n{END_MARKER}\n") == "echo hi\n"
+
+
+def test_edit_rc_file_writes_once(tmp_path):
+    path = tmp_path / ".zshrc"
+    path.write_text(ZSHRC)
+    assert edit_rc_file(str(path), add=[LOCAL_BIN, GEM_BIN], remove=["conda"]) is True
+    assert path.read_text() == render(ZSHRC, add=[LOCAL_BIN, GEM_BIN], remove=["conda"])
+
+
+def test_edit_rc_file_skips_identical_content(tmp_path, monkeypatch):
+    path = tmp_path / ".zshrc"
+    path.write_text(ZSHRC)
+    edit_rc_file(str(path), add=[GEM_BIN], remove=["conda"])
+    before = os.stat(path)
+
+    def refuse(*args):
+        raise AssertionError("the file was rewritten")
+
+    monkeypatch.setattr(rcfile, "atomic_write", refuse)
+    assert edit_rc_file(str(path), add=[GEM_BIN], remove=["conda"]) is False
+    after = os.stat(path)
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+
+def test_edit_rc_file_creates_a_missing_file(tmp_path):
+    path = tmp_path / ".zshrc"
+    assert edit_rc_file(str(path), add=[LOCAL_BIN]) is True
+    assert path.read_text() == f"\n{BEGIN_MARKER}\n{LOCAL_BIN}\n{END_MARKER}\n"
+    assert edit_rc_file(str(path), remove=["conda"]) is True
+    assert edit_rc_file(str(tmp_path / "other"), remove=["conda"]) is False
+    assert not (tmp_path / "other").exists()
+
+
+def test_atomic_write_follows_links_and_keeps_the_mode(tmp_path):
+    real = tmp_path / "dotfiles" / "zshrc"
+    real.parent.mkdir()
+    real.write_text("old\n")
+    os.chmod(real, 0o600)
+    link = tmp_path / ".zshrc"
+    os.symlink(real, link)
+
+    atomic_write(str(link), "new\n")
+    assert os.readlink(link) == str(real)
+    assert real.read_text() == "new\n"
+    assert os.stat(real).st_mode & 0o777 == 0o600
+    assert os.listdir(real.parent) == ["zshrc"]
+
+
+def test_atomic_write_leaves_nothing_behind_on_failure(tmp_path, monkeypatch):
+    path = tmp_path / ".zshrc"
+    path.write_text("old\n")
+
+    def fail(src, dest):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(os, "replace", fail)
+    with pytest.raises(OSError):
+        atomic_write(str(path), "new\n")
+    assert path.read_text() == "old\n"
+    assert os.listdir(tmp_path) == [".zshrc"]
@@ -0,0 +1,108 @@
+import asyncio
+import os
+import subprocess
+import threading
+import time
+
+import pytest
+
+from configs_cli import runner, ui
+
+
+def script(tmp_path, name, body):
+    path = tmp_path / name
+    path.write_text("#!/bin/sh\n" + body)
+    path.chmod(0o755)
+    return str(path)
+
+
+@pytest.fixture
+def emitted(monkeypatch):
+    """Every (prefix, line, stderr) the runner printed"""
+    lines = []
+    lock = threading.Lock()
+
+    def emit(prefix, line, stderr=False):
+        with lock:
+            lines.append((prefix, line, stderr))
+
+    monkeypatch.setattr(ui, "emit", emit)
+    return lines
+
+
+def gone(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return True
+    return False
+
+
+def wait_for(path):
+    deadline = time.monotonic() + 10
+    while not os.path.exists(path) or not open(path).read().strip():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+    return int(open(path).read())
+
+
+def test_concurrent_output_keeps_its_step_prefix(tmp_path, emitted):
+    slow = script(tmp_path, "slow", "echo one\necho warning >&2\nsleep 0.5\nprintf 'progress 10%%\\rprogress 100%%\\n'\n"
+                                     "printf 'no newline'")
+    fast = script(tmp_path, "fast", "sleep 0.1\necho fast\n")
+    results = {}
+
+    def step(name, cmd):
+        runner.current_step.set(name)
+        results[name] = runner.run([cmd]).returncode
+
+    threads = [threading.Thread(target=step, args=("slow-step", slow)),
+               threading.Thread(target=step, args=("fast-step", fast))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {"slow-step": 0, "fast-step": 0}
+    assert [entry for entry in emitted if entry[0] == "slow-step"] == [
+        ("slow-step", "one", False), ("slow-step", "warning", True),
+        ("slow-step", "progress 100%", False), ("slow-step", "no newline", False)]
+    assert [entry for entry in emitted if entry[0] == "fast-step"] == [("fast-step", "fast", False)]
+    # The fast command's line arrived while the slow one was still running
+    assert emitted.index(("fast-step", "fast", False)) < emitted.index(("slow-step", "progress 100%", False))
+
+
+def test_captured_output_and_failures(tmp_path, emitted):
+    fails = script(tmp_path, "fails", "echo out\necho err >&2\nexit 3\n")
+    result = runner.run([fails], capture_output=True, text=True)
+    assert (result.returncode, result.stdout, result.stderr) == (3, "out\n", "err\n")
+    with pytest.raises(subprocess.CalledProcessError) as error:
+        runner.run([fails], check=True, prefix="mine")
+    assert error.value.returncode == 3
+    assert [entry[0] for entry in emitted] == ["mine", "mine"]
+
+
+def test_timeout_kills_the_command(tmp_path, emitted):
+    pidfile = tmp_path / "pid"
+    hangs = script(tmp_path, "hangs", f"echo $$ > '{pidfile}'\nexec sleep 30\n")
+    started = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        runner.run([hangs], timeout=0.5)
+    assert time.monotonic() - started < 5
+    assert gone(wait_for(pidfile))
+
+
+def test_cancellation_kills_the_command(tmp_path, emitted):
+    pidfile = tmp_path / "pid"
+    hangs = script(tmp_path, "hangs", f"echo $$ > '{pidfile}'\nexec sleep 30\n")
+
+    async def cancel():
+        task = asyncio.ensure_future(runner.run_async([hangs]))
+        while not pidfile.exists() or not pidfile.read_text().strip():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return int(pidfile.read_text())
+
+    assert gone(asyncio.run(cancel()))
@@ -0,0 +1,70 @@
+import os
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+from configs_cli.cache import ArtifactCache
+from configs_cli.provision import clone_repositories, clones_inputs
+from configs_cli.scheduler import Step, run_steps
+from configs_cli.state import StateJournal
+from configs_cli.target import Target
+
+
+def test_dependencies_run_before_dependents():
+    order = []
+    steps = [Step("b", lambda: order.append("b"), requires=["a"]), Step("a", lambda: order.append("a"))]
+    run_steps(steps, jobs=4)
+    assert order == ["a", "b"]
+
+
+def test_failed_step_is_retried_on_the_next_run(tmp_path):
+    journal_path = str(tmp_path / "journal.json")
+    attempts = []
+    works = False
+
+    def flaky():
+        attempts.append(works)
+        return works or False
+
+    def steps():
+        return [Step("clones", flaky, inputs=lambda: ["same inputs"]),
+                Step("after", lambda: None, requires=["clones"], inputs=lambda: [])]
+
+    # The failing step does not stop the ones after it, but is reported
+    assert run_steps(steps(), journal=StateJournal(journal_path)) == ["clones"]
+    assert StateJournal(journal_path).steps["clones"]["status"] == "failed"
+
+    works = True
+    assert run_steps(steps(), journal=StateJournal(journal_path)) == []
+    assert attempts == [False, True]
+
+    # Only now is the step skipped
+    run_steps(steps(), journal=StateJournal(journal_path))
+    assert attempts == [False, True]
+
+
+def test_raising_step_is_recorded_as_failed(tmp_path):
+    journal = StateJournal(str(tmp_path / "journal.json"))
+
+    def broken():
+        raise subprocess.CalledProcessError(1, ["pacman"])
+
+    with pytest.raises(subprocess.CalledProcessError):
+        run_steps([Step("dependencies", broken, inputs=lambda: [])], journal=journal)
+    assert journal.steps["dependencies"]["status"] == "failed"
+
+
+def test_failed_clone_leaves_the_clones_step_unfinished(tmp_path):
+    home = tmp_path / "home"
+    repo = tmp_path / "configs"
+    (repo / "dotfiles").mkdir(parents=True)
+    args = SimpleNamespace(target=Target(home=str(home)), system="linux", repo=str(repo), repo_url=None,
+                           clone_jobs=2)
+    cache = ArtifactCache(str(tmp_path / "cache"), offline=True)
+    journal = StateJournal(str(tmp_path / "journal.json"))
+    step = Step("clones", lambda: clone_repositories(args, cache), inputs=lambda: clones_inputs(args, cache))
+    # Offline with an empty cache, every clone fails
+    assert run_steps([step], journal=journal) == ["clones"]
+    assert not os.path.exists(home / ".zsh" / "zsh-autosuggestions")
+    assert journal.steps["clones"]["status"] == "failed"
@@ -0,0 +1,93 @@
+import os
+
+import pytest
+
+from configs_cli import services
+from configs_cli.privileged import PrivilegedClient
+from configs_cli.services import Service, reconcile_services
+
+# Answers `show` from one "LoadState UnitFileState ActiveState" file per unit and logs every call;
+# changing a unit called "broken" fails
+SYSTEMCTL = """\
+#!/bin/sh
+scope=system
+[ "$1" = --user ] && { scope=user; shift; }
+echo "$scope $*" >> "$SYSTEMCTL_LOG"
+if [ "$1" != show ]; then
+    for arg in "$@"; do [ "$arg" = broken ] && exit 1; done
+    exit 0
+fi
+shift
+first=1
+for arg in "$@"; do
+    case "$arg" in -*|Id,*) continue ;; esac
+    [ -z "$first" ] && echo
+    first=
+    load=not-found file= active=inactive
+    [ -f "$SYSTEMCTL_UNITS/$scope/$arg" ] && read load file active < "$SYSTEMCTL_UNITS/$scope/$arg"
+    printf 'Id=%s\\nLoadState=%s\\nUnitFileState=%s\\nActiveState=%s\\n' "$arg" "$load" "$file" "$active"
+done
+"""
+
+
+@pytest.fixture
+def systemd(tmp_path, monkeypatch):
+    """Returns (set the state of a unit, the systemctl calls made so far)"""
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "systemctl").write_text(SYSTEMCTL)
+    (bin_dir / "systemctl").chmod(0o755)
+    log = tmp_path / "systemctl.log"
+    log.write_text("")
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+    monkeypatch.setenv("SYSTEMCTL_LOG", str(log))
+    monkeypatch.setenv("SYSTEMCTL_UNITS", str(tmp_path / "units"))
+    # System units are changed through the privileged helper, here without sudo
+    client = PrivilegedClient(root=str(tmp_path / "root"))
+    monkeypatch.setattr(services, "privileged", lambda: client)
+
+    def unit(name, file_state, active_state, user=False):
+        path = tmp_path / "units" / ("user" if user else "system") / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(f"loaded {file_state} {active_state}\n")
+
+    yield unit, lambda: log.read_text().splitlines()
+    client.close()
+
+
+def test_only_units_that_differ_are_changed(systemd):
+    unit, calls = systemd
+    unit("NetworkManager", "enabled", "active")
+    unit("bluetooth", "disabled", "inactive")
+    unit("sshd", "enabled", "failed")
+    unit("gdm", "enabled", "active")
+    unit("sddm", "disabled", "inactive")
+    unit("pipewire", "disabled", "inactive", user=True)
+    wanted = [Service("NetworkManager"), Service("bluetooth"), Service("sshd"), Service("gdm", enabled=False),
+              Service("sddm", start=False, force=True), Service("missing"), Service("pipewire", user=True)]
+
+    assert reconcile_services(wanted) == ["gdm", "bluetooth", "sshd", "sddm", "pipewire"]
+    assert calls() == [
+        "system show --no-pager -p Id,LoadState,UnitFileState,ActiveState -- "
+        "NetworkManager bluetooth sshd gdm sddm missing",
+        "system disable gdm",
+        "system enable --now bluetooth sshd",
+        "system enable --force sddm",
+        "user show --no-pager -p Id,LoadState,UnitFileState,ActiveState -- pipewire",
+        "user enable --now pipewire",
+    ]
+
+
+def test_units_in_the_wanted_state_are_left_alone(systemd):
+    unit, calls = systemd
+    unit("NetworkManager", "enabled", "active")
+    unit("cups", "static", "activating")
+    assert reconcile_services([Service("NetworkManager"), Service("cups")]) == []
+    assert len(calls()) == 1
+
+
+def test_a_failed_batch_is_reported_and_not_counted(systemd, capsys):
+    unit, calls = systemd
+    unit("broken", "disabled", "inactive", user=True)
+    assert reconcile_services([Service("broken", user=True)]) == []
+    assert "failed to enable broken" in capsys.readouterr().out
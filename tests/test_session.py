@@ -0,0 +1,119 @@
+import json
+import socketserver
+import threading
+
+import pytest
+
+from configs_cli.i3ipc import HEADER, MAGIC, RUN_COMMAND, SUBSCRIBE, WINDOW_EVENT
+from configs_cli.session import App, launch_session, load_session, run_session
+
+WINDOW_CLASSES = {"firefox": "firefox", "slack": "Slack"}  # commands that open a window, and its class
+
+
+class FakeI3(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """Answers commands and subscriptions; an exec of a known app is followed by its window event"""
+    daemon_threads = True
+
+    def __init__(self, path):
+        super().__init__(path, Handler)
+        self.commands = []
+        self.subscribers = []
+        self.lock = threading.Lock()
+        self.next_id = 100
+
+    def send(self, sock, kind, payload):
+        data = json.dumps(payload).encode()
+        with self.lock:
+            sock.sendall(HEADER.pack(MAGIC, len(data), kind) + data)
+
+    def broadcast(self, change, window_class):
+        with self.lock:
+            self.next_id += 1
+            subscribers = list(self.subscribers)
+        container = {"id": self.next_id, "window_properties": {"class": window_class, "instance": "x"}}
+        for sock in subscribers:
+            self.send(sock, WINDOW_EVENT, {"change": change, "container": container})
+
+
+class Handler(socketserver.BaseRequestHandler):
+    def read(self, size):
+        data = b""
+        while len(data) < size:
+            chunk = self.request.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def handle(self):
+        server = self.server
+        while True:
+            header = self.read(HEADER.size)
+            if header is None:
+                return
+            _, length, kind = HEADER.unpack(header)
+            payload = self.read(length).decode()
+            if kind == SUBSCRIBE:
+                with server.lock:
+                    server.subscribers.append(self.request)
+                server.send(self.request, SUBSCRIBE, {"success": True})
+                continue
+            with server.lock:
+                server.commands.append(payload)
+            server.send(self.request, RUN_COMMAND, [{"success": True}])
+            command = payload.rpartition(" ")[2]
+            if payload.startswith("exec ") and command in WINDOW_CLASSES:
+                # Some unrelated activity first, then the app's window
+                server.broadcast("focus", WINDOW_CLASSES[command])
+                server.broadcast("new", "kitty")
+                server.broadcast("new", WINDOW_CLASSES[command])
+
+
+@pytest.fixture
+def i3(tmp_path):
+    server = FakeI3(str(tmp_path / "i3.sock"))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def test_windows_are_moved_as_they_appear(i3):
+    apps = [App("firefox", "2: Firefox", "firefox"), App("slack", "4: Slack", "slack")]
+    assert launch_session(apps, focus="1: Terminal", socket=i3.server_address) == []
+    assert all(app.placed_after is not None for app in apps)
+    moves = [command for command in i3.commands if "move container" in command]
+    assert sorted(moves) == sorted(['[con_id=103] move container to workspace "2: Firefox"',
+                                    '[con_id=106] move container to workspace "4: Slack"'])
+    assert i3.commands[-1] == 'workspace "1: Terminal"'
+
+
+def test_apps_without_a_window_time_out(i3, tmp_path, capsys):
+    session = tmp_path / "session.json"
+    session.write_text(json.dumps({"apps": [{"command": "firefox", "workspace": "2"},
+                                            {"command": "hangs", "workspace": "3", "timeout": 60}]}))
+    args = type("Args", (), {"session": str(session), "socket": i3.server_address, "timeout": 0.3,
+                             "quiet": True})
+    assert run_session(args) is False
+    assert capsys.readouterr().out.split() == ["hangs", "no", "window", "within", "0.3", "s"]
+
+
+def test_session_file(tmp_path):
+    session = tmp_path / "session.json"
+    session.write_text(json.dumps({"timeout": 5, "focus": "1", "apps": [
+        {"command": "discord", "workspace": "3"}, {"command": "slack", "workspace": "4", "class": "Slack",
+                                                   "timeout": 60}]}))
+    apps, focus = load_session(str(session))
+    assert focus == "1"
+    assert [(app.command, app.window_class, app.timeout) for app in apps] == [("discord", "discord", 5),
+                                                                              ("slack", "Slack", 60)]
+    assert [app.timeout for app in load_session(str(session), timeout=2)[0]] == [2, 2]
+
+
+def test_unreachable_i3_is_an_error(tmp_path, capsys):
+    session = tmp_path / "session.json"
+    session.write_text(json.dumps({"apps": []}))
+    args = type("Args", (), {"session": str(session), "socket": str(tmp_path / "none.sock"), "timeout": None,
+                             "quiet": False})
+    assert run_session(args) is False
+    assert capsys.readouterr().out.startswith("Error: cannot connect to i3")
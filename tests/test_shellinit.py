@@ -0,0 +1,239 @@
+import os
+import shutil
+import subprocess
+
+import pytest
+
+from configs_cli.shellinit import GUARD_BEGIN, GUARD_END, Resolver, compile_shell, flatten
+
+
+@pytest.fixture
+def home(tmp_path):
+    home = tmp_path / "home"
+    home.mkdir()
+    return home
+
+
+def resolve(home, text, zshrc_link=None):
+    resolver = Resolver(str(home))
+    lines = flatten(text.strip("\n").splitlines(), resolver, zshrc_link or str(home / ".zshrc"))
+    return lines, resolver
+
+
+CHAIN = """\
+if [ -f "$HOME/first" ]; then
+    echo first
+elif [[ -d ${HOME}/second ]]; then
+    echo second
+else
+    echo neither
+fi
+"""
+
+
+@pytest.mark.parametrize("present, expected", [
+    ({"first", "second"}, "echo first"),
+    ({"second"}, "echo second"),
+    (set(), "echo neither"),
+])
+def test_static_chain_keeps_the_branch_that_applies(home, present, expected):
+    if "first" in present:
+        (home / "first").write_text("")
+    if "second" in present:
+        (home / "second").mkdir()
+    lines, resolver = resolve(home, CHAIN)
+    assert lines == [expected]
+    assert str(home / "first") in resolver.inputs
+
+
+def test_static_chain_without_else_drops_everything_when_nothing_applies(home):
+    lines, _ = resolve(home, 'if [ -d "$HOME/missing" ]; then\n    export PATH="$HOME/missing:$PATH"\nfi\necho after')
+    assert lines == ["echo after"]
+
+
+def test_nested_blocks_are_kept_at_the_enclosing_indent(home):
+    (home / "plugin.zsh").write_text("")
+    text = """\
+if true; then
+    if [ -f "$HOME/plugin.zsh" ]; then
+        source "$HOME/plugin.zsh"
+        if [[ -n $TMUX ]]; then
+            echo tmux
+        fi
+    fi
+fi
+"""
+    lines, _ = resolve(home, text)
+    assert lines == ["if true; then",
+                     '    source "$HOME/plugin.zsh"',
+                     "    if [[ -n $TMUX ]]; then",
+                     "        echo tmux",
+                     "    fi",
+                     "fi"]
+
+
+@pytest.mark.parametrize("text", [
+    # the condition is not a path test
+    'if [[ "$TERM" == "xterm-kitty" ]]; then\n    echo kitty\nfi',
+    # the path is dynamic
+    'if [ -f "$KITTY_DIR/init.zsh" ]; then\n    echo kitty\nfi',
+    # a later branch is dynamic
+    'if [ -f "$HOME/a" ]; then\n    echo a\nelif [ -n "$SSH_TTY" ]; then\n    echo ssh\nfi',
+    # the block never closes
+    'if [ -f "$HOME/a" ]; then\n    echo a\n    if [[ -n $TMUX ]]; then\n        echo b\n    fi',
+])
+def test_dynamic_or_unbalanced_blocks_are_copied_unchanged(home, text):
+    lines, _ = resolve(home, text)
+    assert lines == text.splitlines()
+
+
+def test_guard_block_is_dropped(home):
+    lines, _ = resolve(home, f"{GUARD_BEGIN}\nsource init.zsh && return\n{GUARD_END}\necho body")
+    assert lines == ["echo body"]
+
+
+def test_dotfiles_dir_is_the_directory_the_zshrc_link_resolves_to(home, tmp_path):
+    dotfiles = tmp_path / "repo" / "dotfiles"
+    dotfiles.mkdir(parents=True)
+    (dotfiles / "zshrc").write_text("")
+    os.symlink(dotfiles / "zshrc", home / ".zshrc")
+    lines, resolver = resolve(home, 'export DOTFILES_DIR="$(dirname $(readlink -f ${HOME}/.zshrc))"')
+    assert lines == [f'export DOTFILES_DIR="{dotfiles}"']
+    assert str(home / ".zshrc") in resolver.inputs
+
+
+def test_secrets_are_read_without_grep_or_xargs(home):
+    lines, _ = resolve(home, """\
+    export $(grep -v '^#' "$HOME/.config/secrets.env" | xargs)
+""".rstrip())
+    path = home / ".config" / "secrets.env"
+    assert lines[0] == "    while IFS= read -r __line || [[ -n $__line ]]; do"
+    assert lines[2] == f'    done < "{path}"'
+    assert lines[3] == "    unset __line"
+    assert not any("grep" in line or "xargs" in line for line in lines)
+
+
+CONDA = """\
+__conda_setup="$("$HOME/anaconda3/bin/conda" "shell.zsh" "hook" 2> /dev/null)"
+if [ $? -eq 0 ]; then
+    eval "$__conda_setup"
+else
+    export PATH="$HOME/anaconda3/bin:$PATH"
+fi
+unset __conda_setup
+echo between
+conda activate Finley
+echo after
+"""
+
+
+def install_conda(home, env=None, binary=True):
+    prefix = home / "anaconda3"
+    if binary:
+        (prefix / "bin").mkdir(parents=True)
+        (prefix / "bin" / "conda").write_text("")
+    else:
+        (prefix / "etc" / "profile.d").mkdir(parents=True)
+        (prefix / "etc" / "profile.d" / "conda.sh").write_text("")
+    if env:
+        (prefix / "envs" / env).mkdir(parents=True)
+    return prefix
+
+
+def test_conda_hook_becomes_a_stub_and_the_activate_moves_into_it(home):
+    prefix = install_conda(home, env="Finley")
+    lines, resolver = resolve(home, CONDA)
+    assert lines == ["# conda is set up on first use rather than at every shell start",
+                     f'export PATH="{prefix}/envs/Finley/bin:$PATH"',
+                     "conda() {",
+                     "    unfunction conda",
+                     f'    eval "$("{prefix}/bin/conda" shell.zsh hook 2> /dev/null)"',
+                     "    conda activate Finley",
+                     '    conda "$@"',
+                     "}",
+                     "echo between",
+                     "echo after"]
+    assert str(prefix / "bin" / "conda") in resolver.inputs
+
+
+def test_conda_stub_falls_back_to_the_profile_script(home):
+    prefix = install_conda(home, binary=False)
+    lines, _ = resolve(home, CONDA)
+    assert f'    . "{prefix}/etc/profile.d/conda.sh"' in lines
+    # the environment does not exist, so nothing is put on PATH up front
+    assert not any(line.startswith("export PATH") for line in lines)
+    assert "conda activate Finley" not in lines
+
+
+def test_missing_conda_drops_the_hook_and_the_activate(home):
+    lines, _ = resolve(home, CONDA)
+    assert lines == ["# conda is not installed", "echo between", "echo after"]
+
+
+def test_only_the_matching_activate_is_dropped(home):
+    install_conda(home)
+    lines, _ = resolve(home, CONDA + "conda activate Finley\nconda activate other\n")
+    assert lines[-2:] == ["conda activate Finley", "conda activate other"]
+    assert lines.count("conda activate Finley") == 1
+
+
+def test_compile_shell_records_its_inputs(home, tmp_path):
+    zshrc = tmp_path / "zshrc"
+    zshrc.write_text(CHAIN)
+    output = tmp_path / "out"
+    init = compile_shell(str(zshrc), home=str(home), output_dir=str(output), zsh=None, quiet=True)
+    text = open(init).read()
+    assert "echo neither" in text and "echo first" not in text
+    assert text.rstrip().endswith("return 0")
+    assert f'-e "{home / "first"}"' in text
+    assert f'"{zshrc}" -nt "{init}"' in text
+
+
+ZSH = shutil.which("zsh")
+
+
+@pytest.fixture
+def compiled(home, tmp_path):
+    (home / "present").write_text("")
+    zshrc = tmp_path / "zshrc"
+    zshrc.write_text('if [ -f "$HOME/present" ]; then\n    echo present\nfi\n'
+                     'if [ -d "$HOME/later" ]; then\n    echo later\nfi\n')
+    init = compile_shell(str(zshrc), home=str(home), output_dir=str(tmp_path / "out"),
+                         zsh=None, quiet=True)
+    past = os.stat(init).st_mtime - 100
+    for path in (zshrc, home / "present"):
+        os.utime(path, (past, past))
+    return zshrc, init
+
+
+def source(init, tmp_path):
+    # PATH without configs-cli, so a stale init does not start a rebuild
+    result = subprocess.run([ZSH, "-c", 'load() { source "$1"; }; load "$1"; echo "status=$?"', "sh", init],
+                            capture_output=True, text=True, env={"PATH": os.path.dirname(ZSH), "HOME": str(tmp_path)})
+    return result.stdout.splitlines()
+
+
+def touch_newer(path, init):
+    later = os.stat(init).st_mtime + 100
+    os.utime(path, (later, later))
+
+
+@pytest.mark.skipif(ZSH is None, reason="zsh is not installed")
+def test_fresh_init_runs_the_flattened_body(compiled, tmp_path):
+    _, init = compiled
+    assert source(init, tmp_path) == ["present", "status=0"]
+
+
+@pytest.mark.skipif(ZSH is None, reason="zsh is not installed")
+@pytest.mark.parametrize("change", ["zshrc", "modified", "removed", "appeared"])
+def test_init_steps_aside_when_an_input_changes(compiled, home, tmp_path, change):
+    zshrc, init = compiled
+    if change == "zshrc":
+        touch_newer(zshrc, init)
+    elif change == "modified":
+        touch_newer(home / "present", init)
+    elif change == "removed":
+        (home / "present").unlink()
+    else:
+        (home / "later").mkdir()
+    assert source(init, tmp_path) == ["status=1"]
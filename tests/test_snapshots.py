@@ -0,0 +1,154 @@
+import os
+import tempfile
+
+import pytest
+
+from configs_cli import snapshots
+from configs_cli.links import swap_link
+from configs_cli.snapshots import SPILL_DIR, SnapshotStore, restore_entry, rollback
+
+
+@pytest.fixture
+def home(tmp_path):
+    home = tmp_path / "home"
+    (home / ".config" / "nvim" / "lua").mkdir(parents=True)
+    (home / ".config" / "nvim" / "init.lua").write_text("require('mine')\n")
+    (home / ".config" / "nvim" / "lua" / "mine.lua").write_text("return {}\n")
+    (home / ".zshrc").write_text("export EDITOR=vim\n")
+    os.symlink("/old/tmux.conf", home / ".tmux.conf")
+    return home
+
+
+def link_over(snapshot, home, repo):
+    """Record and link the managed paths, as apply_links does"""
+    for name in (".zshrc", ".config/nvim", ".tmux.conf", ".config/kitty"):
+        snapshot.record(str(home / name))
+        swap_link(str(repo / name.lstrip(".")), str(home / name))
+
+
+def assert_original(home):
+    assert (home / ".config" / "nvim" / "lua" / "mine.lua").read_text() == "return {}\n"
+    assert not os.path.islink(home / ".config" / "nvim")
+    assert (home / ".zshrc").read_text() == "export EDITOR=vim\n"
+    assert os.readlink(home / ".tmux.conf") == "/old/tmux.conf"
+    assert not os.path.lexists(home / ".config" / "kitty")
+
+
+def test_round_trip(tmp_path, home):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    snapshot = store.new("setup")
+    inode = os.stat(home / ".config" / "nvim").st_ino
+    link_over(snapshot, home, tmp_path / "repo")
+
+    assert [entry["kind"] for entry in store.load(snapshot.id).entries] == ["moved", "moved", "link", "absent"]
+    # Moved, not copied
+    assert os.stat(os.path.join(snapshot.dir, "1-nvim")).st_ino == inode
+
+    assert rollback(store) is True
+    assert_original(home)
+    assert os.stat(home / ".config" / "nvim").st_ino == inode
+    assert store.list() == [] and not os.path.exists(snapshot.dir)
+
+
+@pytest.mark.parametrize("kind", ["file", "directory", "link", "absent"])
+@pytest.mark.parametrize("linked", [True, False], ids=["over-our-link", "path-gone"])
+def test_restore_each_kind(tmp_path, kind, linked):
+    path = tmp_path / "home" / "thing"
+    path.parent.mkdir()
+    stored = tmp_path / "stash" / "0-thing"
+    stored.parent.mkdir()
+    entry = {"path": str(path), "kind": "moved" if kind in ("file", "directory") else kind}
+    if kind == "file":
+        stored.write_text("old\n")
+        entry["stored"] = str(stored)
+    elif kind == "directory":
+        (stored / "sub").mkdir(parents=True)
+        (stored / "sub" / "file").write_text("old\n")
+        entry["stored"] = str(stored)
+    elif kind == "link":
+        entry["target"] = "/somewhere/else"
+    if linked:
+        os.symlink("/repo/thing", path)
+
+    assert restore_entry(entry) is True
+
+    if kind == "file":
+        assert path.read_text() == "old\n"
+    elif kind == "directory":
+        assert (path / "sub" / "file").read_text() == "old\n"
+    elif kind == "link":
+        assert os.readlink(path) == "/somewhere/else"
+    else:
+        assert not os.path.lexists(path)
+    assert not os.path.lexists(stored)
+    assert os.listdir(path.parent) == ([] if kind == "absent" else ["thing"])
+
+
+def test_paths_that_are_no_longer_our_link_are_skipped(tmp_path, home):
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    snapshot = store.new()
+    link_over(snapshot, home, tmp_path / "repo")
+    # The user replaced the link with a file of their own after setup
+    os.remove(home / ".zshrc")
+    (home / ".zshrc").write_text("new and precious\n")
+
+    assert rollback(store, snapshot.id) is False
+
+    assert (home / ".zshrc").read_text() == "new and precious\n"
+    assert (home / ".config" / "nvim" / "init.lua").exists()
+    # The stash stays, so nothing is lost
+    assert (tmp_path / "snapshots" / snapshot.id / "0-.zshrc").read_text() == "export EDITOR=vim\n"
+    assert [s.id for s in store.list()] == [snapshot.id]
+
+
+def other_filesystem(path):
+    """A temporary directory on another filesystem than path, or None"""
+    for candidate in ("/dev/shm", "/run/user/%d" % os.getuid()):
+        if os.path.isdir(candidate) and os.access(candidate, os.W_OK) and \
+                os.stat(candidate).st_dev != os.stat(path).st_dev:
+            return candidate
+    return None
+
+
+def test_other_filesystem_spills_next_to_the_path(tmp_path, home):
+    where = other_filesystem(tmp_path)
+    if where is None:
+        pytest.skip("no second writable filesystem")
+    with tempfile.TemporaryDirectory(dir=where) as store_root:
+        store = SnapshotStore(store_root)
+        snapshot = store.new()
+        link_over(snapshot, home, tmp_path / "repo")
+        spill = home / ".config" / SPILL_DIR / snapshot.id
+        assert os.listdir(spill) == ["1-nvim"]
+        assert (spill / "1-nvim" / "init.lua").exists()
+
+        assert rollback(store) is True
+        assert_original(home)
+        assert not os.path.exists(spill)
+
+
+def test_unrenameable_paths_are_cloned(tmp_path, home, monkeypatch):
+    rename = os.rename
+
+    def cross_device(src, dest):
+        if str(src).startswith(str(home)):
+            raise OSError(18, "Invalid cross-device link")
+        return rename(src, dest)
+
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    snapshot = store.new()
+    monkeypatch.setattr(snapshots.os, "rename", cross_device)
+    link_over(snapshot, home, tmp_path / "repo")
+    monkeypatch.undo()
+
+    assert [entry["kind"] for entry in snapshot.entries[:2]] == ["copied", "copied"]
+    assert rollback(store) is True
+    assert_original(home)
+
+
+def test_runs_in_the_same_second_get_their_own_snapshot(tmp_path, monkeypatch):
+    monkeypatch.setattr(snapshots.time, "strftime", lambda fmt, *args: "20260101-120000")
+    store = SnapshotStore(str(tmp_path / "snapshots"))
+    ids = [store.new().id for _ in range(3)]
+    assert ids == ["20260101-120000", "20260101-120000-2", "20260101-120000-3"]
+    assert sorted(os.listdir(store.root)) == sorted(ids)
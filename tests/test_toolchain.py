@@ -0,0 +1,32 @@
+import os
+
+from configs_cli import toolchain
+from configs_cli.toolchain import RubyToolchain, ruby_toolchain
+
+
+def test_gem_names_are_split_from_the_version(tmp_path):
+    specs = tmp_path / "gems" / "specifications"
+    specs.mkdir(parents=True)
+    for entry in ["colorls-1.4.6.gemspec", "foo-2fa-1.0.0.gemspec", "net-http-0.4.1.pre.gemspec",
+                  "nokogiri-1.15.4-x86_64-linux-gnu.gemspec", "README"]:
+        (specs / entry).write_text("")
+    ruby = RubyToolchain("3.2.0", str(tmp_path / "gems"), str(tmp_path / "missing"))
+    assert ruby.installed_gems() == {"colorls", "foo-2fa", "net-http", "nokogiri"}
+    assert not ruby.has_gem("foo")
+
+
+def test_probe_is_cached_in_the_given_cache_dir(tmp_path, monkeypatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    ruby = bin_dir / "ruby"
+    ruby.write_text("#!/bin/sh\necho run >> \"$(dirname \"$0\")/calls\"\nprintf '3.2.0\\n/gems\\n/user\\n'\n")
+    ruby.chmod(0o755)
+    monkeypatch.setattr(toolchain, "which", lambda tool: str(ruby) if tool == "ruby" else None)
+    cache_dir = tmp_path / "cache"
+
+    first = ruby_toolchain(str(cache_dir))
+    second = ruby_toolchain(str(cache_dir))
+    assert (first.version, first.gem_dir, first.user_dir) == ("3.2.0", "/gems", "/user")
+    assert second.gem_dir == "/gems"
+    assert (bin_dir / "calls").read_text() == "run\n"
+    assert os.path.exists(cache_dir / "toolchains.json")
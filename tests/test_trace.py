@@ -0,0 +1,117 @@
+import json
+import subprocess
+import threading
+
+import pytest
+
+from configs_cli import trace
+from configs_cli.trace import Tracer
+
+
+class Clock:
+    """perf_counter for the tracer, moved by hand"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(trace.time, "perf_counter", clock)
+    return clock
+
+
+@pytest.fixture
+def tracer(clock, monkeypatch):
+    tracer = Tracer()
+    monkeypatch.setattr(trace, "_tracer", tracer)
+    return tracer
+
+
+def record_run(clock, tracer):
+    """A step with two commands, a failing step, and a step on another thread"""
+    with trace.span("links", attrs="x") as attrs:
+        clock.now += 0.5
+        with tracer.span("git clone", "command", exit_code=0, output_bytes=120):
+            clock.now += 2.0
+        attrs["changed"] = 3
+    with pytest.raises(RuntimeError):
+        with trace.span("fonts"):
+            clock.now += 1.0
+            raise RuntimeError("no network")
+
+    def other():
+        with trace.span("services"):
+            clock.now += 0.25
+
+    thread = threading.Thread(target=other)
+    thread.start()
+    thread.join()
+
+
+def test_records(clock, tracer):
+    record_run(clock, tracer)
+    records = tracer.records()
+    assert [r["name"] for r in records] == ["links", "git clone", "fonts", "services"]
+    links, clone, fonts, services = records
+    assert links == {"name": "links", "kind": "step", "thread": 1, "start_ms": 0.0,
+                     "duration_ms": 2500.0, "attrs": "x", "changed": 3}
+    assert clone == {"name": "git clone", "kind": "command", "thread": 1, "start_ms": 500.0,
+                     "duration_ms": 2000.0, "exit_code": 0, "output_bytes": 120}
+    assert fonts["error"] == "RuntimeError('no network')"
+    assert services["thread"] == 2
+
+
+def test_unfinished_spans_are_left_out(clock, tracer):
+    with tracer.span("running"):
+        assert tracer.records() == []
+    assert [r["name"] for r in tracer.records()] == ["running"]
+
+
+def test_ndjson_has_one_sorted_record_per_line(clock, tracer, tmp_path):
+    record_run(clock, tracer)
+    ndjson, _ = tracer.write(str(tmp_path / "profile"))
+    lines = open(ndjson).read().splitlines()
+    assert [json.loads(line) for line in lines] == tracer.records()
+    assert lines[0] == json.dumps(tracer.records()[0], sort_keys=True)
+
+
+def test_chrome_trace_shape(clock, tracer, tmp_path):
+    record_run(clock, tracer)
+    _, chrome = tracer.write(str(tmp_path / "profile"))
+    with open(chrome) as f:
+        data = json.load(f)
+    assert data["displayTimeUnit"] == "ms"
+    events = data["traceEvents"]
+    assert {event["ph"] for event in events} == {"X"}
+    assert len({event["pid"] for event in events}) == 1
+    clone = events[1]
+    assert clone == {"name": "git clone", "cat": "command", "ph": "X", "ts": 500000, "dur": 2000000,
+                     "pid": events[0]["pid"], "tid": 1, "args": {"exit_code": 0, "output_bytes": 120}}
+    assert [event["tid"] for event in events] == [1, 1, 1, 2]
+    assert events[2]["args"] == {"error": "RuntimeError('no network')"}
+
+
+def test_summary_lists_the_slowest_first(clock, tracer, capsys):
+    record_run(clock, tracer)
+    tracer.summary(top=2)
+    out = capsys.readouterr().out.splitlines()
+    assert out[1] == "Slowest steps:"
+    assert [line.split()[-1] for line in out[3:5]] == ["links", "fonts"]
+    assert out[3].split()[0] == "2.50"
+    assert "services" not in "\n".join(out)
+    assert out[6] == "Slowest commands:"
+    assert out[8].split() == ["2.00", "0", "120", "git", "clone"]
+
+
+def test_run_records_the_exit_code_and_output_size(tracer):
+    assert trace.check_output(["echo", "hello"]) == b"hello\n"
+    with pytest.raises(subprocess.CalledProcessError):
+        trace.run(["false"], check=True)
+    echo, false = tracer.records()
+    assert (echo["kind"], echo["cmd"], echo["exit_code"], echo["output_bytes"]) == ("command", ["echo", "hello"], 0, 6)
+    assert false["exit_code"] == 1
@@ -0,0 +1,57 @@
+import os
+
+from configs_cli.clone import Repository, clone_all
+from configs_cli.update import FAILED, UP_TO_DATE, UPDATED, local_head, update_all
+from tests.conftest import git
+
+
+def checkouts(tmp_path, *repos):
+    """Clone (upstream, depth) pairs into a home; returns the Repository objects"""
+    cloned = [Repository(f"{upstream.name}-{depth}", upstream.url, str(tmp_path / "home" / f"{upstream.name}-{depth}"),
+                         depth=depth)
+              for upstream, depth in repos]
+    assert all(error is None for error in clone_all(cloned).values())
+    return cloned
+
+
+def test_only_moved_checkouts_are_brought_forward(tmp_path, upstream):
+    moved, still = upstream("moved"), upstream("still")
+    shallow, full, unchanged = checkouts(tmp_path, (moved, 1), (moved, None), (still, 1))
+    old = moved.commits[-1]
+    moved.commit()
+    moved.commit()
+
+    results = update_all([shallow, full, unchanged])
+
+    assert [(result.status, result.old, result.new) for result in results] == [
+        (UPDATED, old, moved.commits[-1]),
+        (UPDATED, old, moved.commits[-1]),
+        (UP_TO_DATE, still.commits[-1], still.commits[-1]),
+    ]
+    assert git("rev-parse", "HEAD", cwd=shallow.dest) == moved.commits[-1]
+    assert git("rev-list", "--count", "HEAD", cwd=shallow.dest) == "1"
+    assert git("rev-list", "--count", "HEAD", cwd=full.dest) == "3"
+
+
+def test_local_edits_are_kept(tmp_path, upstream):
+    moved = upstream("moved")
+    (shallow,) = checkouts(tmp_path, (moved, 1))
+    with open(os.path.join(shallow.dest, "README"), "w") as f:
+        f.write("local edit\n")
+    moved.commit()
+
+    (result,) = update_all([shallow])
+
+    assert result.status == FAILED
+    with open(os.path.join(shallow.dest, "README")) as f:
+        assert f.read() == "local edit\n"
+
+
+def test_local_head_reads_packed_and_detached_refs(tmp_path, upstream):
+    repo = upstream("repo")
+    (checkout,) = checkouts(tmp_path, (repo, None))
+    git("pack-refs", "--all", cwd=checkout.dest)
+    assert not os.path.exists(os.path.join(checkout.dest, ".git", "refs", "heads", "main"))
+    assert local_head(checkout.dest) == ("main", repo.commits[-1])
+    git("checkout", "--quiet", "--detach", cwd=checkout.dest)
+    assert local_head(checkout.dest) == (None, repo.commits[-1])
@@ -0,0 +1,58 @@
+import os
+import select
+import shutil
+
+import pytest
+
+from configs_cli.target import Target
+from configs_cli.watch import Watcher
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    repo = tmp_path / "repo"
+    for part in ("config", "dotfiles"):
+        shutil.copytree(os.path.join(REPO, part), repo / part, symlinks=True)
+    home = tmp_path / "home"
+    home.mkdir()
+    watcher = Watcher(str(repo), Target(home=str(home)), de="i3", debounce=0.05)
+    watcher.start()
+    watcher.repair_links()
+    # Drop the events of creating the links
+    while select.select([watcher.inotify.fd], [], [], 0.05)[0]:
+        watcher.inotify.read()
+    yield watcher
+    watcher.inotify.close()
+
+
+def test_other_activity_in_the_home_is_ignored(watcher):
+    home = watcher.target.home
+    watches = len(watcher.inotify.watches)
+    os.makedirs(os.path.join(home, "Downloads", "album"))
+    with open(os.path.join(home, ".config", "notes"), "w") as f:
+        f.write("x")
+    os.remove(os.path.join(home, ".config", "notes"))
+    assert watcher.classify(watcher.collect()) == (set(), False)
+    assert len(watcher.inotify.watches) == watches
+
+
+def test_a_removed_link_is_repaired(watcher):
+    link = watcher.target.path(".config", "kitty")
+    os.remove(link)
+    events = watcher.collect()
+    assert watcher.classify(events) == (set(), True)
+    watcher.handle(events)
+    assert os.readlink(link) == os.path.join(watcher.repo_dir, "config", "kitty")
+
+
+def test_new_directories_in_the_repository_are_watched(watcher):
+    themes = os.path.join(watcher.repo_dir, "config", "kitty", "themes")
+    os.mkdir(themes)
+    assert watcher.classify(watcher.collect()) == ({"kitty"}, False)
+    with open(os.path.join(themes, "mocha.conf"), "w") as f:
+        f.write("background #1e1e2e\n")
+    with open(os.path.join(themes, ".mocha.conf.swp"), "w") as f:
+        f.write("")
+    assert watcher.classify(watcher.collect()) == ({"kitty"}, False)